@@ -1,4 +1,4 @@
-from backend.utils.db_conn import db_connection
+from backend.utils.db_conn import get_connection
 from flask import Blueprint, jsonify
 from psycopg2.extras import RealDictCursor
 import json
@@ -12,12 +12,11 @@ queue_bp = Blueprint("queue", __name__)
 def get_queue():
     try:
         # Establish connection to database
-        conn = db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT * FROM queue ORDER BY created_at;")
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+        with get_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute("SELECT * FROM queue ORDER BY created_at;")
+            rows = cur.fetchall()
+            cur.close()
 
         return jsonify(rows), 200
 
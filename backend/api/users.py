@@ -1,9 +1,14 @@
-from backend.utils.db_conn import db_connection
-from flask import Blueprint, jsonify, request
+from backend.utils.db_conn import get_connection
+from backend.utils.result_cache import ResultCache
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from psycopg2.extras import RealDictCursor
+import io
+import csv
 import json
-import pandas as pd
+import base64
+import hashlib
 from datetime import date
+from decimal import Decimal
 
 # Endpoint for Users
 users_bp = Blueprint("users", __name__)
@@ -11,192 +16,549 @@ users_bp = Blueprint("users", __name__)
 # Simple in-memory storage for rate limiting exports (IP -> {date, count})
 daily_export_counts = {}
 
+# Unfiltered facet counts only change when the ingest worker commits
+facet_cache = ResultCache()
 
-def _execute_user_query(request_args, limit, offset):
+# Data dictionary of sortable columns in the user data
+# field -> (SQL expression, type used to cast cursor values, expression may be NULL)
+sortable_fields = {
+    "username": ("u.username", "text", True),
+    "name": ("u.name", "text", True),
+    "followers": ("u.followers", "bigint", True),
+    "following": ("u.following", "bigint", True),
+    "public_repos": ("u.public_repos", "bigint", True),
+    "total_sponsors": ("sc.total_sponsors", "bigint", False),
+    "total_sponsoring": ("sc.total_sponsoring", "bigint", False),
+    # Precomputed by the ingest worker and indexed (see sponsorship_stats.py)
+    "estimated_earnings": ("sc.estimated_earnings", "numeric", True),
+}
+
+# Whitelist filter keys (defensive)
+allowed_filters = {"gender", "type", "location"}
+
+
+class InvalidCursor(ValueError):
+    """Raised when an `after` token is malformed or was issued for a different sort order."""
+
+
+class SortKey:
+    """One ORDER BY key: SQL expression (+ its own params), direction and cursor cast."""
+
+    def __init__(self, expression, direction, cast, nullable, params=()):
+        self.expression = expression
+        self.direction = direction
+        self.cast = cast
+        self.nullable = nullable
+        self.params = list(params)
+
+    @property
+    def order_sql(self):
+        return f"{self.expression} {self.direction}"
+
+
+def _like_prefix(value):
+    # Escape LIKE wildcards so user input only ever matches as a literal prefix
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def _search_filter(request_args):
     """
-    Shared helper to build and execute the user search/filter query.
+    Builds the WHERE clauses for the `search` parameter and the rank key that leads
+    the sort order. `search` is a ranked full-text match by default, or a prefix /
+    typo-tolerant username match when searchMode=fuzzy.
+    Returns (where_clauses, params, sort_keys).
     """
-    conn = db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    search_query = request_args.get("search", "")
+    search_mode = request_args.get("searchMode", "fulltext")
+
+    where_clauses = []
+    params = []
+    sort_keys = []
+
+    # Handle search query (parameterized)
+    if search_query and search_mode == "fuzzy":
+        # Prefix / typo-tolerant username match, served by the trigram index
+        where_clauses.append("(u.username ILIKE %s OR u.username %% %s)")
+        params.extend([_like_prefix(search_query), search_query])
+
+        # Prefix matches first, then by trigram similarity. The rank is ordered, returned and
+        # compared against the cursor as double precision, so equal ranks stay equal after
+        # the round trip through the `after` token.
+        search_rank_expression = (
+            "(similarity(u.username, %s) + CASE WHEN u.username ILIKE %s THEN 1 ELSE 0 END)"
+            "::double precision"
+        )
+        sort_keys.append(
+            SortKey(
+                search_rank_expression,
+                "DESC",
+                "double precision",
+                False,
+                [search_query, _like_prefix(search_query)],
+            )
+        )
+    elif search_query:
+        # Ranked full-text match against the stored, GIN-indexed search vector
+        where_clauses.append("u.search_vector @@ plainto_tsquery('english', %s)")
+        params.append(search_query)
+
+        # Re-add search ranking to the front of the order list
+        search_rank_expression = (
+            "ts_rank_cd(u.search_vector, plainto_tsquery('english', %s))::double precision"
+        )
+        sort_keys.append(
+            SortKey(search_rank_expression, "DESC", "double precision", False, [search_query])
+        )
+
+    return where_clauses, params, sort_keys
+
+
+def _facet_filters(request_args):
+    """
+    Builds one WHERE clause per gender/type/location filter in the request.
+    Returns {facet: (clause, params)} for the facets that are actually filtered.
+    """
+    # Filters passed in from the frontend to query the user data
+    filters = {
+        "gender": request_args.getlist("gender"),
+        "type": request_args.getlist("type"),
+        "location": request_args.getlist("location"),
+    }
+
+    facet_clauses = {}
+    # Handle filters (build explicit placeholders for IN-lists)
+    for key, values in filters.items():
+        if key not in allowed_filters:
+            continue
+        if not values:
+            continue
+        if "None" in values:
+            values = [v for v in values if v != "None"]
+            if values:
+                placeholders = ",".join(["%s"] * len(values))
+                facet_clauses[key] = (
+                    f"(u.{key} IN ({placeholders}) OR u.{key} IS NULL)",
+                    values,
+                )
+            else:
+                facet_clauses[key] = (f"u.{key} IS NULL", [])
+        else:
+            placeholders = ",".join(["%s"] * len(values))
+            facet_clauses[key] = (f"u.{key} IN ({placeholders})", values)
+
+    return facet_clauses
+
+
+# Always require enriched users with sponsor activity
+BASE_USER_FILTERS = [
+    "u.is_enriched IS TRUE",
+    "(sc.total_sponsors > 0 OR sc.total_sponsoring > 0)",
+]
+
+
+def _build_user_filters(request_args):
+    """
+    Builds the WHERE clauses and ORDER BY keys shared by every user listing query.
+    Returns (where_clauses, params, sort_keys); u.id ASC is always the final key.
+    """
+    sort_fields = request_args.getlist("sortField")
+    sort_orders = request_args.getlist("sortOrder")
+
+    where_clauses, params, sort_keys = _search_filter(request_args)
+
+    for clause, clause_params in _facet_filters(request_args).values():
+        where_clauses.append(clause)
+        params.extend(clause_params)
+
+    where_clauses.extend(BASE_USER_FILTERS)
+
+    # Build ORDER BY keys
+    if sort_fields and sort_orders:
+        for field, order in zip(sort_fields, sort_orders):
+            column = sortable_fields.get(field)
+            if column:
+                expression, cast, nullable = column
+                direction = "DESC" if order == "descend" else "ASC"
+                sort_keys.append(SortKey(expression, direction, cast, nullable))
+    else:
+        # Default sort logic: Show leaderboard (Sponsors DESC) if no specific sort requested
+        expression, cast, nullable = sortable_fields["total_sponsors"]
+        sort_keys.append(SortKey(expression, "DESC", cast, nullable))
+
+    # Always add id as the final tiebreaker for stable pagination
+    sort_keys.append(SortKey("u.id", "ASC", "bigint", False))
+
+    return where_clauses, params, sort_keys
 
+
+def _sort_signature(sort_keys):
+    # Ties a cursor to the sort order it was issued for, including the bound params of the
+    # keys (e.g. the search term of a rank), so a rank is never compared across searches
+    return "|".join(
+        f"{key.expression}:{key.direction}:{json.dumps(key.params, default=str)}"
+        for key in sort_keys
+    )
+
+
+def _json_default(value):
+    # Numeric columns come back as Decimal; keep their exact text form
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Unsupported cursor value: {type(value).__name__}")
+
+
+def encode_cursor(sort_keys, values):
+    """Encodes the sort key values of the last returned row as an opaque `after` token."""
+    payload = {
+        "v": list(values),
+        "s": hashlib.sha1(_sort_signature(sort_keys).encode("utf-8")).hexdigest()[:12],
+    }
+    raw = json.dumps(payload, default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort_keys):
+    """Decodes an `after` token, checking it matches the current sort order."""
     try:
-        search_query = request.args.get("search", "")
-        # Filters passed in from the frontend to query the user data
-        filters = {
-            "gender": request.args.getlist("gender"),
-            "type": request.args.getlist("type"),
-            "location": request.args.getlist("location"),
-        }
-        sort_fields = request.args.getlist("sortField")
-        sort_orders = request.args.getlist("sortOrder")
-
-        # Data dictionary of sortable columns in the user data
-        sortable_fields = {
-            "username": "u.username",
-            "name": "u.name",
-            "followers": "u.followers",
-            "following": "u.following",
-            "public_repos": "u.public_repos",
-            "total_sponsors": "total_sponsors",
-            "total_sponsoring": "total_sponsoring",
-            "estimated_earnings": "estimated_earnings",
-        }
-
-        # Whitelist filter keys (defensive)
-        allowed_filters = {"gender", "type", "location"}
-
-        where_clauses = []
-        order_parts = []
-        params = []
-        order_params = []
-
-        # Handle search query (parameterized)
-        if search_query:
-            where_clauses.append(
-                "to_tsvector('english', u.username || ' ' || u.name) @@ plainto_tsquery('english', %s)"
-            )
-            params.append(search_query)
-
-            # Re-add search ranking to the front of the order list
-            search_rank_expression = "ts_rank_cd(to_tsvector('english', u.username || ' ' || u.name), plainto_tsquery('english', %s))"
-            order_parts.append(f"{search_rank_expression} DESC")
-            order_params.append(search_query)
-
-        # Handle filters (build explicit placeholders for IN-lists)
-        for key, values in filters.items():
-            if key not in allowed_filters:
-                continue
-            if not values:
-                continue
-            if "None" in values:
-                values = [v for v in values if v != "None"]
-                if values:
-                    placeholders = ",".join(["%s"] * len(values))
-                    where_clauses.append(
-                        f"(u.{key} IN ({placeholders}) OR u.{key} IS NULL)"
-                    )
-                    params.extend(values)
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = payload["v"]
+        signature = payload["s"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+
+    expected = hashlib.sha1(_sort_signature(sort_keys).encode("utf-8")).hexdigest()[:12]
+    if signature != expected or not isinstance(values, list) or len(values) != len(sort_keys):
+        raise InvalidCursor("Cursor does not match the requested search or sort order")
+    return values
+
+
+def _seek_predicate(sort_keys, values):
+    """
+    Builds the keyset predicate selecting rows strictly after `values` in ORDER BY order.
+    Follows PostgreSQL's default NULL placement (ASC NULLS LAST, DESC NULLS FIRST).
+    """
+    disjuncts = []
+    params = []
+    prefix_sql = []
+    prefix_params = []
+
+    for key, value in zip(sort_keys, values):
+        expr = key.expression
+        if value is None:
+            # Nothing follows NULL in an ascending key; every non-NULL follows it in a descending one
+            after_sql = f"{expr} IS NOT NULL" if key.direction == "DESC" else None
+            after_params = list(key.params)
+            equal_sql = f"{expr} IS NULL"
+            equal_params = list(key.params)
+        else:
+            if key.direction == "ASC":
+                after_sql = f"{expr} > %s::{key.cast}"
+                if key.nullable:
+                    after_sql = f"({after_sql} OR {expr} IS NULL)"
+                    after_params = key.params + [value] + key.params
                 else:
-                    where_clauses.append(f"u.{key} IS NULL")
+                    after_params = key.params + [value]
             else:
-                placeholders = ",".join(["%s"] * len(values))
-                where_clauses.append(f"u.{key} IN ({placeholders})")
-                params.extend(values)
-
-        # Always require enriched users with sponsor activity
-        where_clauses.append("u.is_enriched IS TRUE")
-        where_clauses.append("(sc.total_sponsors > 0 OR sc.total_sponsoring > 0)")
-        where_clause = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
-
-        # Build ORDER BY clause
-        if sort_fields and sort_orders:
-            for field, order in zip(sort_fields, sort_orders):
-                col_name = sortable_fields.get(field)
-                if col_name:
-                    direction = "DESC" if order == "descend" else "ASC"
-                    order_parts.append(f"{col_name} {direction}")
-        else:
-            # Default sort logic: Show leaderboard (Sponsors DESC) if no specific sort requested
-            order_parts.append("total_sponsors DESC")
+                after_sql = f"{expr} < %s::{key.cast}"
+                after_params = key.params + [value]
+            equal_sql = f"{expr} = %s::{key.cast}"
+            equal_params = key.params + [value]
+
+        if after_sql:
+            disjuncts.append("(" + " AND ".join(prefix_sql + [after_sql]) + ")")
+            params.extend(prefix_params + after_params)
+        prefix_sql.append(equal_sql)
+        prefix_params.extend(equal_params)
+
+    if not disjuncts:
+        return "FALSE", []
+
+    predicate = "(" + " OR ".join(disjuncts) + ")"
+
+    # Redundant bound on the leading key so an index scan can start at the cursor
+    lead, lead_value = sort_keys[0], values[0]
+    if lead_value is not None and (lead.direction == "DESC" or not lead.nullable):
+        op = "<=" if lead.direction == "DESC" else ">="
+        predicate = f"{lead.expression} {op} %s::{lead.cast} AND {predicate}"
+        params = lead.params + [lead_value] + params
+
+    return predicate, params
+
+
+def _format_user_row(row):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "username": row["username"],
+        "type": row["type"],
+        "gender": row["gender"],
+        "hireable": row["hireable"],
+        "location": row["location"],
+        "avatar_url": row["avatar_url"],
+        "profile_url": row["profile_url"],
+        "following": row["following"],
+        "followers": row["followers"],
+        "public_repos": row["public_repos"],
+        "public_gists": row["public_gists"],
+        "total_sponsors": row["total_sponsors"],
+        "total_sponsoring": row["total_sponsoring"],
+        "min_sponsor_cost": row["min_sponsor_cost"],
+        "estimated_earnings": row["estimated_earnings"],
+    }
+
+
+def _user_listing_sql(extra_columns, where_sql, order_sql, tail_sql=""):
+    # Optizimed query to fetch all necessary data
+    extra_columns = f", {extra_columns.strip()}" if extra_columns.strip() else ""
+    return f"""
+    SELECT 
+        u.id, u.name, u.username, u.type, u.avatar_url, u.profile_url,
+        u.gender, u.location, u.public_repos, u.public_gists,
+        u.followers, u.following, u.hireable, u.min_sponsor_cost, 
+        sc.total_sponsors,
+        sc.total_sponsoring,
+        sc.estimated_earnings
+        {extra_columns}
+        FROM users u
+        JOIN user_sponsorship_stats sc ON sc.user_id = u.id
+        {where_sql}
+        {order_sql}
+    {tail_sql};
+    """
 
-        # Always add id as the final tiebreaker for stable pagination
-        order_parts.append("u.id ASC")
-        order_clause = "ORDER BY " + ", ".join(order_parts)
 
-        # Optizimed query to fetch all necessary data
-        data_query = f"""
-        WITH sponsorship_counts AS (
-            SELECT 
-            u.id AS user_id,
-            COALESCE(COUNT(DISTINCT s1.sponsor_id), 0) + 
-            COALESCE(u.private_sponsor_count, 0) AS total_sponsors,
-            COALESCE((
-                SELECT COUNT(DISTINCT s2.sponsored_id)
-                FROM sponsorship s2
-                WHERE s2.sponsor_id = u.id
-            ), 0) AS total_sponsoring
-            FROM users u
-            LEFT JOIN sponsorship s1 ON s1.sponsored_id = u.id
-            GROUP BY u.id, u.private_sponsor_count
-        ),
-        median_cost AS (
-            SELECT 
-            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY min_sponsor_cost) AS value
-            FROM users
-            WHERE min_sponsor_cost > 0
-        )
-        SELECT 
-            u.id, u.name, u.username, u.type, u.avatar_url, u.profile_url,
-            u.gender, u.location, u.public_repos, u.public_gists,
-            u.followers, u.following, u.hireable, u.min_sponsor_cost, 
-            sc.total_sponsors,
-            sc.total_sponsoring,
-            ( 
-            LEAST(
-                (CASE WHEN u.min_sponsor_cost > 0 THEN u.min_sponsor_cost ELSE mc.value END), 
-                mc.value
-            ) * sc.total_sponsors
-            ) AS estimated_earnings,
-            COUNT(*) OVER() AS total_count
-            FROM users u
-            JOIN sponsorship_counts sc ON sc.user_id = u.id
-            CROSS JOIN median_cost mc
-            {where_clause}
-            {order_clause}
-        LIMIT %s OFFSET %s;
-        """
+def _count_users(cur, where_clauses, params):
+    cur.execute(
+        f"""
+        SELECT COUNT(*) AS total
+        FROM users u
+        JOIN user_sponsorship_stats sc ON sc.user_id = u.id
+        WHERE {' AND '.join(where_clauses)};
+        """,
+        tuple(params),
+    )
+    row = cur.fetchone()
+    return row["total"] if row else 0
 
-        # Inject request params + order params + pagination params
-        final_params = params + order_params + [limit, offset]
-        cur.execute(data_query, tuple(final_params))
-        rows = cur.fetchall()
 
-        total_count = 0
-        ordered_users = []
-        if rows:
-            total_count = rows[0]["total_count"]
-            for row in rows:
-                ordered_users.append(
-                    {
-                        "id": row["id"],
-                        "name": row["name"],
-                        "username": row["username"],
-                        "type": row["type"],
-                        "gender": row["gender"],
-                        "hireable": row["hireable"],
-                        "location": row["location"],
-                        "avatar_url": row["avatar_url"],
-                        "profile_url": row["profile_url"],
-                        "following": row["following"],
-                        "followers": row["followers"],
-                        "public_repos": row["public_repos"],
-                        "public_gists": row["public_gists"],
-                        "total_sponsors": row["total_sponsors"],
-                        "total_sponsoring": row["total_sponsoring"],
-                        "min_sponsor_cost": row["min_sponsor_cost"],
-                        "estimated_earnings": row["estimated_earnings"],
-                    }
+def _execute_user_query(request_args, limit, offset=0, after=None, include_total=True):
+    """
+    Shared helper to build and execute the user search/filter query.
+
+    Offset mode (after=None) keeps the original page/total response.
+    Keyset mode (after is a token, or "" for the first page) seeks past the last
+    row of the previous page instead of scanning and discarding earlier rows, and
+    only counts the filtered set when include_total is set.
+    """
+    where_clauses, params, sort_keys = _build_user_filters(request_args)
+    keyset = after is not None
+
+    seek_params = []
+    if keyset and after:
+        seek_sql, seek_params = _seek_predicate(
+            sort_keys, decode_cursor(after, sort_keys)
+        )
+        seek_clause = f"AND {seek_sql}"
+    else:
+        seek_clause = ""
+
+    where_clause = f"WHERE {' AND '.join(where_clauses)}"
+    order_clause = "ORDER BY " + ", ".join(key.order_sql for key in sort_keys)
+    order_params = [p for key in sort_keys for p in key.params]
+
+    # Sort key values are selected so the next cursor can be built from the last row
+    key_columns = ", ".join(
+        f"{key.expression} AS _sort_key_{i}" for i, key in enumerate(sort_keys)
+    )
+    key_params = order_params
+
+    # The window count forces the whole filtered set to be materialized, only use it when asked
+    count_column = ", COUNT(*) OVER() AS total_count" if include_total and not keyset else ""
+
+    # Fetch one extra row in keyset mode to know whether another page exists
+    pagination_clause = "LIMIT %s" if keyset else "LIMIT %s OFFSET %s"
+    pagination_params = [limit + 1] if keyset else [limit, offset]
+
+    data_query = _user_listing_sql(
+        f"{key_columns} {count_column}",
+        f"{where_clause} {seek_clause}",
+        order_clause,
+        pagination_clause,
+    )
+
+    # Inject select params + request params + seek params + order params + pagination params
+    final_params = key_params + params + seek_params + order_params + pagination_params
+
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute(data_query, tuple(final_params))
+            rows = cur.fetchall()
+
+            if not keyset:
+                total_count = rows[0]["total_count"] if rows and include_total else 0
+                result = {"users": [_format_user_row(row) for row in rows]}
+                if include_total:
+                    result["total"] = total_count
+                return result
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            next_cursor = None
+            if has_more and rows:
+                last = rows[-1]
+                next_cursor = encode_cursor(
+                    sort_keys,
+                    [last[f"_sort_key_{i}"] for i in range(len(sort_keys))],
                 )
 
-        return {"total": total_count, "users": ordered_users}
+            result = {
+                "users": [_format_user_row(row) for row in rows],
+                "next": next_cursor,
+            }
+            if include_total:
+                # Served by a separate count so the page itself never materializes the full set
+                result["total"] = _count_users(cur, where_clauses, params)
+            return result
 
-    finally:
-        cur.close()
-        conn.close()
+        finally:
+            cur.close()
+
+
+def _parse_bool(value, default):
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
 
 
-# Fetch all users from the database (Standard Pagination)
+# Fetch all users from the database
+# - Standard pagination: ?page=&per_page=
+# - Keyset pagination: ?after=<token> (empty for the first page); follow "next" for the next page
 @users_bp.route("/api/users", methods=["GET"])
 def get_users():
     try:
+        per_page = int(request.args.get("per_page", 10))
+        after = request.args.get("after")
+
+        if after is not None:
+            include_total = _parse_bool(request.args.get("include_total"), False)
+            result = _execute_user_query(
+                request.args, per_page, after=after, include_total=include_total
+            )
+            return jsonify(result), 200
+
         # Get pagination parameters from query string
         page = int(request.args.get("page", 1))
-        per_page = int(request.args.get("per_page", 10))
         offset = (page - 1) * per_page
+        include_total = _parse_bool(request.args.get("include_total"), True)
 
-        result = _execute_user_query(request.args, per_page, offset)
+        result = _execute_user_query(
+            request.args, per_page, offset, include_total=include_total
+        )
         return jsonify(result), 200
 
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Total number of users matching the current search/filters (served separately from keyset pages)
+@users_bp.route("/api/users/count", methods=["GET"])
+def get_users_count():
+    try:
+        where_clauses, params, _ = _build_user_filters(request.args)
+        with get_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            total = _count_users(cur, where_clauses, params)
+            cur.close()
+        return jsonify({"total": total}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Facets reported by /api/users/facets, and the GROUPING() id of each grouping set
+FACET_GROUPS = {"gender": 0b011, "type": 0b101, "location": 0b110}
+
+
+def _compute_facets(request_args):
+    """
+    Counts users per gender, type and location in one grouped pass.
+
+    Each facet is counted with the search and every *other* facet's filter applied,
+    so the filter panel can still show the alternatives to a value already selected.
+    """
+    where_clauses, params, _ = _search_filter(request_args)
+    where_clauses = where_clauses + BASE_USER_FILTERS
+    facet_clauses = _facet_filters(request_args)
+
+    # One boolean per facet: does the row pass that facet's filter?
+    match_columns = []
+    match_params = []
+    for facet in FACET_GROUPS:
+        clause, clause_params = facet_clauses.get(facet, ("TRUE", []))
+        match_columns.append(f"({clause}) AS {facet}_match")
+        match_params.extend(clause_params)
+
+    # ...and each facet counts the rows that pass all of the other facets' filters
+    count_columns = []
+    for facet in FACET_GROUPS:
+        others = " AND ".join(f"{other}_match" for other in FACET_GROUPS if other != facet)
+        count_columns.append(f"COUNT(*) FILTER (WHERE {others}) AS {facet}_count")
+
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(
+            f"""
+            WITH matched AS (
+                SELECT
+                    u.gender::text AS gender,
+                    u.type,
+                    u.location,
+                    {", ".join(match_columns)}
+                FROM users u
+                JOIN user_sponsorship_stats sc ON sc.user_id = u.id
+                WHERE {' AND '.join(where_clauses)}
+            )
+            SELECT
+                GROUPING(gender, type, location) AS grouping_id,
+                gender,
+                type,
+                location,
+                {", ".join(count_columns)}
+            FROM matched
+            GROUP BY GROUPING SETS ((gender), (type), (location));
+            """,
+            match_params + params,
+        )
+        rows = cur.fetchall()
+        cur.close()
+
+    facets = {facet: [] for facet in FACET_GROUPS}
+    for row in rows:
+        for facet, grouping_id in FACET_GROUPS.items():
+            if row["grouping_id"] == grouping_id and row[f"{facet}_count"] > 0:
+                facets[facet].append({"value": row[facet], "count": row[f"{facet}_count"]})
+
+    for values in facets.values():
+        values.sort(key=lambda item: (-item["count"], item["value"] is None, item["value"] or ""))
+    return facets
+
+
+# Counts per gender / type / location for the current search and filter state
+@users_bp.route("/api/users/facets", methods=["GET"])
+def get_user_facets():
+    try:
+        if any(request.args.get(key) for key in ("search", *FACET_GROUPS)):
+            facets = _compute_facets(request.args)
+        else:
+            # The unfiltered panel is the same for every visitor, serve it from memory
+            facets = facet_cache.get_or_compute(
+                ("facets",), lambda: _compute_facets(request.args)
+            )
+        return jsonify(facets), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -220,6 +582,102 @@ def get_export_users():
         return jsonify({"error": str(e)}), 500
 
 
+# Rows pulled from the server-side cursor per round trip while streaming an export
+EXPORT_FETCH_SIZE = 2000
+# Flush the response buffer once it holds roughly this many bytes
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_COLUMNS = [
+    "id",
+    "name",
+    "username",
+    "type",
+    "gender",
+    "hireable",
+    "location",
+    "avatar_url",
+    "profile_url",
+    "following",
+    "followers",
+    "public_repos",
+    "public_gists",
+    "total_sponsors",
+    "total_sponsoring",
+    "min_sponsor_cost",
+    "estimated_earnings",
+]
+
+
+def _stream_users(request_args, export_format):
+    """
+    Generator streaming every user matching the search/filters as CSV or NDJSON.
+    Rows are read through a named (server-side) cursor, so memory stays flat
+    regardless of how many rows are exported.
+    """
+    where_clauses, params, sort_keys = _build_user_filters(request_args)
+    data_query = _user_listing_sql(
+        "",
+        f"WHERE {' AND '.join(where_clauses)}",
+        "ORDER BY " + ", ".join(key.order_sql for key in sort_keys),
+    )
+    order_params = [p for key in sort_keys for p in key.params]
+
+    buffer = io.StringIO()
+    writer = None
+    if export_format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+
+    with get_connection() as conn:
+        # A named cursor keeps the result set on the server and fetches it in batches
+        cur = conn.cursor(name="users_export", cursor_factory=RealDictCursor)
+        cur.itersize = EXPORT_FETCH_SIZE
+        try:
+            cur.execute(data_query, tuple(params + order_params))
+            # Signal that the query was accepted before any rows are streamed
+            yield ""
+            for row in cur:
+                record = _format_user_row(row)
+                if writer:
+                    writer.writerow(record)
+                else:
+                    buffer.write(json.dumps(record, default=str))
+                    buffer.write("\n")
+
+                if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate(0)
+        finally:
+            cur.close()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Stream the full filtered dataset in one request (?format=csv|ndjson, same filters as /api/users)
+@users_bp.route("/api/users/export/stream", methods=["GET"])
+def stream_export_users():
+    export_format = request.args.get("format", "ndjson").lower()
+    if export_format not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be 'csv' or 'ndjson'"}), 400
+
+    # Run the query up front so connection/SQL errors still produce a JSON 500
+    stream = _stream_users(request.args, export_format)
+    try:
+        next(stream)
+    except Exception as e:
+        stream.close()
+        return jsonify({"error": str(e)}), 500
+
+    mimetype = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"github-sponsors-users-{date.today().isoformat()}.{export_format}"
+    return Response(
+        stream_with_context(stream),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 # Endpoint to retrieve a list of unique country locations sorted alphabetically
 @users_bp.route("/api/users/location", methods=["GET"])
 def get_locations():
@@ -228,13 +686,12 @@ def get_locations():
     The database query planner should use a 'skip scan' on the index for efficiency.
     """
     try:
-        conn = db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        location_query = "SELECT DISTINCT location FROM users WHERE location IS NOT NULL ORDER BY location ASC;"
-        cur.execute(location_query)
-        location_list = [row["location"] for row in cur.fetchall()]
-        cur.close()
-        conn.close()
+        with get_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            location_query = "SELECT DISTINCT location FROM users WHERE location IS NOT NULL ORDER BY location ASC;"
+            cur.execute(location_query)
+            location_list = [row["location"] for row in cur.fetchall()]
+            cur.close()
         return jsonify(location_list), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -244,10 +701,6 @@ def get_locations():
 @users_bp.route("/api/user/<int:user_id>", methods=["GET"])
 def get_user(user_id):
 
-    # Establish connection to database
-    conn = db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
     try:
         data_query = """
         WITH user_details AS (
@@ -279,17 +732,11 @@ def get_user(user_id):
         sponsor_data AS (
             SELECT 
                 u.id,
-                COALESCE(COUNT(DISTINCT s1.sponsor_id), 0) + 
-                COALESCE(u.private_sponsor_count, 0) AS total_sponsors,
-                COALESCE((
-                    SELECT COUNT(DISTINCT s2.sponsored_id)
-                    FROM sponsorship s2
-                    WHERE s2.sponsor_id = u.id
-                ), 0) AS total_sponsoring
+                COALESCE(sc.total_sponsors, 0) AS total_sponsors,
+                COALESCE(sc.total_sponsoring, 0) AS total_sponsoring
             FROM users u
-            LEFT JOIN sponsorship s1 ON s1.sponsored_id = u.id
+            LEFT JOIN user_sponsorship_stats sc ON sc.user_id = u.id
             WHERE u.id = %s
-            GROUP BY u.id, u.private_sponsor_count
         )
         SELECT
             row_to_json(ud) AS user_data,
@@ -300,10 +747,12 @@ def get_user(user_id):
         LEFT JOIN activity_summary as_sum ON true
         LEFT JOIN sponsor_data sd ON true;
         """
-        cur.execute(data_query, (user_id, user_id, user_id))
-        user_data = cur.fetchone()
-        cur.close()
-        conn.close()
+        # Establish connection to database
+        with get_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute(data_query, (user_id, user_id, user_id))
+            user_data = cur.fetchone()
+            cur.close()
 
         if user_data and user_data["user_data"]:
             response_data = user_data["user_data"]
@@ -318,83 +767,101 @@ def get_user(user_id):
         return jsonify({"error": str(e)}), 500
 
 
-@users_bp.route("/api/user/<int:user_id>/sponsorship-history", methods=["GET"])
-def get_sponsorship_history_route(user_id):
-    conn = db_connection()
-    try:
-        # 1. Get Interval from Query Params (Default to 'W')
-        interval_param = request.args.get("interval", "W").upper()
-        # Map 'week'/'month' strings to Pandas frequency aliases if needed, or just strict check
-        freq_alias = "ME" if interval_param == "M" else "W"
-        # Note: Pandas 2.2+ prefers 'ME' (Month End) over 'M'. Use 'M' if on older pandas.
-
-        with conn.cursor() as cur:
-            # Union Query: Get both closed history and current active
-            query = """
-                SELECT h.started_at, h.ended_at
-                FROM sponsorship_history h
-                WHERE h.sponsored_id = %s
-                UNION ALL
-                SELECT s.created_at as started_at, NULL as ended_at
-                FROM sponsorship s
-                WHERE s.sponsored_id = %s
-            """
-            cur.execute(query, (user_id, user_id))
-            rows = cur.fetchall()
+# Timeline buckets: interval -> (date_trunc unit, series step, offset from bucket start to its label)
+# Buckets are labelled by their last day (weeks end on Sunday, months on their last day)
+HISTORY_INTERVALS = {
+    "W": ("week", "1 week", "6 days"),
+    "M": ("month", "1 month", "1 month -1 day"),
+}
 
-        if not rows:
-            return jsonify([]), 200
+# Finished timelines per (user, interval, history_version). The version is bumped by the
+# ingest worker whenever that user's sponsors change, so entries are invalidated per user
+# rather than by the global data generation.
+history_cache = ResultCache(load_generation=lambda: 0)
 
-        # --- DATA PROCESSING WITH PANDAS ---
-        # Convert to DataFrame
-        df = pd.DataFrame(rows, columns=["started_at", "ended_at"])
 
-        # FIX: Force UTC, then strip timezone info (.dt.tz_localize(None))
-        # This ensures both columns are "timezone-naive" and can be joined/merged safely.
-        df["started_at"] = pd.to_datetime(df["started_at"], utc=True).dt.tz_localize(
-            None
-        )
-        df["ended_at"] = pd.to_datetime(df["ended_at"], utc=True).dt.tz_localize(None)
-
-        # 2. Resample using the dynamic frequency
-        new_sponsors = df.set_index("started_at").resample(freq_alias).size()
-        lost_sponsors = (
-            df[df["ended_at"].notnull()]
-            .set_index("ended_at")
-            .resample(freq_alias)
-            .size()
+def _sponsorship_timeline(cur, user_id, interval):
+    """
+    Buckets a user's sponsorship starts and ends by week or month in SQL and returns
+    one row per bucket (gaps included) with the running active sponsor count.
+    """
+    unit, step, label_offset = HISTORY_INTERVALS[interval]
+    cur.execute(
+        """
+        WITH events AS (
+            -- Union Query: Get both closed history and current active
+            SELECT h.started_at, h.ended_at
+            FROM sponsorship_history h
+            WHERE h.sponsored_id = %(user_id)s
+            UNION ALL
+            SELECT s.created_at AS started_at, NULL AS ended_at
+            FROM sponsorship s
+            WHERE s.sponsored_id = %(user_id)s
+        ),
+        new_counts AS (
+            SELECT date_trunc(%(unit)s, started_at AT TIME ZONE 'UTC') AS bucket, COUNT(*) AS new
+            FROM events
+            GROUP BY 1
+        ),
+        lost_counts AS (
+            SELECT date_trunc(%(unit)s, ended_at AT TIME ZONE 'UTC') AS bucket, COUNT(*) AS lost
+            FROM events
+            WHERE ended_at IS NOT NULL
+            GROUP BY 1
+        ),
+        bounds AS (
+            SELECT MIN(bucket) AS first_bucket, MAX(bucket) AS last_bucket
+            FROM (
+                SELECT bucket FROM new_counts
+                UNION ALL
+                SELECT bucket FROM lost_counts
+            ) buckets
+        ),
+        timeline AS (
+            SELECT
+                series.bucket,
+                COALESCE(n.new, 0) AS new,
+                COALESCE(l.lost, 0) AS lost
+            FROM bounds
+            CROSS JOIN generate_series(bounds.first_bucket, bounds.last_bucket, %(step)s::interval) AS series(bucket)
+            LEFT JOIN new_counts n ON n.bucket = series.bucket
+            LEFT JOIN lost_counts l ON l.bucket = series.bucket
         )
+        SELECT
+            to_char(bucket + %(label_offset)s::interval, 'YYYY-MM-DD') AS date,
+            -- Running total of (new - lost), never below zero
+            GREATEST(SUM(new - lost) OVER (ORDER BY bucket), 0)::int AS active_count,
+            new::int AS new,
+            lost::int AS lost
+        FROM timeline
+        ORDER BY bucket;
+        """,
+        {"user_id": user_id, "unit": unit, "step": step, "label_offset": label_offset},
+    )
+    return [dict(row) for row in cur.fetchall()]
 
-        # 3. Combine into one Timeline
-        timeline = pd.DataFrame({"new": new_sponsors, "lost": lost_sponsors}).fillna(0)
-
-        # 4. Calculate "Active Count" (Running Total)
-        # Net change per week = New - Lost
-        timeline["net_change"] = timeline["new"] - timeline["lost"]
-        timeline["active_count"] = timeline["net_change"].cumsum()
-
-        # 5. Format for JSON
-        # Explicitly format the index to avoid Pylance inference errors with .dt accessor
-        timeline.index = pd.to_datetime(timeline.index).strftime("%Y-%m-%d")
-
-        # Reset index (which is now strings) to make 'date' a column
-        final_df = timeline.reset_index()
-
-        # Rename the first column (the index) to 'date' safely
-        final_df.rename(columns={final_df.columns[0]: "date"}, inplace=True)
 
-        # Ensure integers and handle negatives (vectorized clip)
-        final_df["active_count"] = final_df["active_count"].clip(lower=0).astype(int)
-        final_df["new"] = final_df["new"].astype(int)
-        final_df["lost"] = final_df["lost"].astype(int)
+@users_bp.route("/api/user/<int:user_id>/sponsorship-history", methods=["GET"])
+def get_sponsorship_history_route(user_id):
+    try:
+        # Get Interval from Query Params (Default to weekly)
+        interval = "M" if request.args.get("interval", "W").upper() == "M" else "W"
+
+        with get_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute(
+                "SELECT history_version FROM user_sponsorship_stats WHERE user_id = %s;",
+                (user_id,),
+            )
+            row = cur.fetchone()
+            version = row["history_version"] if row else None
 
-        # Convert to list of dictionaries directly
-        results = final_df[["date", "active_count", "new", "lost"]].to_dict(
-            orient="records"
-        )
+            results = history_cache.get_or_compute(
+                (user_id, interval, version),
+                lambda: _sponsorship_timeline(cur, user_id, interval),
+            )
+            cur.close()
 
         return jsonify(results), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        conn.close()
@@ -44,6 +44,23 @@ create index IF not exists idx_users_name on public.users using btree (name) TAB
 
 create index IF not exists inx_users_location on public.users using btree (location) TABLESPACE pg_default;
 
+-- Search: stored full-text vector (NULL-safe) and trigram index for fuzzy / prefix username lookup
+create extension IF not exists pg_trgm;
+
+alter table public.users add column IF not exists search_vector tsvector generated always as (
+  to_tsvector('english', coalesce(username, '') || ' ' || coalesce(name, ''))
+) stored;
+
+create index IF not exists idx_users_search_vector on public.users using gin (search_vector) TABLESPACE pg_default;
+
+create index IF not exists idx_users_username_trgm on public.users using gin (username gin_trgm_ops) TABLESPACE pg_default;
+
+-- Validators of the last /user/{id} response, sent back as If-None-Match / If-Modified-Since
+-- when the ingest worker refreshes the profile (a 304 skips the refresh)
+alter table public.users add column IF not exists etag text null;
+
+alter table public.users add column IF not exists last_modified text null;
+
 
 create table public.user_activity (
   user_id bigint not null,
@@ -71,12 +88,37 @@ create table public.queue (
   created_at timestamp with time zone not null default now(),
   status public.status null default 'pending'::status,
   github_id bigint null,
+  -- Set while a worker holds the user ('processing'), see claimFromQueue
+  claimed_by text null,
+  lease_expires_at timestamp with time zone null,
   constraint queue_pkey primary key (id),
   constraint queue_github_id_key unique (github_id),
   constraint queue_username_key unique (username),
   constraint queue_github_id_fkey foreign KEY (github_id) references users (github_id) on update CASCADE on delete CASCADE
 ) TABLESPACE pg_default;
 
+-- Finds expired leases to reclaim without scanning the rest of the queue
+create index IF not exists idx_queue_lease_expires_at on public.queue using btree (lease_expires_at) TABLESPACE pg_default
+where (status = 'processing'::status);
+
+-- Serves claimFromQueue as an index scan over the (small) pending set only
+create index IF not exists idx_queue_pending on public.queue using btree (priority DESC, created_at) TABLESPACE pg_default
+where (status = 'pending'::status);
+
+
+-- Cold side of the queue: one row per crawled user, moved here from `queue` on completion
+-- so the queue only holds pending / processing / failed work.
+create table public.crawl_state (
+  github_id bigint not null,
+  priority bigint null,
+  completed_at timestamp with time zone not null default now(),
+  constraint crawl_state_pkey primary key (github_id),
+  constraint crawl_state_github_id_fkey foreign KEY (github_id) references users (github_id) on update CASCADE on delete CASCADE
+) TABLESPACE pg_default;
+
+-- Serves enqueueStaleUsers and batchRequeue as a range scan
+create index IF not exists idx_crawl_state_completed_at on public.crawl_state using btree (completed_at) TABLESPACE pg_default;
+
 
 create table public.sponsorship (
   id bigint generated by default as identity not null,
@@ -88,6 +130,9 @@ create table public.sponsorship (
   constraint sponsorship_sponsored_id_fkey foreign KEY (sponsored_id) references users (id) on update CASCADE on delete CASCADE
 ) TABLESPACE pg_default;
 
+-- (sponsor_id, sponsored_id) is covered by the unique constraint, this serves lookups by the sponsored side
+create index IF not exists idx_sponsorship_sponsored on public.sponsorship using btree (sponsored_id) TABLESPACE pg_default;
+
 
 CREATE TABLE public.sponsorship_history (
   id bigint generated by default as identity primary key,
@@ -97,8 +142,112 @@ CREATE TABLE public.sponsorship_history (
   ended_at timestamp with time zone DEFAULT now(),
   constraint history_sponsor_fkey foreign KEY (sponsor_id) references users (id) on delete CASCADE,
   constraint history_sponsored_fkey foreign KEY (sponsored_id) references users (id) on delete CASCADE
-)
+);
 
 CREATE INDEX if not EXISTS idx_sponsorship_history_sponsor ON public.sponsorship_history(sponsor_id);
 CREATE INDEX if not EXISTS idx_sponsorship_history_sponsored ON public.sponsorship_history(sponsored_id);
-CREATE INDEX if not EXISTS idx_sponsorship_history_dates ON public.sponsorship_history(started_at, ended_at);
\ No newline at end of file
+CREATE INDEX if not EXISTS idx_sponsorship_history_dates ON public.sponsorship_history(started_at, ended_at);
+
+
+-- Global median of the lowest sponsor tier cost, used to cap estimated earnings.
+-- Refreshed by the ingest worker when a tier cost changes (refreshMedianSponsorCost).
+create table public.sponsor_cost_median (
+  id smallint not null default 1,
+  median_cost numeric null,
+  updated_at timestamp with time zone not null default now(),
+  constraint sponsor_cost_median_pkey primary key (id),
+  constraint sponsor_cost_median_single_row check (id = 1)
+) TABLESPACE pg_default;
+
+-- Serves the median computation as an index-only scan
+create index IF not exists idx_users_min_sponsor_cost on public.users using btree (min_sponsor_cost) TABLESPACE pg_default
+where (min_sponsor_cost > 0);
+
+INSERT INTO public.sponsor_cost_median (id, median_cost)
+SELECT 1, PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY min_sponsor_cost)
+FROM public.users
+WHERE min_sponsor_cost > 0
+ON CONFLICT (id) DO NOTHING;
+
+
+-- Persisted per-user sponsorship counts, maintained by the ingest worker (syncSponsors,
+-- syncSponsorships, finalizeUserScrape) in the same transaction as the edge changes.
+create table public.user_sponsorship_stats (
+  user_id bigint not null,
+  public_sponsors bigint not null default 0,
+  private_sponsors bigint not null default 0,
+  total_sponsors bigint generated always as (public_sponsors + private_sponsors) stored,
+  total_sponsoring bigint not null default 0,
+  -- total_sponsors * lowest tier cost, capped at sponsor_cost_median
+  estimated_earnings numeric null,
+  -- Bumped whenever this user's sponsors change; keys the API's cached sponsorship timelines
+  history_version bigint not null default 0,
+  updated_at timestamp with time zone not null default now(),
+  constraint user_sponsorship_stats_pkey primary key (user_id),
+  constraint user_sponsorship_stats_user_id_fkey foreign KEY (user_id) references users (id) on update CASCADE on delete CASCADE
+) TABLESPACE pg_default;
+
+-- user_id is the keyset tiebreaker (u.id) of the leaderboard sorts
+create index IF not exists idx_user_sponsorship_stats_sponsors on public.user_sponsorship_stats using btree (total_sponsors DESC, user_id) TABLESPACE pg_default;
+
+create index IF not exists idx_user_sponsorship_stats_sponsoring on public.user_sponsorship_stats using btree (total_sponsoring DESC, user_id) TABLESPACE pg_default;
+
+create index IF not exists idx_user_sponsorship_stats_earnings on public.user_sponsorship_stats using btree (estimated_earnings DESC, user_id) TABLESPACE pg_default;
+
+-- Backfill for databases that already hold sponsorship data
+INSERT INTO public.user_sponsorship_stats (user_id, public_sponsors, private_sponsors, total_sponsoring, estimated_earnings)
+SELECT
+  c.user_id,
+  c.public_sponsors,
+  c.private_sponsors,
+  c.total_sponsoring,
+  LEAST(
+    (CASE WHEN c.min_sponsor_cost > 0 THEN c.min_sponsor_cost ELSE m.median_cost END),
+    m.median_cost
+  ) * (c.public_sponsors + c.private_sponsors)
+FROM (
+  SELECT
+    u.id AS user_id,
+    u.min_sponsor_cost,
+    (SELECT COUNT(s.sponsor_id) FROM public.sponsorship s WHERE s.sponsored_id = u.id) AS public_sponsors,
+    COALESCE(u.private_sponsor_count, 0) AS private_sponsors,
+    (SELECT COUNT(s.sponsored_id) FROM public.sponsorship s WHERE s.sponsor_id = u.id) AS total_sponsoring
+  FROM public.users u
+) c
+LEFT JOIN public.sponsor_cost_median m ON m.id = 1
+ON CONFLICT (user_id) DO NOTHING;
+
+
+-- Single-row write generation, bumped by the ingest worker (finalizeUserScrape) on every
+-- committed scrape. The API uses it to invalidate cached statistics.
+create table public.data_generation (
+  id smallint not null default 1,
+  generation bigint not null default 0,
+  updated_at timestamp with time zone not null default now(),
+  constraint data_generation_pkey primary key (id),
+  constraint data_generation_single_row check (id = 1)
+) TABLESPACE pg_default;
+
+INSERT INTO public.data_generation (id, generation) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
+
+-- Country resolved for each cleaned location string (clean_location), shared by all ingest
+-- workers so a location is sent to Nominatim once. NULL country: the string did not resolve
+-- (geocoded again after GEOCODE_NEGATIVE_TTL_DAYS).
+create table public.geocode_cache (
+  location text not null,
+  country text null,
+  updated_at timestamp with time zone not null default now(),
+  constraint geocode_cache_pkey primary key (location)
+) TABLESPACE pg_default;
+
+
+-- Gender inferred for a (normalized first name, country) pair, shared by all ingest workers
+-- so a pair is sent to the inference model once. country is '' when the location is unknown.
+create table public.gender_cache (
+  first_name text not null,
+  country text not null default '',
+  gender text not null,
+  updated_at timestamp with time zone not null default now(),
+  constraint gender_cache_pkey primary key (first_name, country)
+) TABLESPACE pg_default;
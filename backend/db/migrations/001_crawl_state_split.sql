@@ -0,0 +1,16 @@
+-- One-time migration for databases created before crawl_state existed: moves completed
+-- entries out of the hot queue. Run once after applying db-schema.sql to an existing
+-- database, e.g. psql "$DATABASE_URL" -f backend/db/migrations/001_crawl_state_split.sql
+
+BEGIN;
+
+INSERT INTO public.crawl_state (github_id, priority, completed_at)
+SELECT q.github_id, q.priority, COALESCE(u.last_scraped, q.created_at)
+FROM public.queue q
+LEFT JOIN public.users u ON u.github_id = q.github_id
+WHERE q.status = 'completed' AND q.github_id IS NOT NULL
+ON CONFLICT (github_id) DO NOTHING;
+
+DELETE FROM public.queue WHERE status = 'completed';
+
+COMMIT;
@@ -0,0 +1,75 @@
+# This module maintains the data_generation counter, a single row that is bumped
+# whenever the ingest worker commits new data. Readers compare generations to know
+# when results derived from the database (e.g. cached statistics) are stale.
+
+import os
+import time
+import threading
+
+# Seconds between generation bumps of one ingest process (optional, see README)
+DATA_GENERATION_BUMP_INTERVAL = float(os.getenv("DATA_GENERATION_BUMP_INTERVAL", 5))
+
+# Monotonic time of the last committed bump of this process, and whether data was
+# committed since then
+_last_bump = None
+_pending = False
+_bump_lock = threading.Lock()
+
+
+# Bump the write generation inside the caller's transaction (does not commit)
+def bumpDataGeneration(db):
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO data_generation (id, generation, updated_at)
+            VALUES (1, 1, NOW())
+            ON CONFLICT (id) DO UPDATE SET
+                generation = data_generation.generation + 1,
+                updated_at = EXCLUDED.updated_at;
+            """
+        )
+    return
+
+
+# Record that the caller has just committed new data. Every bump invalidates all cached
+# results, so bumps of this process are at most `min_interval` seconds apart: a change that
+# comes too soon stays pending until a later call or flushDataGeneration publishes it.
+def markDataChanged(db, min_interval=DATA_GENERATION_BUMP_INTERVAL):
+    global _pending
+    with _bump_lock:
+        _pending = True
+    return flushDataGeneration(db, min_interval)
+
+
+# Bump and commit the generation if changes are pending and the last bump is at least
+# `min_interval` seconds old (0 publishes them right away). Returns True when bumped.
+def flushDataGeneration(db, min_interval=DATA_GENERATION_BUMP_INTERVAL):
+    global _pending, _last_bump
+    with _bump_lock:
+        if not _pending:
+            return False
+        if _last_bump is not None and time.monotonic() - _last_bump < min_interval:
+            return False
+        _pending = False
+
+    try:
+        bumpDataGeneration(db)
+        db.commit()
+    except Exception:
+        # Still unpublished, the next flush retries
+        with _bump_lock:
+            _pending = True
+        raise
+
+    # Only a committed bump starts the next interval
+    with _bump_lock:
+        _last_bump = time.monotonic()
+    return True
+
+
+# Return the current write generation (0 when nothing has been written yet)
+def getDataGeneration(db):
+    with db.cursor() as cur:
+        cur.execute("SELECT generation FROM data_generation WHERE id = 1;")
+        row = cur.fetchone()
+    return row[0] if row else 0
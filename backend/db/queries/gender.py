@@ -0,0 +1,46 @@
+# This module maintains the gender_cache table: the gender inferred for every
+# (normalized first name, country) pair the ingest worker has classified so far.
+
+
+# Return the cached gender of a (first_name, country) pair, or None when it was never inferred
+def getCachedGender(first_name, country, db):
+    with db.cursor() as cur:
+        cur.execute(
+            "SELECT gender FROM gender_cache WHERE first_name = %s AND country = %s;",
+            (first_name, country),
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+# Store inferred genders, `rows` holds (first_name, country, gender) tuples, and commit
+def saveGenders(rows, db):
+    with db.cursor() as cur:
+        cur.executemany(
+            """
+            INSERT INTO gender_cache (first_name, country, gender, updated_at)
+            VALUES (%s, %s, %s, NOW())
+            ON CONFLICT (first_name, country) DO UPDATE SET
+                gender = EXCLUDED.gender,
+                updated_at = EXCLUDED.updated_at;
+            """,
+            rows,
+        )
+    db.commit()
+    return
+
+
+# Gender counts of the users whose pronouns were scraped, as (first name, country, gender, count)
+# rows. Names are only split at the first space here, they are normalized by the caller.
+def getPronounGenderCounts(db):
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            SELECT split_part(btrim(name), ' ', 1), COALESCE(location, ''), gender::text, COUNT(*)
+            FROM users
+            WHERE has_pronouns AND type = 'User' AND name IS NOT NULL
+              AND gender::text IN ('Male', 'Female', 'Other')
+            GROUP BY 1, 2, 3;
+            """
+        )
+        return cur.fetchall()
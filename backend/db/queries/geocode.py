@@ -0,0 +1,36 @@
+# This module maintains the geocode_cache table: the country resolved for every cleaned
+# location string (see clean_location) the ingest worker has geocoded so far. Strings that
+# did not resolve are stored with a NULL country so they are not looked up again.
+
+
+# Return (found, country) for a cleaned location string. Unresolved entries only count as
+# found for `negative_ttl_days`, after that the location is geocoded again.
+def getGeocodedCountry(location, negative_ttl_days, db):
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            SELECT country FROM geocode_cache
+            WHERE location = %s
+              AND (country IS NOT NULL OR updated_at > NOW() - make_interval(days => %s));
+            """,
+            (location, negative_ttl_days),
+        )
+        row = cur.fetchone()
+    return (True, row[0]) if row else (False, None)
+
+
+# Store the country (None when it did not resolve) of a cleaned location string and commit
+def saveGeocodedCountry(location, country, db):
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO geocode_cache (location, country, updated_at)
+            VALUES (%s, %s, NOW())
+            ON CONFLICT (location) DO UPDATE SET
+                country = EXCLUDED.country,
+                updated_at = EXCLUDED.updated_at;
+            """,
+            (location, country),
+        )
+    db.commit()
+    return
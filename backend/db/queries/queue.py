@@ -3,11 +3,24 @@ from dotenv import load_dotenv
 import os
 
 # Functional Imports
-import requests
+import logging
+import time
+from backend.utils.github_api import token_pool, waitForBudget
+from backend.utils.http_sessions import get_session
+from backend.utils.token_pool import GRAPHQL
 
 
 load_dotenv()
-GITHUB_TOKEN = os.getenv("PAT")
+
+# How long a claimed user stays reserved for a worker before others may reclaim it
+QUEUE_LEASE_SECONDS = int(os.getenv("QUEUE_LEASE_SECONDS", 900))
+# Days since their last crawl before users are requeued when the queue runs empty
+QUEUE_REQUEUE_AFTER_DAYS = int(os.getenv("QUEUE_REQUEUE_AFTER_DAYS", 1))
+# Crawled users requeued at most per empty queue
+QUEUE_REQUEUE_BATCH = int(os.getenv("QUEUE_REQUEUE_BATCH", 1000))
+
+# Longest wait for a paced GitHub token inside an API request before answering 429
+MAX_PACING_WAIT = 5
 
 
 # def batchGetQueue(db):
@@ -46,12 +59,17 @@ def batchAddQueue(github_ids, priority, db):
         execute_values(cur, insert_users_query, user_values)
 
     # ADD TO QUEUE (Safe because users definitely exist)
+    # Users that were already crawled live in crawl_state, they come back via requeue
     with db.cursor() as cur:
         values = [(gid, priority) for gid in github_ids]
 
         query = """
             INSERT INTO queue (github_id, priority)
-            VALUES %s
+            SELECT v.github_id, v.priority
+            FROM (VALUES %s) AS v (github_id, priority)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM crawl_state c WHERE c.github_id = v.github_id
+            )
             ON CONFLICT (github_id) DO UPDATE
             SET priority = GREATEST(queue.priority, EXCLUDED.priority),
                 status = CASE 
@@ -62,37 +80,57 @@ def batchAddQueue(github_ids, priority, db):
         """
         execute_values(cur, query, values)
 
+        # Rediscovered crawled users keep the highest priority they were seen at
+        cur.execute(
+            """
+            UPDATE crawl_state
+            SET priority = %s
+            WHERE github_id = ANY(%s)
+              AND (priority IS NULL OR priority < %s);
+            """,
+            (priority, list(github_ids), priority),
+        )
+
     db.commit()
     cur.close()
     return
 
 
-def batchRequeue(db):
+# Put the longest-uncrawled users back in the queue once their last crawl is older than
+# min_age_days, at most batch_size per call (crawl_state itself is left untouched).
+# Returns the number of users requeued.
+def batchRequeue(db, min_age_days=QUEUE_REQUEUE_AFTER_DAYS, batch_size=QUEUE_REQUEUE_BATCH):
     with db.cursor() as cur:
         cur.execute(
             """
-            UPDATE queue SET
-            status = 'pending'
-            WHERE status = 'completed';
-            """
+            INSERT INTO queue (github_id, priority)
+            SELECT c.github_id, c.priority
+            FROM crawl_state c
+            WHERE c.completed_at < NOW() - make_interval(days => %s)
+              AND NOT EXISTS (SELECT 1 FROM queue q WHERE q.github_id = c.github_id)
+            ORDER BY c.completed_at
+            LIMIT %s
+            ON CONFLICT (github_id) DO NOTHING;
+            """,
+            (min_age_days, batch_size),
         )
+        requeued = cur.rowcount
     db.commit()
-    print("Batch requeued all users")
-    return
+    logging.info(f"Requeued {requeued} users crawled over {min_age_days} days ago")
+    return requeued
 
 
-# Update status of users to "pending" to crawl again if they exceed days_old created at time
-# Resets the created_at time to current time, enqueing them for scraping again (after current queue)
+# Enqueue crawled users again once their last crawl is older than days_old
+# New queue rows get created_at = NOW(), enqueing them for scraping again (after current queue)
 def enqueueStaleUsers(db, days_old):
     with db.cursor() as cur:
         cur.execute(
             """
-            UPDATE queue
-            SET status = 'pending', created_at = NOW()
-            FROM users
-            WHERE queue.github_id = users.github_id
-            AND queue.status = 'completed'
-            AND users.last_scraped < NOW() - INTERVAL '%s days'
+            INSERT INTO queue (github_id, priority)
+            SELECT github_id, priority
+            FROM crawl_state
+            WHERE completed_at < NOW() - make_interval(days => %s)
+            ON CONFLICT (github_id) DO NOTHING;
             """,
             (days_old,),
         )
@@ -100,6 +138,7 @@ def enqueueStaleUsers(db, days_old):
 
 
 # Gets the first user inside the queue who has status="pending"
+# Read only, the user is NOT claimed (workers use claimFromQueue)
 def getFirstInQueue(db):
     cur = db.cursor()
     cur.execute(
@@ -118,31 +157,142 @@ def getFirstInQueue(db):
     return None
 
 
+# Atomically claim up to batch_size pending users for worker_id.
+# Claimed users are set to "processing" with a lease; users whose lease has expired
+# (e.g. their worker died) are returned to "pending" first so they can be claimed again.
+# SKIP LOCKED lets concurrent workers claim disjoint users without waiting on each other.
+def claimFromQueue(worker_id, db, batch_size=1, lease_seconds=QUEUE_LEASE_SECONDS):
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE queue SET
+                status = 'pending',
+                claimed_by = NULL,
+                lease_expires_at = NULL
+            WHERE status = 'processing'
+              AND lease_expires_at < NOW();
+            """
+        )
+        if cur.rowcount:
+            logging.info(f"Reclaimed {cur.rowcount} expired queue leases")
+
+        cur.execute(
+            """
+            WITH next_users AS (
+                SELECT id FROM queue
+                WHERE status = 'pending'
+                ORDER BY priority DESC, created_at ASC
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE queue q SET
+                status = 'processing',
+                claimed_by = %s,
+                lease_expires_at = NOW() + make_interval(secs => %s)
+            FROM next_users
+            WHERE q.id = next_users.id
+            RETURNING q.github_id, q.priority, q.created_at;
+            """,
+            (batch_size, worker_id, lease_seconds),
+        )
+        rows = cur.fetchall()
+    db.commit()
+
+    # RETURNING has no defined order, hand claims back in the claim order: highest priority
+    # first, with NULL priorities ahead of all others like ORDER BY priority DESC (and its index)
+    rows.sort(key=lambda row: (row[1] is not None, -(row[1] or 0), row[2]))
+    return [{"github_id": row[0], "priority": row[1]} for row in rows]
+
+
+# Extend the lease on a claimed user, returns False if worker_id no longer holds it
+def renewLease(github_id, worker_id, db, lease_seconds=QUEUE_LEASE_SECONDS):
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE queue SET
+                lease_expires_at = NOW() + make_interval(secs => %s)
+            WHERE github_id = %s
+              AND status = 'processing'
+              AND claimed_by = %s;
+            """,
+            (lease_seconds, github_id, worker_id),
+        )
+        renewed = cur.rowcount > 0
+    db.commit()
+    return renewed
+
+
+# Hand every user still claimed by worker_id back to the queue (used on shutdown)
+def releaseClaims(worker_id, db):
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE queue SET
+                status = 'pending',
+                claimed_by = NULL,
+                lease_expires_at = NULL
+            WHERE status = 'processing'
+              AND claimed_by = %s;
+            """,
+            (worker_id,),
+        )
+        released = cur.rowcount
+    db.commit()
+    return released
+
+
 # Update the status of the passed in user in the DB
-def updateStatus(github_id: int, status, db, priority=None):
+# Completed users leave the queue for crawl_state, keeping the pending set small
+# With worker_id, only a claim still held by that worker is updated (a worker whose lease
+# expired must not complete a user another worker has reclaimed). Returns True if updated.
+def updateStatus(github_id: int, status, db, priority=None, worker_id=None):
+    claim_filter = "" if worker_id is None else "AND status = 'processing' AND claimed_by = %s"
+    claim_params = () if worker_id is None else (worker_id,)
     with db.cursor() as cur:
-        if priority is not None:
+        if status == "completed":
+            cur.execute(
+                f"""
+                WITH done AS (
+                    DELETE FROM queue
+                    WHERE github_id = %s {claim_filter}
+                    RETURNING github_id, priority
+                )
+                INSERT INTO crawl_state (github_id, priority, completed_at)
+                SELECT github_id, COALESCE(%s, priority), NOW()
+                FROM done
+                ON CONFLICT (github_id) DO UPDATE SET
+                    priority = EXCLUDED.priority,
+                    completed_at = EXCLUDED.completed_at;
+                """,
+                (github_id, *claim_params, priority),
+            )
+        elif priority is not None:
             cur.execute(
-                """
+                f"""
                 UPDATE queue SET
                     status = %s,
-                    priority = %s
-                WHERE github_id = %s
+                    priority = %s,
+                    claimed_by = NULL,
+                    lease_expires_at = NULL
+                WHERE github_id = %s {claim_filter}
                 """,
-                (status, priority, github_id),
+                (status, priority, github_id, *claim_params),
             )
         else:
             cur.execute(
-                """
+                f"""
                 UPDATE queue SET
-                    status = %s
-                WHERE github_id = %s
+                    status = %s,
+                    claimed_by = NULL,
+                    lease_expires_at = NULL
+                WHERE github_id = %s {claim_filter}
                 """,
-                (status, github_id),
+                (status, github_id, *claim_params),
             )
+        updated = cur.rowcount > 0
         db.commit()
         print(f"Updated user status\n")
-        return
+        return updated
 
 
 # Attempt to add a single username to the queue, check if the user is a real github user, and does not already exist
@@ -165,13 +315,21 @@ def addToQueue(username, db):
         "variables": {"username": username},
     }
 
+    # Wait out the pool's short pacing gaps, but never a rate limit reset inside an API request
+    token, ready_at = token_pool.pick(GRAPHQL)
+    while ready_at is not None:
+        if ready_at - time.time() > MAX_PACING_WAIT:
+            return {"success": False, "error": "GitHub API rate limit reached, try again later"}, 429
+        waitForBudget(ready_at)
+        token, ready_at = token_pool.pick(GRAPHQL)
+
     headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
+        "Authorization": f"Bearer {token}",
         "Content-Type": "application/json",
     }
-    response = requests.post(
-        "https://api.github.com/graphql", json=graphql_query, headers=headers
-    )
+    url = "https://api.github.com/graphql"
+    response = get_session(url).post(url, json=graphql_query, headers=headers)
+    token_pool.update(token, GRAPHQL, response.headers)
 
     if response.status_code != 200:
         return {"success": False, "error": "GitHub API error"}, response.status_code
@@ -195,12 +353,15 @@ def addToQueue(username, db):
 
     # Add user to queue with priority 5 (average priority case)
     with db.cursor() as cur:
-        # Check if github_id already exists in the queue
+        # Check if github_id already exists in the queue (or was already crawled)
         cur.execute(
             """
             SELECT 1 FROM queue WHERE github_id = %s
+            UNION ALL
+            SELECT 1 FROM crawl_state WHERE github_id = %s
+            LIMIT 1
             """,
-            (github_id,),
+            (github_id, github_id),
         )
         if cur.fetchone():
             return {"success": False, "error": "User already in queue"}, 409
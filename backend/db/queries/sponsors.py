@@ -1,11 +1,15 @@
 from backend.db.queries.users import batchGetUserId
+from backend.db.queries.sponsorship_stats import (
+    refreshSponsorshipStats,
+    bumpSponsorHistoryVersion,
+)
 from psycopg2.extras import execute_values
 import logging
 
 # This module provides functions for managing sponsorship relationships between users in the database.
 
 
-# Batch create a sponsored relations for a specific user
+# Batch create a sponsored relations for a specific user (committed by the caller)
 def createSponsors(sponsored, sponsor_arr, db):
     entries = [(sponsor, sponsored) for sponsor in sponsor_arr]
 
@@ -18,12 +22,10 @@ def createSponsors(sponsored, sponsor_arr, db):
             """,
             entries,
         )
-    db.commit()
-    cur.close()
     return
 
 
-# Batch create all sponsoring relations for a specific user
+# Batch create all sponsoring relations for a specific user (committed by the caller)
 def createSponsoring(sponsor, sponsored_arr, db):
 
     entries = [(sponsor, sponsored) for sponsored in sponsored_arr]
@@ -37,13 +39,13 @@ def createSponsoring(sponsor, sponsored_arr, db):
             """,
             entries,
         )
-    db.commit()
-    cur.close()
     return
 
 
+# Create placeholder users for unknown GitHub IDs (committed by the caller, with the sync)
 def _ensure_users_exist(db, github_ids: list[int]):
-    ids = list({i for i in github_ids if i is not None})
+    # Sorted, so concurrent syncs insert overlapping users in the same order
+    ids = sorted({i for i in github_ids if i is not None})
     if not ids:
         return
     with db.cursor() as cur:
@@ -57,7 +59,6 @@ def _ensure_users_exist(db, github_ids: list[int]):
             """,
             tuples,
         )
-    db.commit()
 
 
 # Handles comparison logic between old sponsors and newly crawled, removing where applicable
@@ -114,6 +115,14 @@ def syncSponsors(user_id, latest_sponsor_ids, db):
     if sponsors_to_add:
         createSponsors(sponsored_row_id, sponsor_arr=list(sponsors_to_add), db=db)
         logging.info("Created Sponsor Relations")
+
+    # Keep the persisted counts in step with the edges, in the same transaction
+    refreshSponsorshipStats(
+        [sponsored_row_id, *sponsors_to_remove, *sponsors_to_add], db
+    )
+    # Invalidates the cached sponsorship timeline of the sponsored user
+    if sponsors_to_remove or sponsors_to_add:
+        bumpSponsorHistoryVersion([sponsored_row_id], db)
     db.commit()
     return
 
@@ -168,5 +177,12 @@ def syncSponsorships(user_id, latest_sponsored_ids, db):
     if sponsoring_to_add:
         createSponsoring(sponsor_row_id, sponsored_arr=list(sponsoring_to_add), db=db)
         logging.info("Created Sponsoring Relations")
+
+    # Keep the persisted counts in step with the edges, in the same transaction
+    refreshSponsorshipStats(
+        [sponsor_row_id, *sponsoring_to_remove, *sponsoring_to_add], db
+    )
+    # Timelines are per sponsored user, so invalidate every one whose sponsors changed
+    bumpSponsorHistoryVersion([*sponsoring_to_remove, *sponsoring_to_add], db)
     db.commit()
     return
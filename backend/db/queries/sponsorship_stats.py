@@ -0,0 +1,199 @@
+# This module maintains the user_sponsorship_stats table, a persisted per-user
+# summary of the sponsorship edge table (public/private sponsors, sponsoring) and
+# of the estimated monthly earnings derived from it.
+# Writers refresh only the rows they touch, inside their own transaction, so the
+# API can join against the summary instead of aggregating `sponsorship` per request.
+
+
+# Estimated monthly earnings: sponsors * (lowest tier, capped at the global median tier cost)
+# The stored median must be joined as `m` (sponsor_cost_median)
+def _estimated_earnings_sql(min_cost, total_sponsors):
+    return f"""(
+        LEAST(
+            (CASE WHEN {min_cost} > 0 THEN {min_cost} ELSE m.median_cost END),
+            m.median_cost
+        ) * {total_sponsors}
+    )"""
+
+
+# Recompute the summary rows for the passed in internal users.id values (does not commit)
+def refreshSponsorshipStats(user_row_ids, db):
+    # Sorted, so concurrent writers always lock rows in the same order (no deadlocks)
+    ids = sorted({i for i in user_row_ids if i is not None})
+    if not ids:
+        return
+
+    with db.cursor() as cur:
+        # Lock the summary rows (created empty when missing) before counting. A writer that
+        # syncs edges of the same users waits here until the other one commits, and then
+        # counts with a fresh snapshot, so a count read before that commit never wins.
+        cur.execute(
+            """
+            INSERT INTO user_sponsorship_stats (user_id)
+            SELECT u.id FROM users u WHERE u.id = ANY(%s) ORDER BY u.id
+            ON CONFLICT (user_id) DO NOTHING;
+            """,
+            (ids,),
+        )
+        cur.execute(
+            """
+            SELECT user_id FROM user_sponsorship_stats
+            WHERE user_id = ANY(%s)
+            ORDER BY user_id
+            FOR UPDATE;
+            """,
+            (ids,),
+        )
+        cur.execute(
+            f"""
+            INSERT INTO user_sponsorship_stats (
+                user_id,
+                public_sponsors,
+                private_sponsors,
+                total_sponsoring,
+                estimated_earnings,
+                updated_at
+            )
+            SELECT
+                c.id,
+                c.public_sponsors,
+                c.private_sponsors,
+                c.total_sponsoring,
+                {_estimated_earnings_sql("c.min_sponsor_cost", "(c.public_sponsors + c.private_sponsors)")},
+                NOW()
+            FROM (
+                SELECT
+                    u.id,
+                    u.min_sponsor_cost,
+                    (SELECT COUNT(s.sponsor_id) FROM sponsorship s WHERE s.sponsored_id = u.id) AS public_sponsors,
+                    COALESCE(u.private_sponsor_count, 0) AS private_sponsors,
+                    (SELECT COUNT(s.sponsored_id) FROM sponsorship s WHERE s.sponsor_id = u.id) AS total_sponsoring
+                FROM users u
+                WHERE u.id = ANY(%s)
+            ) c
+            LEFT JOIN sponsor_cost_median m ON m.id = 1
+            ON CONFLICT (user_id) DO UPDATE SET
+                public_sponsors = EXCLUDED.public_sponsors,
+                private_sponsors = EXCLUDED.private_sponsors,
+                total_sponsoring = EXCLUDED.total_sponsoring,
+                estimated_earnings = EXCLUDED.estimated_earnings,
+                updated_at = EXCLUDED.updated_at;
+            """,
+            (ids,),
+        )
+    return
+
+
+# Mark the sponsorship timelines of the passed in users as changed (does not commit)
+# Must run after refreshSponsorshipStats so every user has a summary row
+def bumpSponsorHistoryVersion(user_row_ids, db):
+    ids = list({i for i in user_row_ids if i is not None})
+    if not ids:
+        return
+
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE user_sponsorship_stats
+            SET history_version = history_version + 1
+            WHERE user_id = ANY(%s);
+            """,
+            (ids,),
+        )
+    return
+
+
+# Recompute the global median tier cost, and every user's estimated earnings only if
+# the median moved (does not commit). Returns True when the median shifted.
+def refreshMedianSponsorCost(db):
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            SELECT PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY min_sponsor_cost)
+            FROM users
+            WHERE min_sponsor_cost > 0;
+            """
+        )
+        median = cur.fetchone()[0]
+
+        # The upsert only returns a row when the stored median actually changed
+        cur.execute(
+            """
+            INSERT INTO sponsor_cost_median (id, median_cost, updated_at)
+            VALUES (1, %s, NOW())
+            ON CONFLICT (id) DO UPDATE SET
+                median_cost = EXCLUDED.median_cost,
+                updated_at = EXCLUDED.updated_at
+            WHERE sponsor_cost_median.median_cost IS DISTINCT FROM EXCLUDED.median_cost
+            RETURNING id;
+            """,
+            (median,),
+        )
+        if cur.fetchone() is None:
+            return False
+
+        # Only rewrite the rows whose estimate actually changes (users without sponsors or
+        # with a tier below both medians keep theirs), to avoid dead tuples and WAL
+        earnings_sql = _estimated_earnings_sql("u.min_sponsor_cost", "sc.total_sponsors")
+        cur.execute(
+            f"""
+            UPDATE user_sponsorship_stats sc SET
+                estimated_earnings = {earnings_sql}
+            FROM users u, sponsor_cost_median m
+            WHERE u.id = sc.user_id
+              AND m.id = 1
+              AND sc.estimated_earnings IS DISTINCT FROM {earnings_sql};
+            """
+        )
+    return True
+
+
+# Rebuild the whole summary table from the edge table (used for backfills / repairs)
+def rebuildSponsorshipStats(db):
+    refreshMedianSponsorCost(db)
+    earnings_sql = _estimated_earnings_sql(
+        "u.min_sponsor_cost",
+        "(COALESCE(sc.public_sponsors, 0) + COALESCE(u.private_sponsor_count, 0))",
+    )
+    with db.cursor() as cur:
+        cur.execute(
+            f"""
+            WITH sponsored_counts AS (
+                SELECT sponsored_id AS user_id, COUNT(sponsor_id) AS public_sponsors
+                FROM sponsorship
+                GROUP BY sponsored_id
+            ),
+            sponsoring_counts AS (
+                SELECT sponsor_id AS user_id, COUNT(sponsored_id) AS total_sponsoring
+                FROM sponsorship
+                GROUP BY sponsor_id
+            )
+            INSERT INTO user_sponsorship_stats (
+                user_id,
+                public_sponsors,
+                private_sponsors,
+                total_sponsoring,
+                estimated_earnings,
+                updated_at
+            )
+            SELECT
+                u.id,
+                COALESCE(sc.public_sponsors, 0),
+                COALESCE(u.private_sponsor_count, 0),
+                COALESCE(gc.total_sponsoring, 0),
+                {earnings_sql},
+                NOW()
+            FROM users u
+            LEFT JOIN sponsored_counts sc ON sc.user_id = u.id
+            LEFT JOIN sponsoring_counts gc ON gc.user_id = u.id
+            LEFT JOIN sponsor_cost_median m ON m.id = 1
+            ON CONFLICT (user_id) DO UPDATE SET
+                public_sponsors = EXCLUDED.public_sponsors,
+                private_sponsors = EXCLUDED.private_sponsors,
+                total_sponsoring = EXCLUDED.total_sponsoring,
+                estimated_earnings = EXCLUDED.estimated_earnings,
+                updated_at = EXCLUDED.updated_at;
+            """
+        )
+    db.commit()
+    return
@@ -4,18 +4,28 @@ import os
 
 # DB Query imports
 from backend.db.queries.queue import deleteFromQueue
+from backend.db.queries.sponsorship_stats import (
+    refreshSponsorshipStats,
+    refreshMedianSponsorCost,
+    bumpSponsorHistoryVersion,
+)
+from backend.db.queries.data_generation import markDataChanged
 from backend.models.UserModel import UserModel
 
 # Functional Imports
-from backend.utils.github_api import getRequest, postRequest
-from openai import OpenAI
+from backend.utils.github_api import getRequest, postRequest, getRequestAsync
+from backend.utils.http_sessions import get_session
+from backend.utils.geocode_cache import geocode_cache, nominatim_spacer
+from backend.utils.gazetteer import gazetteer
+from backend.utils.gender_inference import gender_inference
 from datetime import datetime, timezone
 import requests
-import json
+import httpx
+import asyncio
 import re
 
 # Scraper Imports
-from playwright.sync_api import sync_playwright
+from backend.utils.browser_pool import browser_pool
 
 # Logging Imports
 import logging
@@ -23,14 +33,18 @@ import logging
 # Load sensitive variables
 load_dotenv()
 EMAIL = os.getenv("email")
-API_KEY = os.getenv("API_KEY")
 URL = "https://api.github.com/graphql"
 
+# Returned instead of user data when GitHub answers a conditional profile refresh with 304
+NOT_MODIFIED = object()
+
 
 # File for query logic that will be used/imported into the scraper
-def createUser(github_id: int, db):
+# `user` may be passed in when it was already fetched (async ingest), else it is fetched here
+def createUser(github_id: int, db, user=None):
 
-    user = getUserData(github_id, db)
+    if user is None:
+        user = getUserData(github_id, db)
 
     # Check if user is None before proceeding
     if user is None:
@@ -63,9 +77,11 @@ def createUser(github_id: int, db):
                 email,
                 last_scraped,
                 is_enriched,
-                github_created_at
+                github_created_at,
+                etag,
+                last_modified
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             ON CONFLICT (github_id) DO UPDATE SET
                 username = EXCLUDED.username,
                 name = EXCLUDED.name,
@@ -86,7 +102,9 @@ def createUser(github_id: int, db):
                 email = EXCLUDED.email,
                 last_scraped = EXCLUDED.last_scraped,
                 is_enriched = EXCLUDED.is_enriched,
-                github_created_at = EXCLUDED.github_created_at;
+                github_created_at = EXCLUDED.github_created_at,
+                etag = EXCLUDED.etag,
+                last_modified = EXCLUDED.last_modified;
             """,
             (
                 user.github_id,
@@ -110,6 +128,8 @@ def createUser(github_id: int, db):
                 user.last_scraped,
                 user.is_enriched,
                 user.github_created_at,
+                user.etag,
+                user.last_modified,
             ),
         )
         # Get the user id
@@ -129,12 +149,13 @@ def createUser(github_id: int, db):
 
 
 # User already exists from previous sponsorship relation, run Github API request, collect and update user data
-def enrichUser(github_id: int, db, enriched=False, identity=None):
+# `user` may be passed in when it was already fetched (async ingest), else it is fetched here
+def enrichUser(github_id: int, db, enriched=False, identity=None, user=None):
 
     try:
-        if not enriched:
+        if user is None and not enriched:
             user = getUserData(github_id=github_id, db=db)
-        else:
+        elif user is None:
             user = getUserData(
                 github_id=github_id, db=db, is_enriched=enriched, identity=identity
             )
@@ -149,6 +170,11 @@ def enrichUser(github_id: int, db, enriched=False, identity=None):
         logging.info(f"No user data returned for {github_id}, skipping enrichment")
         return None
 
+    # Profile unchanged since the last refresh: keep the stored row as it is
+    if user is NOT_MODIFIED:
+        logging.info(f"Profile of {github_id} not modified, skipping enrichment")
+        return getStoredUser(github_id, db)
+
     with db.cursor() as cur:
 
         cur.execute(
@@ -192,7 +218,9 @@ def enrichUser(github_id: int, db, enriched=False, identity=None):
                 email = %s,
                 last_scraped = %s,
                 is_enriched = %s,
-                github_created_at = %s
+                github_created_at = %s,
+                etag = %s,
+                last_modified = %s
             WHERE github_id = %s
             """,
             (
@@ -217,6 +245,8 @@ def enrichUser(github_id: int, db, enriched=False, identity=None):
                 user.last_scraped,
                 user.is_enriched,
                 user.github_created_at,
+                user.etag,
+                user.last_modified,
                 user.github_id,
             ),
         )
@@ -245,9 +275,12 @@ def batchCreateUser(github_ids, db):
     return
 
 
+# Returns NOT_MODIFIED when the stored profile of an enriched user is still current
 def getUserData(github_id: int, db, is_enriched=False, identity=None):
     try:
-        data = getGithubData(github_id=github_id, db=db)
+        data = getGithubData(github_id=github_id, db=db, identity=identity)
+        if data is NOT_MODIFIED:
+            return NOT_MODIFIED
         if not data:
             return None
 
@@ -256,55 +289,7 @@ def getUserData(github_id: int, db, is_enriched=False, identity=None):
         if user.location is not None:
             user.location = getLocation(user.location)
 
-        # If user type is User
-        if user.type == "User":
-            # safe identity access (identity expected to be dict or None)
-            prev_has_pronouns = False
-            prev_gender = None
-            if isinstance(identity, dict):
-                prev_has_pronouns = bool(identity.get("pronouns", False))
-                prev_gender = identity.get("gender", None)
-
-            # Preset variables, if GitHub is not provided for scraping, function will skip pronouns
-            # and fall back on gpt-4o-mini query
-            has_pronouns = False
-            gender_data = None
-
-            # Conditionally scrape pronouns only if credentials are provided in the .env file
-            if os.getenv("gh_username") and os.getenv("gh_password"):
-                try:
-                    has_pronouns, gender_data = scrapePronouns(user.username)
-                except Exception as e:
-                    # Log the error but don't crash the whole process
-                    logging.error(f"Pronoun scraping failed for {user.username}: {e}")
-
-            user.has_pronouns = bool(has_pronouns)
-
-            if not is_enriched:
-                # initial enrichment: prefer explicit pronouns, else infer
-                if user.has_pronouns:
-                    user.gender = gender_data
-                else:
-                    user.gender = getGender(user.name, user.location)
-                user.is_enriched = True
-                return user
-
-            # This block handles re-enrichment of an existing user.
-            # If no new pronouns are found on the profile during the scrape:
-            if not user.has_pronouns:
-                # Preserve the previously stored gender and pronoun status.
-                user.gender = prev_gender
-                user.has_pronouns = prev_has_pronouns
-            else:
-                # If new pronouns are found, update the gender based on them.
-                user.gender = gender_data
-
-            user.is_enriched = True
-            return user
-
-        # Organization
-        user.is_enriched = True
-        return user
+        return applyGender(user, is_enriched, identity)
 
     except requests.exceptions.HTTPError as e:
         if getattr(e, "response", None) is not None and e.response.status_code == 404:
@@ -324,18 +309,102 @@ def getUserData(github_id: int, db, is_enriched=False, identity=None):
         return None
 
 
+# Async variant of getUserData for the async ingest worker. The GitHub and location
+# requests share the passed in httpx client, pronoun scraping and gender inference
+# (blocking) run in a thread. Raises ValueError when the user no longer exists on
+# GitHub; the caller removes them with removeMissingUser.
+async def getUserDataAsync(client, github_id: int, is_enriched=False, identity=None):
+    try:
+        data = await getGithubDataAsync(client, github_id, identity=identity)
+        if data is NOT_MODIFIED:
+            return NOT_MODIFIED
+        if not data:
+            return None
+
+        user = UserModel.from_api(data)
+
+        if user.location is not None:
+            user.location = await getLocationAsync(client, user.location)
+
+        return await asyncio.to_thread(applyGender, user, is_enriched, identity)
+
+    except ValueError:
+        raise
+    except Exception as e:
+        logging.error(
+            f"Unexpected error in getUserDataAsync for {github_id}: {e}", exc_info=True
+        )
+        return None
+
+
+# Set gender/pronoun fields on a freshly fetched user (scrapes pronouns, infers gender)
+def applyGender(user, is_enriched=False, identity=None):
+    # If user type is User
+    if user.type == "User":
+        # safe identity access (identity expected to be dict or None)
+        prev_has_pronouns = False
+        prev_gender = None
+        if isinstance(identity, dict):
+            prev_has_pronouns = bool(identity.get("pronouns", False))
+            prev_gender = identity.get("gender", None)
+
+        # Preset variables, if GitHub is not provided for scraping, function will skip pronouns
+        # and fall back on gpt-4o-mini query
+        has_pronouns = False
+        gender_data = None
+
+        # Conditionally scrape pronouns only if credentials are provided in the .env file
+        if os.getenv("gh_username") and os.getenv("gh_password"):
+            try:
+                has_pronouns, gender_data = scrapePronouns(user.username)
+            except Exception as e:
+                # Log the error but don't crash the whole process
+                logging.error(f"Pronoun scraping failed for {user.username}: {e}")
+
+        user.has_pronouns = bool(has_pronouns)
+
+        if not is_enriched:
+            # initial enrichment: prefer explicit pronouns, else infer
+            if user.has_pronouns:
+                user.gender = gender_data
+            else:
+                user.gender = getGender(user.name, user.location)
+            user.is_enriched = True
+            return user
+
+        # This block handles re-enrichment of an existing user.
+        # If no new pronouns are found on the profile during the scrape:
+        if not user.has_pronouns:
+            # Preserve the previously stored gender and pronoun status.
+            user.gender = prev_gender
+            user.has_pronouns = prev_has_pronouns
+        else:
+            # If new pronouns are found, update the gender based on them.
+            user.gender = gender_data
+
+        user.is_enriched = True
+        return user
+
+    # Organization
+    user.is_enriched = True
+    return user
+
+
 # Use GraphQL to query for users data based off their github ID
-def getGithubData(github_id: int, db):
+# With the stored validators in `identity` the request is conditional (304s are not rate limited)
+def getGithubData(github_id: int, db, identity=None):
     try:
         rest_url = f"https://api.github.com/user/{github_id}"
-        response = getRequest(url=rest_url)
+        response = getRequest(url=rest_url, headers=_conditionalHeaders(identity))
 
         # Ensure response is a Response object to satisfy Pylance type checker
         if not isinstance(response, requests.Response):
             raise ValueError(f"Expected requests.Response, got {type(response)}")
 
+        if response.status_code == 304:
+            return NOT_MODIFIED
         response.raise_for_status()
-        return response.json()
+        return _withValidators(response)
 
     # If user data does not exist in Github API, nuke from sponsorship database
     except requests.exceptions.HTTPError as e:
@@ -343,8 +412,7 @@ def getGithubData(github_id: int, db):
             logging.error(
                 f" has changed usernames or no longer exists on github, Nuke user from DB."
             )
-            deleteFromQueue(github_id, db)
-            deleteUser(github_id, db)
+            removeMissingUser(github_id, db)
             raise ValueError(f"User not found on GitHub.")
         else:
             logging.error(
@@ -353,6 +421,77 @@ def getGithubData(github_id: int, db):
     return None
 
 
+# Async variant of getGithubData, raises ValueError (without touching the DB) on a 404
+async def getGithubDataAsync(client, github_id: int, identity=None):
+    try:
+        rest_url = f"https://api.github.com/user/{github_id}"
+        response = await getRequestAsync(
+            client, rest_url, headers=_conditionalHeaders(identity)
+        )
+
+        if not isinstance(response, httpx.Response):
+            raise ValueError(f"Expected httpx.Response, got {type(response)}")
+
+        if response.status_code == 304:
+            return NOT_MODIFIED
+        return _withValidators(response)
+
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            logging.error(
+                f"GitHub user {github_id} has changed usernames or no longer exists on github."
+            )
+            raise ValueError(f"User not found on GitHub.")
+        logging.error(
+            f"An unexpected error occurred fetching user by ID {github_id}: {e}"
+        )
+    return None
+
+
+# If-None-Match / If-Modified-Since from the validators stored with an enriched user
+def _conditionalHeaders(identity):
+    if not isinstance(identity, dict) or not identity.get("is_enriched"):
+        return None
+    headers = {}
+    if identity.get("etag"):
+        headers["If-None-Match"] = identity["etag"]
+    if identity.get("last_modified"):
+        headers["If-Modified-Since"] = identity["last_modified"]
+    return headers or None
+
+
+# Profile JSON with the response validators added, they are stored with the user
+def _withValidators(response):
+    data = response.json()
+    data["etag"] = response.headers.get("ETag")
+    data["last_modified"] = response.headers.get("Last-Modified")
+    return data
+
+
+# Load the stored profile of a user as a UserModel (used when GitHub reports it unchanged)
+def getStoredUser(github_id: int, db):
+    with db.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                github_id, username, name, type, has_pronouns, gender, location,
+                avatar_url, profile_url, company, following, followers, hireable, bio,
+                public_repos, public_gists, twitter_username, email, private_sponsor_count,
+                last_scraped, is_enriched, github_created_at, etag, last_modified
+            FROM users WHERE github_id = %s LIMIT 1;
+            """,
+            (github_id,),
+        )
+        row = cur.fetchone()
+    return UserModel(*row) if row else None
+
+
+# Remove a user that no longer exists on GitHub from the queue and the users table
+def removeMissingUser(github_id: int, db):
+    deleteFromQueue(github_id, db)
+    deleteUser(github_id, db)
+
+
 # Attempts to remove words that may confuse the location API to pull country of origin for user
 def clean_location(location):
     if not location or location.strip() == "":
@@ -401,65 +540,119 @@ def getLocationByImportance(locations):
 
 
 # Take the location of the github user, use openstreetmap API to pull the country of origin
+# Common places resolve offline from the bundled gazetteer; other cleaned strings are
+# geocoded once, repeats come from the geocode cache (memory, then DB)
 def getLocation(location):
     location = clean_location(location)
-    if location:
-        url = f"https://nominatim.openstreetmap.org/search?q={location}&format=json&addressdetails=1"
-        headers = {
-            "User-Agent": f"github-sponsor-dashboard/1.0 ({EMAIL})",
-            "Accept-Language": "en",
-        }
-        res = requests.get(url=url, headers=headers)
-        if res.status_code == 200:
-            data = res.json()
-
-            # Check if we got a valid response structure
-            if data and "address" in data[0]:
-                address = data[0]["address"]
-
-                # Case 1: Standard Country found
-                if "country" in address:
-                    country = getLocationByImportance(data)
-                    return country
-
-                # Case 2: It's a continent
-                elif "continent" in address:
-                    # This may change in the future, but for now return none
-                    return None
-            else:
-                logging.warning(f"No location data found for '{location}'.")
-                return None
-        else:
-            logging.error(
-                f"OpenStreetMap.Org Request failed:", res.status_code, res.text
-            )
-            return None
-    return None
+    if not location:
+        return None
 
+    found, country = gazetteer.resolve(location)
+    if found:
+        return country
+
+    found, country = geocode_cache.lookup(location)
+    if found:
+        return country
+
+    # Nominatim's usage policy allows one request per second
+    nominatim_spacer.wait()
+    url = _nominatimUrl(location)
+    res = get_session(url).get(url=url, headers=_nominatimHeaders())
+    country = _countryFromNominatim(location, res)
+    # Failed requests are not cached, only answers (including "no country")
+    if res.status_code == 200:
+        geocode_cache.store(location, country)
+    return country
+
+
+# Lookups in flight in the async worker, concurrent users with the same location share one
+_pendingLocations = {}
+
+
+# Async variant of getLocation sharing the caller's httpx client
+async def getLocationAsync(client, location):
+    location = clean_location(location)
+    if not location:
+        return None
+
+    found, country = gazetteer.resolve(location)
+    if found:
+        return country
+
+    found, country = geocode_cache.get(location)
+    if found:
+        return country
+
+    pending = _pendingLocations.get(location)
+    if pending is None:
+        pending = asyncio.ensure_future(_resolveLocationAsync(client, location))
+        _pendingLocations[location] = pending
+        pending.add_done_callback(lambda _: _pendingLocations.pop(location, None))
+    # Shielded so one cancelled waiter does not cancel the lookup for the others
+    return await asyncio.shield(pending)
 
-# Scrapes the pronouns of a passed in user
-def scrapePronouns(name):
-    with sync_playwright() as p:
 
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
+async def _resolveLocationAsync(client, location):
+    found, country = await asyncio.to_thread(geocode_cache.lookup, location)
+    if found:
+        return country
 
-        url = f"https://github.com/{name}"
+    # Wait for this request's slot without holding up the event loop
+    await asyncio.sleep(nominatim_spacer.reserve())
+    res = await client.get(_nominatimUrl(location), headers=_nominatimHeaders())
+    country = _countryFromNominatim(location, res)
+    if res.status_code == 200:
+        await asyncio.to_thread(geocode_cache.store, location, country)
+    return country
 
-        context = browser.new_context(storage_state="auth.json")
-        page = context.new_page()
-        page.goto(url)
 
-        # content = page.content()
-        pronoun_span = page.query_selector("span[itemprop='pronouns']")
-        if pronoun_span:
-            pronouns = pronoun_span.inner_text()
-            has_pronouns, gender = extract_pronouns(pronouns)
+def _nominatimUrl(location):
+    return f"https://nominatim.openstreetmap.org/search?q={location}&format=json&addressdetails=1"
+
+
+def _nominatimHeaders():
+    return {
+        "User-Agent": f"github-sponsor-dashboard/1.0 ({EMAIL})",
+        "Accept-Language": "en",
+    }
+
+
+# Pull the country out of an openstreetmap search response
+def _countryFromNominatim(location, res):
+    if res.status_code == 200:
+        data = res.json()
+
+        # Check if we got a valid response structure
+        if data and "address" in data[0]:
+            address = data[0]["address"]
+
+            # Case 1: Standard Country found
+            if "country" in address:
+                country = getLocationByImportance(data)
+                return country
+
+            # Case 2: It's a continent
+            elif "continent" in address:
+                # This may change in the future, but for now return none
+                return None
         else:
-            has_pronouns, gender = False, None
+            logging.warning(f"No location data found for '{location}'.")
+            return None
+    else:
+        logging.error(
+            f"OpenStreetMap.Org Request failed: {res.status_code} {res.text}"
+        )
+        return None
+    return None
+
 
-        browser.close()
-        return has_pronouns, gender
+# Scrapes the pronouns of a passed in user with a page of the process' browser pool
+def scrapePronouns(name):
+    pronouns = browser_pool.pronouns(name)
+    if not pronouns:
+        return False, None
+    return extract_pronouns(pronouns)
 
 
 # Extracts the pronouns out of the pronoun span (users may have random words and pronouns mixed)
@@ -495,40 +688,10 @@ def extract_pronouns(text):
     return True, "Other"
 
 
-# Infer the gender of the username using the full name and current country (assuming place of origin for some users)
+# Infer the gender of the username using the first name and current country (assuming place of origin for some users)
+# Pairs seen before come from the gender cache, new ones are classified in batched prompts
 def getGender(name, country):
-    # Use gpt-4o-mini for gender inferencing
-    client = OpenAI(api_key=API_KEY)
-    user_message = f"full name: {name}"
-    if country is not None:
-        user_message += f", current location: {country}"
-
-    res = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": """
-                    Infer gender using fullname. Only output valid json in this format (Try not to output Unknown): { "gender": "Male" }, { "gender": "Female" }, or { "gender": "Unknown" }
-                """,
-            },
-            {
-                "role": "user",
-                "content": user_message,
-            },
-        ],
-    )
-    output = res.choices[0].message.content
-
-    if not output:
-        return "Unknown"
-
-    try:
-        user = json.loads(output)
-        gender = user.get("gender", "Unknown")
-        return gender
-    except json.JSONDecodeError:
-        return "Unknown"
+    return gender_inference.infer(name, country)
 
 
 # Runs a check if the user exists in the database an has already been visisted once
@@ -544,6 +707,8 @@ def findUser(github_id: int, db):
         "is_enriched": False,
         "gender": None,
         "pronouns": None,
+        "etag": None,
+        "last_modified": None,
     }
 
     with db.cursor() as cur:
@@ -562,7 +727,9 @@ def findUser(github_id: int, db):
                     """
                     SELECT
                         gender,
-                        has_pronouns
+                        has_pronouns,
+                        etag,
+                        last_modified
                     FROM users WHERE github_id = %s LIMIT 1;
                     """,
                     (github_id,),
@@ -571,6 +738,8 @@ def findUser(github_id: int, db):
                 if r2:
                     identity["gender"] = r2[0]
                     identity["pronouns"] = r2[1]
+                    identity["etag"] = r2[2]
+                    identity["last_modified"] = r2[3]
     return identity
 
 
@@ -592,13 +761,35 @@ def batchGetUserId(github_ids: list[int], db):
 # Deletes a specfic user from the DB
 def deleteUser(github_id: int, db):
     with db.cursor() as cur:
+        # Edges cascade on delete, so collect the counterparts whose counts will change
+        cur.execute(
+            """
+            SELECT s.sponsor_id FROM sponsorship s
+            JOIN users u ON u.id = s.sponsored_id
+            WHERE u.github_id = %s
+            UNION
+            SELECT s.sponsored_id FROM sponsorship s
+            JOIN users u ON u.id = s.sponsor_id
+            WHERE u.github_id = %s;
+            """,
+            (github_id, github_id),
+        )
+        counterparts = [row[0] for row in cur.fetchall()]
+
         cur.execute(
             """
             DELETE FROM users
-            WHERE github_id = %s;
+            WHERE github_id = %s
+            RETURNING min_sponsor_cost;
             """,
             (github_id,),
         )
+        # Removing a priced user can move the median tier cost
+        if any(row[0] is not None and row[0] > 0 for row in cur.fetchall()):
+            refreshMedianSponsorCost(db)
+        refreshSponsorshipStats(counterparts, db)
+        # Their cascaded edges and history rows are gone, so are their cached timelines
+        bumpSponsorHistoryVersion(counterparts, db)
         db.commit()
         cur.close()
         logging.info(f"Deleted Github ID {github_id} From Database")
@@ -613,16 +804,26 @@ def finalizeUserScrape(github_id: int, private_count, min_sponsor_tier, db):
     with db.cursor() as cur:
         cur.execute(
             """
-            UPDATE users SET
+            UPDATE users u SET
                 last_scraped = %s,
                 private_sponsor_count = %s,
-                min_sponsor_cost = %s     
-            WHERE github_id = %s;
+                min_sponsor_cost = %s
+            FROM (SELECT id, min_sponsor_cost FROM users WHERE github_id = %s) old
+            WHERE u.id = old.id
+            RETURNING u.id, u.min_sponsor_cost IS DISTINCT FROM old.min_sponsor_cost;
             """,
             (scraped, private_count, min_sponsor_tier, github_id),
         )
+        rows = cur.fetchall()
+        # A new tier cost can move the global median; earnings are re-priced in bulk only if it does
+        if any(cost_changed for _, cost_changed in rows):
+            refreshMedianSponsorCost(db)
+        # Private sponsor count and tier cost feed the summary row, refresh it in the same transaction
+        refreshSponsorshipStats([row_id for row_id, _ in rows], db)
         db.commit()
         cur.close()
+    # Marks cached API results (e.g. statistics) as stale (throttled, see markDataChanged)
+    markDataChanged(db)
     return
 
 
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import time
+
+import psycopg2
+
+# DB Queries
+from backend.db.queries.queue import (
+    claimFromQueue,
+    renewLease,
+    batchRequeue,
+    updateStatus,
+)
+from backend.db.queries.users import (
+    createUser,
+    enrichUser,
+    findUser,
+    getUserDataAsync,
+    removeMissingUser,
+)
+from backend.db.queries.sponsors import (
+    syncSponsors,
+    syncSponsorships,
+)
+from backend.db.queries.data_generation import flushDataGeneration
+
+# Ingest/Scraper
+from backend.ingest.utils import SponsorshipBatcher, getSponsorableUsers
+from backend.ingest.worker import QUEUE_IDLE_WAIT, IngestWorker, record_crawl
+
+from backend.utils.db_conn import get_connection
+from backend.utils.http_sessions import create_async_client
+from backend.logs.logger_config import init_logger, log_header
+
+# Users crawled at the same time inside the event loop (keep DB_POOL_MAX_SIZE above this)
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", 8))
+
+
+class AsyncIngestWorker(IngestWorker):
+    """
+    Ingest worker that crawls up to `concurrency` users at once inside one event loop.
+
+    Each user goes through the same steps as in `IngestWorker.run`, in the same order.
+    The GitHub and location requests are awaited on a shared httpx.AsyncClient, so
+    independent users overlap their network waits, and users reaching the sponsorship
+    step together share one batched GraphQL request. Blocking work (database writes,
+    pronoun scraping, gender inference, activity collection) runs in threads, each step
+    on its own pooled connection. Queue claims and leases work as in the sync worker.
+    """
+
+    def __init__(self, concurrency=INGEST_CONCURRENCY, **kwargs):
+        super().__init__(**kwargs)
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.concurrency = concurrency
+
+    def run(self):
+        init_logger(self.log_file)
+        log_header(f"Async Worker has Started (concurrency {self.concurrency})")
+
+        self.last_stale_check = time.time()
+        try:
+            asyncio.run(self.run_async())
+        finally:
+            self._shutdown()
+
+    async def run_async(self, client=None):
+        """Claim users and crawl them concurrently until `stop()` is called."""
+        owns_client = client is None
+        if owns_client:
+            client = create_async_client()
+
+        # Users reaching the sponsorship step together share batched GraphQL requests
+        self.batcher = SponsorshipBatcher(client)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        try:
+            while not self.stop_requested.is_set():
+                if not self.claimed:
+                    init_run = await self._db(self._periodic_tasks)
+                    # Publish scrapes whose generation bump was throttled
+                    await self._db(flushDataGeneration)
+                    claimed = await self._db(
+                        claimFromQueue,
+                        self.worker_id,
+                        batch_size=self.concurrency,
+                    )
+                    self.claimed.extend(claimed)
+
+                if not self.claimed:
+                    if tasks:
+                        # Users still in flight may queue new ones, wait for one of them
+                        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                        continue
+                    # If all pending users have been scraped requeue the stale ones
+                    if self.leader:
+                        await self._db(getSponsorableUsers, init=init_run)
+                        await self._db(batchRequeue)
+                    await asyncio.to_thread(self.stop_requested.wait, QUEUE_IDLE_WAIT)
+                    continue
+
+                # Bound the number of users in flight
+                await semaphore.acquire()
+                if self.stop_requested.is_set():
+                    semaphore.release()
+                    break
+
+                entry = self.claimed.popleft()
+                task = asyncio.create_task(self._crawl_user(client, entry))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda _: semaphore.release())
+        finally:
+            # Let users in flight finish, unstarted claims are released by _shutdown
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            if owns_client:
+                await client.aclose()
+
+    async def _db(self, fn, *args, **kwargs):
+        """Run a query function in a thread with its own pooled connection."""
+
+        def call():
+            with get_connection() as conn:
+                return fn(*args, db=conn, **kwargs)
+
+        return await asyncio.to_thread(call)
+
+    async def _crawl_user(self, client, entry):
+        github_id = entry["github_id"]
+        try:
+            success = await self._crawl(client, github_id, entry["priority"])
+        except psycopg2.OperationalError as e:
+            # The pool discards the broken connection, the lease brings the user back later
+            logging.warning(f"DB connection lost while crawling Github ID {github_id}: {e}")
+            success = False
+        except Exception as e:
+            # One user's failure must not stop the others, the lease brings it back later
+            logging.error(
+                f"Unhandled exception while crawling Github ID {github_id}: {e}", exc_info=True
+            )
+            success = False
+        if success is not None:
+            self._report(success)
+
+    async def _crawl(self, client, github_id, priority):
+        """Crawl one user. Returns True/False when crawled/failed, None when skipped."""
+        start = time.time()
+
+        # Restart the lease clock for this user, skip it if the lease was lost meanwhile
+        if not await self._db(renewLease, github_id, self.worker_id):
+            logging.warning(
+                f"Lease on Github ID {github_id} was reclaimed by another worker; skipping."
+            )
+            return None
+
+        logging.info(f"Processing user: Github ID {github_id} at priority: {priority}")
+
+        # Check if the user exists and if the user is enriched with REST API data
+        identity = await self._db(findUser, github_id=github_id)
+        user_id = identity.get("user_id")
+        user_exists = bool(identity.get("user_exists", False))
+        is_enriched = bool(identity.get("is_enriched", False))
+
+        try:
+            user = await getUserDataAsync(
+                client, github_id, is_enriched=is_enriched, identity=identity
+            )
+        except ValueError:
+            logging.warning(
+                f"User {github_id} has been deleted. They do not exist on github (sponsors if previously existed have been updated)"
+            )
+            await self._db(removeMissingUser, github_id)
+            return None
+
+        if user is None:
+            logging.warning(f"No user data returned for Github ID {github_id}; skipping.")
+            await self._db(
+                updateStatus, github_id=github_id, status="skipped", worker_id=self.worker_id
+            )
+            return False
+
+        if user_exists:
+            # Returns the stored profile when GitHub reported it unchanged
+            user = await self._db(
+                enrichUser, github_id, enriched=is_enriched, identity=identity, user=user
+            )
+        else:
+            user, user_id = await self._db(createUser, github_id, user=user)
+
+        #  Crawl the user for sponsorship relations
+        try:
+            sponsors, sponsoring, private_count, min_sponsor_tier = (
+                await self.batcher.fetch(github_id, user.type)
+            )
+        except Exception as e:
+            logging.error(f"Skipping sync for {user.username} due to fetch error: {e}")
+            # Do NOT update last_scraped so it tries again later
+            return False
+
+        # The fetch can outlast the lease (pagination, token budget waits),
+        # never store a user another worker has reclaimed meanwhile
+        if not await self._db(renewLease, github_id, self.worker_id):
+            logging.warning(f"Lease on Github ID {github_id} expired while fetching; skipping.")
+            return None
+
+        def store(db):
+            # Only sync if we successfully got the FULL lists
+            syncSponsors(github_id, sponsors, db)
+            syncSponsorships(github_id, sponsoring, db)
+            record_crawl(
+                github_id,
+                user_id,
+                user,
+                priority,
+                sponsors,
+                sponsoring,
+                private_count,
+                min_sponsor_tier,
+                db=db,
+                worker_id=self.worker_id,
+            )
+
+        await self._db(store)
+        logging.info(
+            f"user Github ID {github_id} crawled: {time.time() - start:.2f} seconds elapsed"
+        )
+        return True
+
+
+if __name__ == "__main__":
+    worker = AsyncIngestWorker()
+    worker.run()
@@ -0,0 +1,200 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+from backend.ingest.worker import IngestWorker
+from backend.utils.geocode_cache import NOMINATIM_MIN_INTERVAL
+from backend.logs.logger_config import init_logger, log_header
+
+# Supervisor settings (all optional, see README)
+# Number of worker processes crawling the queue side by side
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))
+# Seconds between throughput summaries in the log
+INGEST_STATS_INTERVAL = float(os.getenv("INGEST_STATS_INTERVAL", 60))
+# Upper bound (seconds) of the back-off before a crash-looping worker is restarted
+INGEST_MAX_RESTART_DELAY = float(os.getenv("INGEST_MAX_RESTART_DELAY", 60))
+# A worker that stayed up this many seconds is considered healthy again
+INGEST_HEALTHY_UPTIME = 60
+# Seconds the workers get to finish their current user on shutdown before being killed
+INGEST_SHUTDOWN_TIMEOUT = 60
+
+
+class ThroughputCounters:
+    """
+    Crawled/failed user counts shared between the supervisor and its workers.
+    One slot per worker, so a restarted process keeps adding to the same totals.
+    """
+
+    def __init__(self, slots, ctx=multiprocessing):
+        self.crawled = ctx.Array("q", slots)
+        self.failed = ctx.Array("q", slots)
+
+    def record(self, slot, success):
+        counter = self.crawled if success else self.failed
+        with counter.get_lock():
+            counter[slot] += 1
+
+    def snapshot(self):
+        with self.crawled.get_lock(), self.failed.get_lock():
+            return list(self.crawled), list(self.failed)
+
+
+def run_worker(slot, counters):
+    """Entry point of one worker process."""
+    worker = IngestWorker(
+        on_user_done=lambda success: counters.record(slot, success),
+        log_file=f"scraper-{slot}.log",
+        # Seeding, auth refresh and requeueing run in slot 0 only
+        leader=slot == 0,
+    )
+    # Ctrl+C reaches the whole process group, let the supervisor decide when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    worker.run()
+
+
+class IngestSupervisor:
+    """
+    Runs `workers` IngestWorker processes on the shared queue.
+
+    Children that exit while the supervisor is running are restarted with an
+    exponential back-off, SIGINT/SIGTERM are forwarded as SIGTERM so every child
+    finishes its current user and releases its queue claims, and the children's
+    throughput counters are summarised in the log. Two children never crawl the same
+    queue entry because each one claims users under its own lease (`claimFromQueue`).
+    """
+
+    def __init__(
+        self,
+        workers=INGEST_WORKERS,
+        target=run_worker,
+        ctx=None,
+        stats_interval=INGEST_STATS_INTERVAL,
+        max_restart_delay=INGEST_MAX_RESTART_DELAY,
+    ):
+        if workers < 1:
+            raise ValueError("The supervisor needs at least one worker")
+
+        self.workers = workers
+        self.target = target
+        # spawn: children start from a clean interpreter (no inherited pool or sockets)
+        self.ctx = ctx or multiprocessing.get_context("spawn")
+        self.stats_interval = stats_interval
+        self.max_restart_delay = max_restart_delay
+
+        self.counters = ThroughputCounters(workers, ctx=self.ctx)
+        self.processes = [None] * workers
+        self.started_at = [0.0] * workers
+        self.crashes = [0] * workers
+        self.restart_at = [0.0] * workers
+        self.restarts = 0
+        self.stopping = False
+
+    def _start(self, slot):
+        process = self.ctx.Process(
+            target=self.target,
+            args=(slot, self.counters),
+            name=f"ingest-worker-{slot}",
+        )
+        process.start()
+        self.processes[slot] = process
+        self.started_at[slot] = time.monotonic()
+        logging.info(f"Started ingest worker {slot} (pid {process.pid})")
+
+    def start(self):
+        # Nominatim's 1 request/s applies to the whole crawl, split it between the children
+        os.environ["NOMINATIM_MIN_INTERVAL"] = str(NOMINATIM_MIN_INTERVAL * self.workers)
+        for slot in range(self.workers):
+            self._start(slot)
+
+    def check_workers(self):
+        """Restart children that exited, backing off while a slot keeps crashing."""
+        now = time.monotonic()
+        for slot, process in enumerate(self.processes):
+            if self.stopping or process is None or process.is_alive():
+                continue
+
+            if self.restart_at[slot] == 0.0:
+                uptime = now - self.started_at[slot]
+                if uptime >= INGEST_HEALTHY_UPTIME:
+                    self.crashes[slot] = 0
+                delay = min(2 ** self.crashes[slot] - 1, self.max_restart_delay)
+                self.crashes[slot] += 1
+                self.restart_at[slot] = now + delay
+                logging.warning(
+                    f"Ingest worker {slot} (pid {process.pid}) exited with code "
+                    f"{process.exitcode} after {uptime:.0f}s; restarting in {delay:.0f}s"
+                )
+
+            if now >= self.restart_at[slot]:
+                process.join()
+                self.restart_at[slot] = 0.0
+                self.restarts += 1
+                self._start(slot)
+
+    def log_throughput(self, elapsed):
+        crawled, failed = self.counters.snapshot()
+        rate = sum(crawled) / elapsed * 60 if elapsed > 0 else 0.0
+        logging.info(
+            f"Ingest throughput: {sum(crawled)} users crawled, {sum(failed)} failed, "
+            f"{rate:.1f} users/min, {self.restarts} restarts "
+            f"(per worker crawled: {crawled})"
+        )
+
+    def request_stop(self, signum=None, frame=None):
+        if self.stopping:
+            return
+        self.stopping = True
+        logging.info("Stopping ingest workers...")
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    def shutdown(self, timeout=INGEST_SHUTDOWN_TIMEOUT):
+        """Signal every child and wait for it, killing those that do not exit in time."""
+        self.request_stop()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logging.warning(f"Ingest worker pid {process.pid} did not stop in time; killing it")
+                process.kill()
+                process.join()
+
+    def run(self):
+        init_logger()
+        log_header(f"Supervisor has Started ({self.workers} workers)")
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+
+        self.start()
+        started = last_stats = time.monotonic()
+        try:
+            while not self.stopping:
+                self.check_workers()
+                if time.monotonic() - last_stats >= self.stats_interval:
+                    self.log_throughput(time.monotonic() - started)
+                    last_stats = time.monotonic()
+                time.sleep(1)
+        finally:
+            self.shutdown()
+            self.log_throughput(time.monotonic() - started)
+            log_header("Supervisor has Stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several ingest workers on the shared queue.")
+    parser.add_argument(
+        "-n",
+        "--workers",
+        type=int,
+        default=INGEST_WORKERS,
+        help="number of worker processes (default: INGEST_WORKERS or 4)",
+    )
+    args = parser.parse_args()
+    IngestSupervisor(workers=args.workers).run()
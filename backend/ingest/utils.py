@@ -1,12 +1,11 @@
+import os
 import time
+import asyncio
 import logging
 import base64
 from datetime import timedelta, datetime
 from dotenv import load_dotenv
-from backend.utils.github_api import postRequest
-
-# Scraping Import
-from playwright.sync_api import sync_playwright
+from backend.utils.github_api import postRequest, postRequestAsync
 
 # Query Import
 from backend.db.queries.users import getGithubIDs
@@ -18,98 +17,118 @@ load_dotenv()
 # Globals
 URL = "https://api.github.com/graphql"
 SPONSORS_URL = "https://github.com/sponsors/explore"
+# Users whose first page of sponsors/sponsoring is requested in one GraphQL query
+SPONSORSHIP_BATCH_SIZE = int(os.getenv("SPONSORSHIP_BATCH_SIZE", 10))
 
 
-# Parent function to handle both functions running
 # Return a list of sponsors, sponsored users, and a count of private sponsors
+# Both relations are fetched together, one GraphQL request per page (see SponsorshipsPager)
 def get_sponsorships(username, github_id: int, user_type):
     logging.info(f"Starting Sponsorship Fetch via API for {user_type} '{username}'")
 
-    sponsor_list, private_count, lowest_tier_cost = get_sponsors_from_api(
-        github_id,
-        user_type,
-    )
-    sponsored_list = get_sponsored_from_api(
-        github_id,
-        user_type,
-    )
-    return sponsor_list, sponsored_list, private_count, lowest_tier_cost
+    pager = SponsorshipsPager(github_id, user_type)
+    start_time = time.time()
+    while pager.has_next_page:
+        try:
+            response = postRequest(url=URL, json=pager.next_request())
+            data = response.json()
+        except Exception as e:
+            logging.error(f"Failed to fetch sponsorships for ID '{github_id}'. Error: {e}")
+            # Raise so a partial list is never synced and the worker retries later
+            raise Exception(f"Sponsorship API Error: {e}")
+        pager.consume(data)
 
+    logging.info(f"API fetch completed in {time.time() - start_time:.2f} seconds.")
+    return pager.result()
 
-# Returns the sponsors that are associated to the passed in user
-def get_sponsors_from_api(github_id, user_type):
-    """
-    Fetches all sponsors for a given user or organization using the GitHub GraphQL API.
-        :param username: The login name of the user or organization.
-        :param user_type: The type of account, either 'user' or 'organization'.
 
-    If a user does not have a minimum monthly tier, the database will set that value to 0.
-    Their monthly income estimate will be derived from the median monthly sponsor cost.
-    """
+# Build the GraphQL node ID of a user or organization from its database ID
+def _node_id(github_id, user_type):
     if user_type.lower() not in ["user", "organization"]:
         raise ValueError("user_type must be 'user' or 'organization'")
 
+    # The prefix for a User ID is '04:' and for an Organization ID is '12:'.
+    # This is not officially documented but is the current standard.
     prefix = "04:" if user_type.lower() == "user" else "12:"
-    node_id = base64.b64encode(
+    return base64.b64encode(
         f"{prefix}{user_type.title()}{github_id}".encode("utf-8")
     ).decode("utf-8")
 
-    sponsors_list: list[int] = []
-    private_sponsors_count = 0
-    lowest_tier_cost = 0
-    has_next_page = True
-    cursor = None
-    response = None
-
-    # Dynamic query template for the Github GraphQL API
-    # snippet-start: GraphQL-Sponsor-Query
-    query_template = f"""
-    query($nodeId: ID!, $cursor: String) {{
-      node(id: $nodeId) {{
-        ... on {user_type.title()} {{
-          sponsorshipsAsMaintainer(first: 100, after: $cursor, includePrivate: true) {{
-            totalCount
-            pageInfo {{
-              endCursor
-              hasNextPage
-            }}
-            nodes {{
-              privacyLevel
-              sponsorEntity {{
-                ... on User {{ databaseId }}
-                ... on Organization {{ databaseId }}
-              }}
-            }}
-          }}
-          sponsorsListing {{
-            tiers(first: 20) {{
-              nodes {{
-                monthlyPriceInCents
-                isOneTime
-              }}
-            }}
-          }}
+
+# GraphQL selection of one page of a user's sponsors after `after`
+def _sponsors_fields(after, directive=""):
+    return f"""
+    sponsorshipsAsMaintainer(first: 100, after: {after}, includePrivate: true) {directive} {{
+      totalCount
+      pageInfo {{
+        endCursor
+        hasNextPage
+      }}
+      nodes {{
+        privacyLevel
+        sponsorEntity {{
+          ... on User {{ databaseId }}
+          ... on Organization {{ databaseId }}
         }}
       }}
     }}
     """
-    # snippet-end
 
-    print(f"Starting Sponsors Fetch for {user_type} ''")
-    start_time = time.time()
 
-    while has_next_page:
-        # Corrected variables dictionary. The key 'nodeId' must match the query variable '$nodeId'.
-        variables = {"nodeId": node_id, "cursor": cursor}
-        query = {"query": query_template, "variables": variables}
+# GraphQL selection of a user's sponsor tiers (only needed with the first page of sponsors)
+def _tiers_fields(directive=""):
+    return f"""
+    sponsorsListing {directive} {{
+      tiers(first: 20) {{
+        nodes {{
+          monthlyPriceInCents
+          isOneTime
+        }}
+      }}
+    }}
+    """
 
-        try:
-            response = postRequest(url=URL, json=query)
-            data = response.json()
-        except Exception as e:
-            logging.error(f"Failed to fetch sponsors. Error: {e}")
-            break
 
+# GraphQL selection of one page of the users sponsored by a user after `after`
+def _sponsoring_fields(after, directive=""):
+    return f"""
+    sponsorshipsAsSponsor(first: 100, after: {after}) {directive} {{
+      totalCount
+      pageInfo {{
+        endCursor
+        hasNextPage
+      }}
+      nodes {{
+        sponsorable {{
+          ... on User {{ databaseId }}
+          ... on Organization {{ databaseId }}
+        }}
+      }}
+    }}
+    """
+
+
+class SponsorsPager:
+    """
+    Parses the pages of sponsors of one user or organization (`sponsorshipsAsMaintainer`).
+
+    SponsorshipsPager builds the requests and hands every decoded response to `consume()`
+    until `has_next_page` is False, so the sync and async fetchers share the parsing below.
+    If a user does not have a minimum monthly tier, the database will set that value to 0.
+    Their monthly income estimate will be derived from the median monthly sponsor cost.
+    """
+
+    def __init__(self, github_id, user_type):
+        self.github_id = github_id
+        self.node_id = _node_id(github_id, user_type)
+        self.cursor = None
+        self.has_next_page = True
+
+        self.sponsors: list[int] = []
+        self.private_count = 0
+        self.lowest_tier_cost = 0
+
+    def consume(self, data):
         if "errors" in data:
             logging.error(f"GraphQL errors: {data['errors']}")
             # DO NOT BREAK. RAISE EXCEPTION.
@@ -120,7 +139,7 @@ def get_sponsors_from_api(github_id, user_type):
             # If we expected data but got none, abort.
             raise Exception("Partial fetch detected: Node data missing.")
 
-        if not cursor:  # First page
+        if not self.cursor:  # First page
             sponsors_listing = entity_data.get("sponsorsListing")
             if sponsors_listing and sponsors_listing.get("tiers"):
                 tiers = sponsors_listing["tiers"]["nodes"]
@@ -130,15 +149,16 @@ def get_sponsors_from_api(github_id, user_type):
                     if not tier.get("isOneTime") and "monthlyPriceInCents" in tier
                 ]
                 if monthly_prices_in_cents:
-                    lowest_tier_cost = min(monthly_prices_in_cents) / 100
-                    logging.info(f"Lowest monthly tier: ${lowest_tier_cost:.2f}")
+                    self.lowest_tier_cost = min(monthly_prices_in_cents) / 100
+                    logging.info(f"Lowest monthly tier: ${self.lowest_tier_cost:.2f}")
 
         sponsorships = entity_data.get("sponsorshipsAsMaintainer")
         if not sponsorships:
-            logging.info(f"Could not retrieve sponsorships for ID {github_id}.")
-            break
+            logging.info(f"Could not retrieve sponsorships for ID {self.github_id}.")
+            self.has_next_page = False
+            return
 
-        if not cursor:
+        if not self.cursor:
             total_sponsors = sponsorships.get("totalCount", 0)
             logging.info(f"Total sponsors reported by API: {total_sponsors}")
 
@@ -146,80 +166,27 @@ def get_sponsors_from_api(github_id, user_type):
             if not node:
                 continue
             if node.get("privacyLevel") == "PRIVATE":
-                private_sponsors_count += 1
+                self.private_count += 1
             elif node.get("sponsorEntity") and node["sponsorEntity"].get("databaseId"):
-                sponsors_list.append(node["sponsorEntity"]["databaseId"])
+                self.sponsors.append(node["sponsorEntity"]["databaseId"])
 
         page_info = sponsorships.get("pageInfo", {})
-        has_next_page = page_info.get("hasNextPage", False)
-        cursor = page_info.get("endCursor")
-
-    end_time = time.time()
-    logging.info(f"API fetch completed in {end_time - start_time:.2f} seconds.")
-    print(sponsors_list, len(sponsors_list))
-
-    return sponsors_list, private_sponsors_count, lowest_tier_cost
-
-
-# Returns an array of users who are sponsored by the passed in user
-def get_sponsored_from_api(github_id, user_type):
-    """
-    Fetches all sponsored for a given user or organization using the GitHub GraphQL API.
-    :param github_id: The database ID of the user or organization.
-    :param user_type: The type of account, either 'user' or 'organization'.
-    """
-    if user_type.lower() not in ["user", "organization"]:
-        raise ValueError("user_type must be 'user' or 'organization'")
-
-    # The prefix for a User ID is '04:' and for an Organization ID is '12:'.
-    # This is not officially documented but is the current standard.
-    prefix = "04:" if user_type.lower() == "user" else "12:"
-    node_id = base64.b64encode(
-        f"{prefix}{user_type.title()}{github_id}".encode("utf-8")
-    ).decode("utf-8")
+        self.has_next_page = page_info.get("hasNextPage", False)
+        self.cursor = page_info.get("endCursor")
 
-    sponsored_list: list[int] = []
-    has_next_page = True
-    cursor = None
-
-    # Dynamic query template for the Github GraphQL API
-    query_template = f"""
-    query($nodeId: ID!, $cursor: String) {{
-      node(id: $nodeId) {{
-        ... on {user_type.title()} {{
-          sponsorshipsAsSponsor(first: 100, after: $cursor) {{
-            totalCount
-            pageInfo {{
-              endCursor
-              hasNextPage
-            }}
-            nodes {{
-              sponsorable {{
-                ... on User {{ databaseId }}
-                ... on Organization {{ databaseId }}
-              }}
-            }}
-          }}
-        }}
-      }}
-    }}
-    """
 
-    start_time = time.time()
+class SponsoringPager:
+    """Parses the pages of users sponsored by one user or organization (`sponsorshipsAsSponsor`)."""
 
-    logging.info(f"Starting Sponsoring Fetch for {user_type} ID '{github_id}'")
-    while has_next_page:
-        variables = {"nodeId": node_id, "cursor": cursor}
-        query = {"query": query_template, "variables": variables}
+    def __init__(self, github_id, user_type):
+        self.github_id = github_id
+        self.node_id = _node_id(github_id, user_type)
+        self.cursor = None
+        self.has_next_page = True
 
-        try:
-            response = postRequest(url=URL, json=query)
-            data = response.json()
-        except Exception as e:
-            logging.error(f"Failed to fetch sponsored for ID '{github_id}'. Error: {e}")
-            # FIX: Raise exception so worker retry logic kicks in
-            raise Exception(f"Sponsoring API Error: {e}")
+        self.sponsored: list[int] = []
 
+    def consume(self, data):
         if "errors" in data:
             logging.error(f"GraphQL errors: {data['errors']}")
             # FIX: Raise exception to protect DB
@@ -227,17 +194,18 @@ def get_sponsored_from_api(github_id, user_type):
 
         entity_data = data.get("data", {}).get("node", {})
         if not entity_data:
-            logging.warning(f"Could not find entity with the provided ID {github_id}.")
+            logging.warning(f"Could not find entity with the provided ID {self.github_id}.")
             raise Exception("Partial fetch detected: Node data missing.")
 
         sponsored = entity_data.get("sponsorshipsAsSponsor")
         if not sponsored:
             logging.warning(
-                f"Could not retrieve sponsored users for ID {github_id}. They may not be sponsoring any users."
+                f"Could not retrieve sponsored users for ID {self.github_id}. They may not be sponsoring any users."
             )
-            break
+            self.has_next_page = False
+            return
 
-        if not cursor:  # Only log total on the first page
+        if not self.cursor:  # Only log total on the first page
             total_sponsoring = sponsored.get("totalCount", 0)
             logging.info(f"Total sponsored users reported by API: {total_sponsoring}")
 
@@ -247,20 +215,256 @@ def get_sponsored_from_api(github_id, user_type):
                 and node.get("sponsorable")
                 and node["sponsorable"].get("databaseId")
             ):
-                sponsored_list.append(node["sponsorable"]["databaseId"])
+                self.sponsored.append(node["sponsorable"]["databaseId"])
 
         page_info = sponsored.get("pageInfo", {})
-        has_next_page = page_info.get("hasNextPage", False)
-        cursor = page_info.get("endCursor")
+        self.has_next_page = page_info.get("hasNextPage", False)
+        self.cursor = page_info.get("endCursor")
 
-    end_time = time.time()
-    logging.info(f"API fetch completed in {end_time - start_time:.2f} seconds.")
-    if response:
-        logging.info(
-            f"Remaining Github API Tokens: {response.headers.get('X-RateLimit-Remaining')}"
+
+class SponsorshipsPager:
+    """
+    Pages through the sponsors and the sponsoring of one user or organization together.
+
+    Every round trip asks for the next page of both connections in one query. Each
+    connection follows its own cursor and is left out of the query (`@include`) once it
+    has no more pages, as are the tiers after the first page of sponsors.
+    """
+
+    def __init__(self, github_id, user_type):
+        self.sponsors = SponsorsPager(github_id, user_type)
+        self.sponsoring = SponsoringPager(github_id, user_type)
+
+        # Dynamic query template for the Github GraphQL API
+        # snippet-start: GraphQL-Sponsor-Query
+        self.query = f"""
+        query(
+          $nodeId: ID!,
+          $sponsorsCursor: String,
+          $sponsoringCursor: String,
+          $withSponsors: Boolean!,
+          $withTiers: Boolean!,
+          $withSponsoring: Boolean!
+        ) {{
+          node(id: $nodeId) {{
+            ... on {user_type.title()} {{
+              {_sponsors_fields("$sponsorsCursor", "@include(if: $withSponsors)")}
+              {_tiers_fields("@include(if: $withTiers)")}
+              {_sponsoring_fields("$sponsoringCursor", "@include(if: $withSponsoring)")}
+            }}
+          }}
+        }}
+        """
+        # snippet-end
+
+    @property
+    def has_next_page(self):
+        return self.sponsors.has_next_page or self.sponsoring.has_next_page
+
+    def next_request(self):
+        variables = {
+            "nodeId": self.sponsors.node_id,
+            "sponsorsCursor": self.sponsors.cursor,
+            "sponsoringCursor": self.sponsoring.cursor,
+            "withSponsors": self.sponsors.has_next_page,
+            "withTiers": self.sponsors.has_next_page and self.sponsors.cursor is None,
+            "withSponsoring": self.sponsoring.has_next_page,
+        }
+        return {"query": self.query, "variables": variables}
+
+    def consume(self, data):
+        # Only the connections that were requested are in the response
+        for pager in (self.sponsors, self.sponsoring):
+            if pager.has_next_page:
+                pager.consume(data)
+
+    def result(self):
+        """(sponsors, sponsored, private_count, lowest_tier_cost), as returned by get_sponsorships."""
+        return (
+            self.sponsors.sponsors,
+            self.sponsoring.sponsored,
+            self.sponsors.private_count,
+            self.sponsors.lowest_tier_cost,
+        )
+
+
+# Build one GraphQL query asking for the first page of sponsors and sponsoring of every
+# passed in (github_id, user_type), one alias (u0, u1, ...) per user
+def _batch_request(users):
+    params, selections, variables = [], [], {}
+    for i, (github_id, user_type) in enumerate(users):
+        params.append(f"$n{i}: ID!")
+        variables[f"n{i}"] = _node_id(github_id, user_type)
+        selections.append(
+            f"""
+            u{i}: node(id: $n{i}) {{
+              ... on {user_type.title()} {{
+                {_sponsors_fields("null")}
+                {_tiers_fields()}
+                {_sponsoring_fields("null")}
+              }}
+            }}
+            """
         )
-    print(sponsored_list, len(sponsored_list))
-    return sponsored_list
+    query = f"query({', '.join(params)}) {{ {''.join(selections)} }}"
+    return {"query": query, "variables": variables}
+
+
+# Feed each user's alias of a batched response to a fresh pager
+# Returns {github_id: SponsorshipsPager or the Exception raised for that user}
+def _start_batch(users, data):
+    errors_by_alias = {}
+    for error in data.get("errors") or []:
+        path = error.get("path") or []
+        if not path:
+            # Not tied to one user, the whole batch is unusable
+            raise Exception(f"GraphQL errors: {data['errors']}")
+        errors_by_alias.setdefault(path[0], []).append(error)
+
+    started = {}
+    for i, (github_id, user_type) in enumerate(users):
+        alias = f"u{i}"
+        if alias in errors_by_alias:
+            page = {"errors": errors_by_alias[alias]}
+        else:
+            page = {"data": {"node": (data.get("data") or {}).get(alias)}}
+        try:
+            pager = SponsorshipsPager(github_id, user_type)
+            pager.consume(page)
+            started[github_id] = pager
+        except Exception as e:
+            started[github_id] = e
+    return started
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+# Batched variant of get_sponsorships for several users
+def get_sponsorships_batch(users, batch_size=SPONSORSHIP_BATCH_SIZE):
+    """
+    Fetches the sponsors and sponsoring of several users or organizations.
+        :param users: List of (github_id, user_type) tuples.
+        :param batch_size: Users whose first pages are requested in one GraphQL query.
+
+    Most users fit in one page of each connection, so the first pages of up to `batch_size`
+    users come back in a single request. Only users with more pages are then paginated on
+    their own. Returns {github_id: (sponsors, sponsored, private_count, lowest_tier_cost)},
+    with the raised Exception in place of the tuple for users whose fetch failed.
+    """
+    results = {}
+    for chunk in _chunks(list(users), batch_size):
+        try:
+            response = postRequest(url=URL, json=_batch_request(chunk))
+            started = _start_batch(chunk, response.json())
+        except Exception as e:
+            logging.warning(f"Batched sponsorship fetch failed ({e}); fetching users one by one.")
+            started = {}
+
+        for github_id, user_type in chunk:
+            pager = started.get(github_id)
+            try:
+                if isinstance(pager, Exception):
+                    raise pager
+                if pager is None:
+                    # The batch request failed, fetch this user from the first page on
+                    pager = SponsorshipsPager(github_id, user_type)
+                while pager.has_next_page:
+                    pager.consume(postRequest(url=URL, json=pager.next_request()).json())
+                results[github_id] = pager.result()
+            except Exception as e:
+                logging.error(f"Failed to fetch sponsorships for ID '{github_id}'. Error: {e}")
+                results[github_id] = e
+    return results
+
+
+# Async variant of get_sponsorships_batch, users with more pages are paginated concurrently
+async def get_sponsorships_batch_async(client, users, batch_size=SPONSORSHIP_BATCH_SIZE):
+    async def finish(github_id, user_type, pager):
+        try:
+            if isinstance(pager, Exception):
+                raise pager
+            if pager is None:
+                pager = SponsorshipsPager(github_id, user_type)
+            while pager.has_next_page:
+                response = await postRequestAsync(client, URL, json=pager.next_request())
+                pager.consume(response.json())
+            return pager.result()
+        except Exception as e:
+            logging.error(f"Failed to fetch sponsorships for ID '{github_id}'. Error: {e}")
+            return e
+
+    results = {}
+    for chunk in _chunks(list(users), batch_size):
+        try:
+            response = await postRequestAsync(client, URL, json=_batch_request(chunk))
+            started = _start_batch(chunk, response.json())
+        except Exception as e:
+            logging.warning(f"Batched sponsorship fetch failed ({e}); fetching users one by one.")
+            started = {}
+
+        finished = await asyncio.gather(
+            *(finish(github_id, user_type, started.get(github_id)) for github_id, user_type in chunk)
+        )
+        results.update(zip((github_id for github_id, _ in chunk), finished))
+    return results
+
+
+class SponsorshipBatcher:
+    """
+    Coalesces concurrent per-user sponsorship fetches into batched GraphQL queries.
+
+    Coroutines await `fetch(github_id, user_type)`; requests arriving within `max_wait`
+    seconds of each other (or `batch_size` of them) go out as one get_sponsorships_batch_async
+    call, and each caller gets its own user's result back (or its exception raised).
+    """
+
+    def __init__(self, client, batch_size=SPONSORSHIP_BATCH_SIZE, max_wait=0.05):
+        self.client = client
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        self._flushes = set()
+
+    async def fetch(self, github_id, user_type):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((github_id, user_type, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            # Keep a reference so the task is not garbage collected mid-flight
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _send(self, batch):
+        try:
+            results = await get_sponsorships_batch_async(
+                self.client, [(github_id, user_type) for github_id, user_type, _ in batch]
+            )
+        except Exception as e:
+            results = {github_id: e for github_id, _, _ in batch}
+
+        for github_id, _, future in batch:
+            if future.done():
+                continue
+            result = results.get(github_id)
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
 
 
 # Recursively queries the Github GraphQL API to collect users who are sponsorable
@@ -1,6 +1,8 @@
 # DB Queries
 from backend.db.queries.queue import (
-    getFirstInQueue,
+    claimFromQueue,
+    renewLease,
+    releaseClaims,
     batchAddQueue,
     batchRequeue,
     updateStatus,
@@ -22,9 +24,10 @@ from backend.db.queries.user_activity import (
     getUserActivity,
     refreshActivityCheck,
 )
+from backend.db.queries.data_generation import flushDataGeneration
 
 # Ingest/Scraper
-from backend.ingest.utils import get_sponsorships, getSponsorableUsers
+from backend.ingest.utils import get_sponsorships_batch, getSponsorableUsers
 from backend.ingest.init_check import (
     load_worker_state,
     update_worker_state,
@@ -32,20 +35,52 @@ from backend.ingest.init_check import (
 
 # Authentication And Database
 import psycopg2
-from backend.utils.db_conn import db_connection
+from backend.utils.db_conn import get_connection, close_pool
+from backend.utils.http_sessions import close_sessions
+from backend.utils.browser_pool import browser_pool
 from backend.ingest.use_auth import get_auth, is_auth_expiring_soon
 
 # Logging Imports
+import os
+import socket
 import time
 import datetime
 from datetime import datetime as date
 import logging
-from backend.logs.logger_config import init_logger, log_header
+import threading
+from collections import deque
+from backend.logs.logger_config import FILENAME, init_logger, log_header
 
 MAX_PRIORITY = 10
+# Number of users claimed from the queue per round trip
+QUEUE_CLAIM_BATCH = int(os.getenv("QUEUE_CLAIM_BATCH", 5))
+# Seconds a worker waits before claiming again after finding the queue empty
+QUEUE_IDLE_WAIT = float(os.getenv("QUEUE_IDLE_WAIT", 5))
 
 
 class IngestWorker:
+    def __init__(self, worker_id=None, on_user_done=None, log_file=FILENAME, leader=True):
+        # Identifies this worker's leases in the queue (one per process)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        # Only the leader runs the shared jobs (seeding, auth refresh, stale users, requeueing),
+        # the supervisor makes a single one of its workers the leader
+        self.leader = leader
+        # Users claimed from the queue but not processed yet
+        self.claimed = deque()
+        # Called with True/False after every crawled/failed user (e.g. the supervisor's counters)
+        self.on_user_done = on_user_done
+        self.log_file = log_file
+        # Set by stop(), the loop exits once the users currently being crawled are done
+        self.stop_requested = threading.Event()
+
+    def stop(self):
+        """Ask the worker to finish the users in progress, release its other claims and exit."""
+        self.stop_requested.set()
+
+    def _report(self, success):
+        if self.on_user_done is not None:
+            self.on_user_done(success)
+
     def run(self):
         """
         Main worker program to ingest, scrape and and insert data from Github API to database.
@@ -54,232 +89,328 @@ class IngestWorker:
         -----
         - Establish neccessary connections to database and logger.
         - On first run, create `worker_state.json` to track initialization status and last run time.
-        - Enter main `while True` loop:
-            1.  **State & Seeding**: Load worker state. If it's the first run or has been a long time, seed the queue by fetching all "Sponsorable" users from GitHub.
-            2.  **Authentication**: Check if the GitHub auth token is expiring and refresh it if needed.
-            3.  **Periodic Tasks**: Every 4 hours, re-establish the database connection and enqueue any "stale" users (not scraped in 7 days) for reprocessing.
-            4.  **Fetch from Queue**: Get the highest-priority user from the queue. If the queue is empty, attempt to re-seed.
+        - Enter the main loop, which runs until `stop()` is called:
+            1.  **State & Seeding** (leader only): Load worker state. If it's the first run or has been a long time, seed the queue by fetching all "Sponsorable" users from GitHub.
+            2.  **Authentication** (leader only): Check if the GitHub auth token is expiring and refresh it if needed.
+            3.  **Periodic Tasks** (leader only): Every 4 hours, enqueue any "stale" users (not scraped in 7 days) for reprocessing. Database connections are checked out of the shared pool each iteration and recycled by the pool.
+            4.  **Claim from Queue**: Claim a batch of the highest-priority users with a lease (safe with many workers on one queue), renewing the lease before each user is processed. If the queue is empty, the leader attempts to re-seed, and every worker waits a moment before claiming again.
             5.  **Enrich/Create User**: Check the user's status in the database. If they don't exist, create them. If they exist but lack full details, enrich them using GitHub's REST API.
-            6.  **Crawl Sponsorships**: Fetch the user's sponsors and the users they are sponsoring via the GraphQL API.
+            6.  **Crawl Sponsorships**: Fetch the sponsors and sponsoring of the claimed users via the GraphQL API, with the first pages of the whole batch in one request.
             7.  **Adjust Priority & Enqueue New Users**:
                 - If new, unique users are found in the relationships, increment the current user's priority and add the new users to the queue.
                 - If only existing relationships are found, the priority remains the same.
                 - If no relationships are found, decrement the priority.
             8.  **Sync Data**: Update the `sponsorship` table with the latest relationships and collect the user's historical activity data if needed.
-            9.  **Finalize**: Update the user's status to 'completed' in the queue and record the `last_scraped` timestamp.
+            9.  **Finalize**: Mark the user 'completed', which moves them from the queue to `crawl_state`, and record the `last_scraped` timestamp.
             10. **Error Handling**: Catch and log database connection errors or other exceptions, with built-in reconnection logic and graceful shutdown.
         """
 
         # Establish database connection & logger
-        init_logger()
-        self.conn = db_connection()
+        init_logger(self.log_file)
         log_header("Worker has Started")
 
         # Start rescraping timer
-        last_stale_check = time.time()
-
-        while True:
-            # Load the worker state
-            start = time.time()
-            state = load_worker_state()
-            init_run, last_init_run = state.get("init_run"), state.get("last_init_run")
-            elapsed: datetime
-
-            # Parse last_init_run which is stored as an ISO 8601 string (e.g. 2025-08-24T18:21:35.226820)
-            if last_init_run:
-                try:
-                    last_init_run = date.fromisoformat(last_init_run)
-                except Exception:
-                    # Fallback for strict parsing with microseconds
-                    last_init_run = date.strptime(last_init_run, "%Y-%m-%dT%H:%M:%S.%f")
-                # Total time sice the last run
-                elapsed = date.now() - last_init_run
-            else:
-                elapsed = None
-
-            # Else if time since is none or older than 1 year, treat this as an initial run
-            if last_init_run is None or (
-                date.now() - last_init_run
-            ) > datetime.timedelta(days=365):
-                getSponsorableUsers(self.conn, True)
-            # If time since last_init_run is older than 2 weeks, incremental collection
-            elif elapsed > datetime.timedelta(weeks=2):
-                getSponsorableUsers(self.conn, init_run)
-
-            # Only reset the state if the worker completed an initial run prior
-            if init_run == True:
-                update_worker_state()
-
-            check_auth = is_auth_expiring_soon()
-            # If auth is close to expiration
-            if check_auth is True:
-                get_auth()
-
-            # Check last_stale_check every 4 hours
-            if time.time() - last_stale_check >= 14400:
-                # Re-scrape users every week (if they have not been re-visited)
-                enqueueStaleUsers(db=self.conn, days_old=7)
-                last_stale_check = time.time()
-                # Re-establish DB connection every 4 hours
-                self.conn.close()
-                self.conn = db_connection()
-                logging.info(
-                    "4 Hours Elapsed: Re-establishing Fresh Database Connection."
-                )
-            try:
-                #  Fetch first user from queue
-                data = getFirstInQueue(db=self.conn)
-
-                # If all pending users have been scraped batch requeue all users
-                if not data:
-                    getSponsorableUsers(self.conn, init_run)
-                    batchRequeue(db=self.conn)
-                    continue
-
-                github_id = data["github_id"]
-                priority = data["priority"]
-
-                log_header(f"SCRAPING CURRENT USER: Github ID {github_id} ")
-                print(
-                    f"\n\nProcessing user: Github ID {github_id} at priority: {priority}"
-                )
-
-                # Check if the user exists and if the user is enriched with REST API data
-                identity = findUser(github_id=github_id, db=self.conn)
-                # Safe unpacking with defaults
-                user_id = identity.get("user_id")
-                user_exists = bool(identity.get("user_exists", False))
-                is_enriched = bool(identity.get("is_enriched", False))
-
-                try:
-                    # User exists in DB from previous sponsor relation
-                    if user_exists and is_enriched == False:
-                        # Enrich user metadata from Github API / gender inference
-                        user = enrichUser(github_id, db=self.conn)
-                        logging.info(
-                            f"Processing User: Github ID {github_id} at priority: {priority}"
-                        )
-                    # User has already been scraped for their data once (prevents unwanted future updates)
-                    elif user_exists and is_enriched == True:
-                        user = enrichUser(
-                            github_id,
-                            db=self.conn,
-                            enriched=is_enriched,
-                            identity=identity,
+        self.last_stale_check = time.time()
+
+        try:
+            while not self.stop_requested.is_set():
+                # Check out a pooled connection for this iteration (returned/recycled automatically)
+                with get_connection() as self.conn:
+                    init_run = self._periodic_tasks(self.conn)
+                    try:
+                        # Publish scrapes whose generation bump was throttled
+                        flushDataGeneration(self.conn)
+
+                        # Claim the next batch of users with a lease
+                        self.claimed.extend(
+                            claimFromQueue(
+                                self.worker_id, db=self.conn, batch_size=QUEUE_CLAIM_BATCH
+                            )
                         )
-                        logging.info(
-                            f"User already enriched: Github ID {github_id} at priority: {priority}, Data has been refreshed."
-                        )
-                    # User does not exist in DB, create new user
-                    elif not user_exists:
-                        user, user_id = createUser(github_id, db=self.conn)
-                        logging.info(
-                            f"Creating User: Github ID {github_id} at priority: {priority}"
-                        )
-                except ValueError as e:
-                    logging.warning(
-                        "User has been deleted. They do not exist on github (sponsors if previously existed have been updated)"
-                    )
-                    continue
-
-                # Defensive checks: ensure we actually have a user object and a DB user_id
-                if user is None:
-                    logging.warning(
-                        f"No user data returned for Github ID {github_id}; skipping."
-                    )
-                    updateStatus(github_id=github_id, status="skipped", db=self.conn)
-                    continue
-
-                #  Crawl the user for sponsorship relations
-                print("Getting Sponsorships from GraphQL API:")
-                try:
-                    sponsors, sponsoring, private_count, min_sponsor_tier = (
-                        get_sponsorships(user.username, github_id, user.type)
-                    )
-
-                    # Only sync if we successfully got the FULL lists
-                    syncSponsors(github_id, sponsors, self.conn)
-                    syncSponsorships(github_id, sponsoring, self.conn)
-
-                except Exception as e:
-                    logging.error(
-                        f"Skipping sync for {user.username} due to fetch error: {e}"
-                    )
-                    # Do NOT update last_scraped so it tries again later
-                    continue
-
-                # Create a list of only the unique github_ids
-                # This is important if bi-directional sponsor relations exist
-                unique_users = list(set(sponsors) | set(sponsoring))
-                print(unique_users)
-
-                # Batch create unique users who are not present in the table
-                if unique_users:
-                    # User was discovered with new users, increase priority of user
-                    new_priority = min(int(priority) + 1, MAX_PRIORITY)
-
-                    # Create placeholder users to conform to foreign key constraint
-                    # Batch add users at a middle standing priority
-                    batchCreateUser(unique_users, db=self.conn)
-                    batchAddQueue(unique_users, priority=5, db=self.conn)
-
-                    # Collect the user activity from the Github API ONLY if the specified user HAS a sponsor or is sponsoring
-                    # Users without either dont need their user activity collected as they will not be shown in the dataset.
-                    print(f"\nCollecting User Activity Data:")
-
-                    # Checks if the user activity does not exist or is over 365 days old,
-                    # otherwise skip this function due to it being quite resource intensive
-                    refresh_activity = refreshActivityCheck(user_id, self.conn)
-                    if refresh_activity:
-                        getUserActivity(
-                            github_id=github_id,
-                            user_id=user_id,
-                            user_type=user.type,
-                            created_at=user.github_created_at,
-                            db=self.conn,
+
+                        # If all pending users have been scraped requeue the stale ones
+                        if not self.claimed:
+                            if self.leader:
+                                getSponsorableUsers(self.conn, init_run)
+                                batchRequeue(db=self.conn)
+                            self.stop_requested.wait(QUEUE_IDLE_WAIT)
+                            continue
+
+                        # Enrich/create the claimed users first so their account types are known
+                        profiled = []
+                        while self.claimed and not self.stop_requested.is_set():
+                            crawl = self._profile_user(self.claimed.popleft())
+                            if crawl is not None:
+                                profiled.append(crawl)
+
+                        #  Crawl the users for sponsorship relations (first pages batched)
+                        print("Getting Sponsorships from GraphQL API:")
+                        fetched = get_sponsorships_batch(
+                            [(crawl["github_id"], crawl["user"].type) for crawl in profiled]
                         )
-                # If no new users were found, but existing sponsor/sponsoring relationships exist
-                elif sponsors or sponsoring:
-                    new_priority = priority
-                # If no new users are found, and no sponsor relationships exist
-                else:
-                    # Decrement the priority for subsequent searches, with a floor of 1.
-                    new_priority = max(int(priority) - 1, 1)
-
-                # Update staus and priority of the crawled user
-                updateStatus(
-                    github_id=github_id,
-                    status="completed",
+                        for crawl in profiled:
+                            self._store_user(crawl, fetched[crawl["github_id"]])
+
+                    # Handle operational error thrown by DB
+                    except psycopg2.OperationalError as e:
+                        # The pool discards the broken connection, the next iteration checks out a fresh one
+                        logging.warning(f"DB connection lost: {e}. Reconnecting...")
+                        continue
+                    # If another error occurs, log the error and stop the scraper
+                    except Exception as e:
+                        logging.error(f"Unhandled exception: {e}", exc_info=True)
+                        time.sleep(10)
+                        break
+        finally:
+            self._shutdown()
+
+    def _profile_user(self, data):
+        """Enrich or create a claimed user. Returns the crawl state, or None when the user is skipped."""
+        start = time.time()
+        github_id = data["github_id"]
+        priority = data["priority"]
+
+        # Restart the lease clock for this user, skip it if the lease was lost meanwhile
+        if not renewLease(github_id, self.worker_id, db=self.conn):
+            logging.warning(
+                f"Lease on Github ID {github_id} was reclaimed by another worker; skipping."
+            )
+            return None
+
+        log_header(f"SCRAPING CURRENT USER: Github ID {github_id} ")
+        print(f"\n\nProcessing user: Github ID {github_id} at priority: {priority}")
+
+        # Check if the user exists and if the user is enriched with REST API data
+        identity = findUser(github_id=github_id, db=self.conn)
+        # Safe unpacking with defaults
+        user_id = identity.get("user_id")
+        user_exists = bool(identity.get("user_exists", False))
+        is_enriched = bool(identity.get("is_enriched", False))
+
+        try:
+            # User exists in DB from previous sponsor relation
+            if user_exists and is_enriched == False:
+                # Enrich user metadata from Github API / gender inference
+                user = enrichUser(github_id, db=self.conn)
+                logging.info(f"Processing User: Github ID {github_id} at priority: {priority}")
+            # User has already been scraped for their data once (prevents unwanted future updates)
+            elif user_exists and is_enriched == True:
+                user = enrichUser(
+                    github_id,
                     db=self.conn,
-                    priority=new_priority,
-                )
-
-                # Set last_scraped to the current time
-                finalizeUserScrape(
-                    github_id, private_count, min_sponsor_tier, db=self.conn
+                    enriched=is_enriched,
+                    identity=identity,
                 )
-
-                # Force commit to save the "completed" status immediately
-                self.conn.commit()
-
-                # Print the elapsed time taken to crawl the current user
-                end = time.time()
-                elapsed = end - start
                 logging.info(
-                    f"user Github ID {github_id} crawled: {elapsed:.2f} seconds elapsed"
+                    f"User already enriched: Github ID {github_id} at priority: {priority}, Data has been refreshed."
                 )
-                time.sleep(1)  # Wait before checking queue again
-
-            # Handle operational error thrown by DB
-            except psycopg2.OperationalError as e:
-                logging.warning(f"DB connection lost: {e}. Reconnecting...")
-                self.conn = db_connection()
-                continue
-            # If another error occurs, log the error and stop the scraper
-            except Exception as e:
-                logging.error(f"Unhandled exception: {e}", exc_info=True)
-                time.sleep(10)
-                break
+            # User does not exist in DB, create new user
+            elif not user_exists:
+                user, user_id = createUser(github_id, db=self.conn)
+                logging.info(f"Creating User: Github ID {github_id} at priority: {priority}")
+        except ValueError as e:
+            logging.warning(
+                "User has been deleted. They do not exist on github (sponsors if previously existed have been updated)"
+            )
+            return None
+
+        # Defensive checks: ensure we actually have a user object and a DB user_id
+        if user is None:
+            logging.warning(f"No user data returned for Github ID {github_id}; skipping.")
+            updateStatus(
+                github_id=github_id, status="skipped", db=self.conn, worker_id=self.worker_id
+            )
+            self._report(False)
+            return None
+
+        return {
+            "github_id": github_id,
+            "priority": priority,
+            "user_id": user_id,
+            "user": user,
+            "start": start,
+        }
+
+    def _store_user(self, crawl, result):
+        """Sync a profiled user's fetched relations and mark them completed."""
+        github_id, user = crawl["github_id"], crawl["user"]
+        try:
+            if isinstance(result, Exception):
+                raise result
+            sponsors, sponsoring, private_count, min_sponsor_tier = result
+
+            # The fetch can outlast the lease (pagination, token budget waits),
+            # never store a user another worker has reclaimed meanwhile
+            if not renewLease(github_id, self.worker_id, db=self.conn):
+                logging.warning(
+                    f"Lease on Github ID {github_id} expired while fetching; skipping."
+                )
+                return
+
+            # Only sync if we successfully got the FULL lists
+            syncSponsors(github_id, sponsors, self.conn)
+            syncSponsorships(github_id, sponsoring, self.conn)
+
+        except Exception as e:
+            logging.error(f"Skipping sync for {user.username} due to fetch error: {e}")
+            # Do NOT update last_scraped so it tries again later
+            self.conn.rollback()
+            self._report(False)
+            return
+
+        record_crawl(
+            github_id,
+            crawl["user_id"],
+            user,
+            crawl["priority"],
+            sponsors,
+            sponsoring,
+            private_count,
+            min_sponsor_tier,
+            db=self.conn,
+            worker_id=self.worker_id,
+        )
+        self._report(True)
+
+        # Print the elapsed time taken to crawl the current user
+        elapsed = time.time() - crawl["start"]
+        logging.info(f"user Github ID {github_id} crawled: {elapsed:.2f} seconds elapsed")
+
+    def _periodic_tasks(self, db):
+        """Seed the queue when due, refresh auth and enqueue stale users. Returns the init_run flag."""
+        # The shared jobs run once per period, not once per worker process
+        if not self.leader:
+            return False
+
+        # Load the worker state
+        state = load_worker_state()
+        init_run, last_init_run = state.get("init_run"), state.get("last_init_run")
+        elapsed: datetime
+
+        # Parse last_init_run which is stored as an ISO 8601 string (e.g. 2025-08-24T18:21:35.226820)
+        if last_init_run:
+            try:
+                last_init_run = date.fromisoformat(last_init_run)
+            except Exception:
+                # Fallback for strict parsing with microseconds
+                last_init_run = date.strptime(last_init_run, "%Y-%m-%dT%H:%M:%S.%f")
+            # Total time sice the last run
+            elapsed = date.now() - last_init_run
+        else:
+            elapsed = None
+
+        # Else if time since is none or older than 1 year, treat this as an initial run
+        if last_init_run is None or (
+            date.now() - last_init_run
+        ) > datetime.timedelta(days=365):
+            getSponsorableUsers(db, True)
+        # If time since last_init_run is older than 2 weeks, incremental collection
+        elif elapsed > datetime.timedelta(weeks=2):
+            getSponsorableUsers(db, init_run)
+
+        # Only reset the state if the worker completed an initial run prior
+        if init_run == True:
+            update_worker_state()
+
+        check_auth = is_auth_expiring_soon()
+        # If auth is close to expiration
+        if check_auth is True:
+            get_auth()
+
+        # Check last_stale_check every 4 hours
+        if time.time() - self.last_stale_check >= 14400:
+            # Re-scrape users every week (if they have not been re-visited)
+            enqueueStaleUsers(db=db, days_old=7)
+            self.last_stale_check = time.time()
+            logging.info("4 Hours Elapsed: Enqueued stale users for re-scraping.")
+        return init_run
+
+    def _shutdown(self):
+        # Hand unprocessed claims back so other workers do not wait for the leases to expire
+        try:
+            with get_connection() as conn:
+                releaseClaims(self.worker_id, db=conn)
+                # Publish the last scrapes right away, nothing else would bump for them
+                flushDataGeneration(conn, min_interval=0)
+        except Exception as e:
+            logging.warning(f"Could not release queue claims: {e}")
+        close_pool()
+        close_sessions()
+        browser_pool.close()
+
+
+# Store a crawled user's relations: queue newly discovered users, collect activity when due,
+# then mark the user completed with its new priority and commit. Returns the new priority.
+# Expects syncSponsors/syncSponsorships to have run for the user already. With worker_id,
+# the user is only completed while that worker still holds its claim.
+def record_crawl(
+    github_id,
+    user_id,
+    user,
+    priority,
+    sponsors,
+    sponsoring,
+    private_count,
+    min_sponsor_tier,
+    db,
+    worker_id=None,
+):
+    # Create a list of only the unique github_ids
+    # This is important if bi-directional sponsor relations exist
+    unique_users = list(set(sponsors) | set(sponsoring))
+    print(unique_users)
+
+    # Batch create unique users who are not present in the table
+    if unique_users:
+        # User was discovered with new users, increase priority of user
+        new_priority = min(int(priority) + 1, MAX_PRIORITY)
+
+        # Create placeholder users to conform to foreign key constraint
+        # Batch add users at a middle standing priority
+        batchCreateUser(unique_users, db=db)
+        batchAddQueue(unique_users, priority=5, db=db)
+
+        # Collect the user activity from the Github API ONLY if the specified user HAS a sponsor or is sponsoring
+        # Users without either dont need their user activity collected as they will not be shown in the dataset.
+        print(f"\nCollecting User Activity Data:")
+
+        # Checks if the user activity does not exist or is over 365 days old,
+        # otherwise skip this function due to it being quite resource intensive
+        refresh_activity = refreshActivityCheck(user_id, db)
+        if refresh_activity:
+            getUserActivity(
+                github_id=github_id,
+                user_id=user_id,
+                user_type=user.type,
+                created_at=user.github_created_at,
+                db=db,
+            )
+    # If no new users were found, but existing sponsor/sponsoring relationships exist
+    elif sponsors or sponsoring:
+        new_priority = priority
+    # If no new users are found, and no sponsor relationships exist
+    else:
+        # Decrement the priority for subsequent searches, with a floor of 1.
+        new_priority = max(int(priority) - 1, 1)
+
+    # Update staus and priority of the crawled user
+    if not updateStatus(
+        github_id=github_id,
+        status="completed",
+        db=db,
+        priority=new_priority,
+        worker_id=worker_id,
+    ):
+        logging.warning(
+            f"Claim on Github ID {github_id} was lost before completion; left to its new owner."
+        )
+
+    # Set last_scraped to the current time
+    finalizeUserScrape(github_id, private_count, min_sponsor_tier, db=db)
+
+    # Force commit to save the "completed" status immediately
+    db.commit()
+    return new_priority
 
 
 if __name__ == "__main__":
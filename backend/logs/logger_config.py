@@ -7,12 +7,12 @@ FILENAME = "scraper.log"
 
 
 # --- Logger Setup Function ---
-def init_logger():
+def init_logger(filename=FILENAME):
 
     # Create directory if it doesn't exist
     log_dir = Path("backend/logs")
     log_dir.mkdir(parents=True, exist_ok=True)
-    file_path = log_dir / FILENAME
+    file_path = log_dir / filename
 
     logging.basicConfig(
         handlers=[
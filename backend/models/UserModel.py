@@ -27,6 +27,9 @@ class UserModel:
     last_scraped: Optional[datetime]
     is_enriched: Optional[bool]
     github_created_at: datetime
+    # ETag / Last-Modified of the profile response, for conditional refreshes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
 
     @classmethod
     def from_api(cls, data: dict):
@@ -53,4 +56,6 @@ class UserModel:
             last_scraped=None,
             is_enriched=None,
             github_created_at=data["created_at"],
+            etag=data.get("etag"),
+            last_modified=data.get("last_modified"),
         )
@@ -5,6 +5,8 @@ import pytest
 from unittest.mock import Mock, MagicMock, patch
 from flask import Flask
 from backend.app import app
+from backend.api.statistics import stats_cache
+from backend.api.users import facet_cache, history_cache
 
 
 @pytest.fixture
@@ -16,12 +18,27 @@ def client():
         yield client
 
 
+@pytest.fixture(autouse=True)
+def fresh_result_caches():
+    """Start every test with empty result caches at a fixed data generation."""
+    caches = (stats_cache, facet_cache, history_cache)
+    for cache in caches:
+        cache.clear()
+    with patch.object(stats_cache, '_load_generation', return_value=0), \
+            patch.object(facet_cache, '_load_generation', return_value=0):
+        yield caches
+    for cache in caches:
+        cache.clear()
+
+
 @pytest.fixture
 def mock_db_connection():
-    """Mock database connection and cursor."""
+    """Mock pooled database connection and cursor."""
     mock_conn = MagicMock()
     mock_cursor = MagicMock()
     mock_conn.cursor.return_value = mock_cursor
+    # get_connection() is used as a context manager that yields the connection
+    mock_conn.__enter__.return_value = mock_conn
     return mock_conn, mock_cursor
 
 
@@ -0,0 +1,283 @@
+"""
+Tests for the asyncio ingest path (async worker, async GitHub requests, GraphQL pagers).
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from backend.ingest import async_worker
+from backend.ingest import utils as ingest_utils
+from backend.ingest.async_worker import AsyncIngestWorker
+from backend.ingest.utils import SponsorshipsPager, get_sponsorships, get_sponsorships_batch
+from backend.utils.github_api import postRequestAsync
+
+
+@pytest.fixture
+def patched_worker(mock_db_connection):
+    """AsyncIngestWorker whose queries are mocks and whose GitHub calls are fakes."""
+    mock_conn, _ = mock_db_connection
+    events = []
+    in_flight = {"now": 0, "max": 0}
+
+    async def fake_user_data(client, github_id, is_enriched=False, identity=None):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        events.append(("profile", github_id))
+        await asyncio.sleep(0.05)
+        in_flight["now"] -= 1
+        return SimpleNamespace(username=f"user{github_id}", type="User")
+
+    async def fake_batch(client, users):
+        events.append(("batch", [github_id for github_id, _ in users]))
+        await asyncio.sleep(0.05)
+        for github_id, _ in users:
+            events.append(("sponsors", github_id))
+        return {github_id: ([github_id + 100], [], 0, 0) for github_id, _ in users}
+
+    worker = AsyncIngestWorker(concurrency=2, worker_id="test-worker")
+    worker.last_stale_check = 0
+    claims = [[{"github_id": i, "priority": 5} for i in range(1, 5)], []]
+
+    def record(github_id, *args, **kwargs):
+        events.append(("stored", github_id))
+
+    with patch.object(async_worker, "get_connection", return_value=mock_conn), \
+            patch.object(worker, "_periodic_tasks", return_value=False), \
+            patch.object(async_worker, "claimFromQueue", side_effect=lambda *a, **k: claims.pop(0) if claims else []), \
+            patch.object(async_worker, "renewLease", return_value=True), \
+            patch.object(async_worker, "findUser", return_value={"user_id": 1, "user_exists": True, "is_enriched": True}), \
+            patch.object(async_worker, "enrichUser"), \
+            patch.object(async_worker, "syncSponsors"), \
+            patch.object(async_worker, "syncSponsorships"), \
+            patch.object(async_worker, "record_crawl", side_effect=record), \
+            patch.object(async_worker, "getSponsorableUsers"), \
+            patch.object(async_worker, "batchRequeue", side_effect=lambda db: worker.stop()), \
+            patch.object(async_worker, "getUserDataAsync", side_effect=fake_user_data), \
+            patch.object(ingest_utils, "get_sponsorships_batch_async", side_effect=fake_batch):
+        yield worker, events, in_flight
+
+
+class TestAsyncIngestWorker:
+    """Test suite for concurrent crawling in AsyncIngestWorker."""
+
+    def test_users_overlap_up_to_the_concurrency_limit(self, patched_worker):
+        """Independent users overlap their network waits, but never more than `concurrency`."""
+        worker, events, in_flight = patched_worker
+
+        asyncio.run(worker.run_async(client=MagicMock()))
+
+        assert {gid for step, gid in events if step == "stored"} == {1, 2, 3, 4}
+        assert in_flight["max"] == 2
+
+    def test_each_user_keeps_its_step_order(self, patched_worker):
+        """Profile, sponsorships and storage happen in order for every user."""
+        worker, events, _ = patched_worker
+
+        asyncio.run(worker.run_async(client=MagicMock()))
+
+        for github_id in range(1, 5):
+            steps = [step for step, gid in events if gid == github_id]
+            assert steps == ["profile", "sponsors", "stored"]
+
+    def test_concurrent_users_share_batched_requests(self, patched_worker):
+        """Users reaching the sponsorship step together are fetched in one batch."""
+        worker, events, _ = patched_worker
+
+        asyncio.run(worker.run_async(client=MagicMock()))
+
+        batches = [gids for step, gids in events if step == "batch"]
+        assert sorted(gid for batch in batches for gid in batch) == [1, 2, 3, 4]
+        assert len(batches) < 4
+
+    def test_failed_user_does_not_stop_the_others(self, patched_worker):
+        """An exception while crawling one user is reported as a failure for that user only."""
+        worker, events, _ = patched_worker
+        results = []
+        worker.on_user_done = results.append
+
+        with patch.object(async_worker, "syncSponsors", side_effect=[RuntimeError("boom"), None, None, None]):
+            asyncio.run(worker.run_async(client=MagicMock()))
+
+        assert sorted(results) == [False, True, True, True]
+
+    def test_user_reclaimed_during_fetch_is_not_stored(self, patched_worker):
+        """A lease that expired while fetching sponsorships skips the user's sync."""
+        worker, events, _ = patched_worker
+        renewals = {}
+
+        def renew(github_id, worker_id, db):
+            # The first renewal starts the crawl, the second one follows the fetch
+            renewals[github_id] = renewals.get(github_id, 0) + 1
+            return not (github_id == 1 and renewals[github_id] == 2)
+
+        with patch.object(async_worker, "renewLease", side_effect=renew), \
+                patch.object(async_worker, "syncSponsors") as mock_sync:
+            asyncio.run(worker.run_async(client=MagicMock()))
+
+        assert {gid for step, gid in events if step == "stored"} == {2, 3, 4}
+        assert 1 not in [call.args[0] for call in mock_sync.call_args_list]
+
+    def test_rejects_zero_concurrency(self):
+        with pytest.raises(ValueError):
+            AsyncIngestWorker(concurrency=0)
+
+
+class TestAsyncRequests:
+    """Test suite for the async GitHub request helpers and shared GraphQL pagers."""
+
+    def test_post_request_retries_server_errors(self):
+        """A 5xx response is retried, the next success is returned."""
+        statuses = [502, 200]
+
+        def handler(request):
+            return httpx.Response(statuses.pop(0), json={"data": {}})
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await postRequestAsync(client, "https://api.github.com/graphql", json={}, initial_delay=0)
+
+        response = asyncio.run(run())
+        assert response.status_code == 200
+        assert statuses == []
+
+    def test_post_request_does_not_retry_client_errors(self):
+        """A 4xx response is raised straight away."""
+        def handler(request):
+            return httpx.Response(401, json={})
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                await postRequestAsync(client, "https://api.github.com/graphql", json={}, initial_delay=0)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(run())
+
+    def test_sponsors_pager_follows_cursor(self):
+        """The combined pager collects sponsors across pages and counts private ones."""
+        pager = SponsorshipsPager(1, "User")
+
+        def page(nodes, has_next, cursor):
+            return {"data": {"node": {
+                "sponsorsListing": {"tiers": {"nodes": [{"monthlyPriceInCents": 500, "isOneTime": False}]}},
+                "sponsorshipsAsMaintainer": {
+                    "totalCount": 3,
+                    "pageInfo": {"hasNextPage": has_next, "endCursor": cursor},
+                    "nodes": nodes,
+                },
+                "sponsorshipsAsSponsor": {
+                    "totalCount": 0,
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": [],
+                },
+            }}}
+
+        pager.consume(page([{"sponsorEntity": {"databaseId": 7}}, {"privacyLevel": "PRIVATE"}], True, "c1"))
+        assert pager.next_request()["variables"]["sponsorsCursor"] == "c1"
+        pager.consume(page([{"sponsorEntity": {"databaseId": 8}}], False, None))
+
+        assert pager.result() == ([7, 8], [], 1, 5)
+        assert not pager.has_next_page
+
+
+def graphql_node(sponsor_ids, sponsoring_ids, sponsors_next=False, sponsoring_next=False):
+    """One user's node in a sponsorship response (both connections)."""
+    return {
+        "sponsorsListing": None,
+        "sponsorshipsAsMaintainer": {
+            "totalCount": len(sponsor_ids),
+            "pageInfo": {"hasNextPage": sponsors_next, "endCursor": "s1" if sponsors_next else None},
+            "nodes": [{"sponsorEntity": {"databaseId": i}} for i in sponsor_ids],
+        },
+        "sponsorshipsAsSponsor": {
+            "totalCount": len(sponsoring_ids),
+            "pageInfo": {"hasNextPage": sponsoring_next, "endCursor": "g1" if sponsoring_next else None},
+            "nodes": [{"sponsorable": {"databaseId": i}} for i in sponsoring_ids],
+        },
+    }
+
+
+class TestSponsorshipBatching:
+    """Test suite for fetching the first sponsorship pages of several users at once."""
+
+    @patch('backend.ingest.utils.postRequest')
+    def test_first_pages_come_from_one_request(self, mock_post):
+        """Users without further pages cost a single aliased request together."""
+        mock_post.return_value.json.return_value = {"data": {
+            "u0": graphql_node([7], [8]),
+            "u1": graphql_node([], [9]),
+        }}
+
+        results = get_sponsorships_batch([(1, "User"), (2, "Organization")])
+
+        assert mock_post.call_count == 1
+        query = mock_post.call_args[1]["json"]["query"]
+        assert "u0: node(id: $n0)" in query and "u1: node(id: $n1)" in query
+        assert results[1] == ([7], [8], 0, 0)
+        assert results[2] == ([], [9], 0, 0)
+
+    @patch('backend.ingest.utils.postRequest')
+    def test_users_with_more_pages_fall_back_to_pagination(self, mock_post):
+        """Only the connection reporting hasNextPage is paginated on its own."""
+        batch = MagicMock()
+        batch.json.return_value = {"data": {
+            "u0": graphql_node([7], [8], sponsors_next=True),
+            "u1": graphql_node([5], []),
+        }}
+        second_page = MagicMock()
+        second_page.json.return_value = {"data": {"node": graphql_node([70], [])}}
+        mock_post.side_effect = [batch, second_page]
+
+        results = get_sponsorships_batch([(1, "User"), (2, "User")])
+
+        assert mock_post.call_count == 2
+        assert mock_post.call_args[1]["json"]["variables"]["sponsorsCursor"] == "s1"
+        assert results[1] == ([7, 70], [8], 0, 0)
+        assert results[2] == ([5], [], 0, 0)
+
+    @patch('backend.ingest.utils.postRequest')
+    def test_user_errors_stay_with_that_user(self, mock_post):
+        """A GraphQL error on one alias fails that user only."""
+        mock_post.return_value.json.return_value = {
+            "data": {"u0": None, "u1": graphql_node([5], [])},
+            "errors": [{"path": ["u0"], "message": "Could not resolve to a node"}],
+        }
+
+        results = get_sponsorships_batch([(1, "User"), (2, "User")])
+
+        assert isinstance(results[1], Exception)
+        assert results[2] == ([5], [], 0, 0)
+
+
+class TestCombinedSponsorshipQuery:
+    """Test suite for fetching sponsors and sponsoring in one query per page."""
+
+    @patch('backend.ingest.utils.postRequest')
+    def test_single_page_user_costs_one_request(self, mock_post):
+        """Both relations and the tiers come back from the same request."""
+        node = graphql_node([7], [8])
+        node["sponsorsListing"] = {"tiers": {"nodes": [{"monthlyPriceInCents": 300, "isOneTime": False}]}}
+        mock_post.return_value.json.return_value = {"data": {"node": node}}
+
+        result = get_sponsorships("octocat", 1, "User")
+
+        assert mock_post.call_count == 1
+        assert result == ([7], [8], 0, 3)
+
+    def test_connections_follow_their_own_cursors(self):
+        """An exhausted connection is left out while the other keeps paging."""
+        pager = SponsorshipsPager(1, "User")
+        first = pager.next_request()["variables"]
+        assert first["withSponsors"] and first["withSponsoring"] and first["withTiers"]
+
+        pager.consume({"data": {"node": graphql_node([7], [8], sponsoring_next=True)}})
+        second = pager.next_request()["variables"]
+        assert second["withSponsoring"] and second["sponsoringCursor"] == "g1"
+        assert not second["withSponsors"] and not second["withTiers"]
+
+        # The response only carries the requested connection
+        pager.consume({"data": {"node": {"sponsorshipsAsSponsor": graphql_node([], [9])["sponsorshipsAsSponsor"]}}})
+        assert not pager.has_next_page
+        assert pager.result() == ([7], [8, 9], 0, 0)
@@ -0,0 +1,143 @@
+"""
+Tests for the pooled database connection manager.
+"""
+import threading
+
+import pytest
+from unittest.mock import MagicMock
+from psycopg2 import extensions
+
+from backend.utils.db_conn import ConnectionPool, PoolTimeout
+
+
+def make_conn():
+    """Build a mock psycopg2 connection that looks idle and open."""
+    conn = MagicMock()
+    conn.closed = 0
+    conn.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+
+class TestConnectionPool:
+    """Test suite for ConnectionPool."""
+
+    def test_reuses_returned_connection(self):
+        """A returned connection is handed out again instead of reconnecting."""
+        connect = MagicMock(side_effect=make_conn)
+        pool = ConnectionPool(min_size=0, max_size=2, connect=connect)
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        assert first is second
+        assert connect.call_count == 1
+
+    def test_rolls_back_open_transaction_on_return(self):
+        """Connections returned mid-transaction are rolled back."""
+        pool = ConnectionPool(min_size=0, max_size=1, connect=make_conn)
+
+        with pool.connection() as conn:
+            conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+
+        conn.rollback.assert_called()
+
+    def test_rolls_back_and_reraises_on_error(self):
+        """Errors inside the context roll back and propagate."""
+        pool = ConnectionPool(min_size=0, max_size=1, connect=make_conn)
+
+        with pytest.raises(ValueError):
+            with pool.connection() as conn:
+                raise ValueError("boom")
+
+        conn.rollback.assert_called()
+        assert pool.size == 1
+
+    def test_discards_closed_connection(self):
+        """Closed connections are dropped on checkout and replaced."""
+        connect = MagicMock(side_effect=make_conn)
+        pool = ConnectionPool(min_size=0, max_size=1, connect=connect)
+
+        with pool.connection() as first:
+            pass
+        first.closed = 1
+
+        with pool.connection() as second:
+            pass
+
+        assert second is not first
+        assert connect.call_count == 2
+
+    def test_recycles_after_max_uses(self):
+        """Connections are recycled once they reach max_uses."""
+        connect = MagicMock(side_effect=make_conn)
+        pool = ConnectionPool(min_size=0, max_size=1, max_uses=2, connect=connect)
+
+        conns = []
+        for _ in range(3):
+            with pool.connection() as conn:
+                conns.append(conn)
+
+        assert conns[0] is conns[1]
+        assert conns[2] is not conns[0]
+        conns[0].close.assert_called_once()
+
+    def test_pings_idle_connection(self):
+        """Idle connections are health checked before being handed out."""
+        connect = MagicMock(side_effect=make_conn)
+        pool = ConnectionPool(min_size=0, max_size=1, ping_after=0, connect=connect)
+
+        with pool.connection() as first:
+            pass
+        first.cursor.return_value.__enter__.return_value.execute.side_effect = (
+            extensions.QueryCanceledError("server closed the connection")
+        )
+
+        with pool.connection() as second:
+            pass
+
+        assert second is not first
+        assert connect.call_count == 2
+
+    def test_ping_and_rollback_run_outside_the_lock(self):
+        """Other callers are not blocked while a connection waits on the server."""
+        pool = ConnectionPool(min_size=0, max_size=2, ping_after=0, connect=make_conn)
+        lock_free = []
+
+        def probe():
+            acquired = pool._lock.acquire(blocking=False)
+            lock_free.append(acquired)
+            if acquired:
+                pool._lock.release()
+
+        def server_call(*args):
+            # The pool lock is reentrant, so probe it from another thread
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+
+        with pool.connection() as conn:
+            conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+            conn.rollback.side_effect = server_call
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = server_call
+        with pool.connection() as again:
+            again.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+        assert again is conn
+        assert len(lock_free) >= 2 and all(lock_free)
+        assert pool.size == 1
+
+    def test_timeout_when_exhausted(self):
+        """Checkout fails with PoolTimeout once max_size connections are in use."""
+        pool = ConnectionPool(min_size=0, max_size=1, timeout=0, connect=make_conn)
+
+        conn = pool.getconn()
+        with pytest.raises(PoolTimeout):
+            pool.getconn()
+        pool.putconn(conn)
+
+    def test_invalid_sizes(self):
+        """min_size may not exceed max_size."""
+        with pytest.raises(ValueError):
+            ConnectionPool(min_size=3, max_size=2, connect=make_conn)
@@ -0,0 +1,49 @@
+"""
+Tests for the shared, pooled HTTP sessions used for GitHub and geocoding requests.
+"""
+from unittest.mock import patch
+
+import pytest
+
+from backend.utils import http_sessions
+from backend.utils.http_sessions import close_sessions, create_async_client, create_session, get_session
+
+
+@pytest.fixture(autouse=True)
+def fresh_sessions():
+    close_sessions()
+    yield
+    close_sessions()
+
+
+class TestHttpSessions:
+    """Test suite for per-host session reuse and pool configuration."""
+
+    def test_one_session_per_host(self):
+        github = get_session("https://api.github.com/graphql")
+
+        assert get_session("https://api.github.com/user/1") is github
+        assert get_session("https://nominatim.openstreetmap.org/search?q=x") is not github
+
+    def test_closed_sessions_are_replaced(self):
+        first = get_session("https://api.github.com/graphql")
+        close_sessions()
+
+        assert get_session("https://api.github.com/graphql") is not first
+
+    def test_pool_size_and_connect_retries(self):
+        adapter = create_session(pool_size=4).get_adapter("https://api.github.com")
+
+        assert adapter._pool_maxsize == 4
+        assert adapter.max_retries.connect == http_sessions.HTTP_RETRIES
+        # Responses and timeouts are retried by the callers, not the transport
+        assert adapter.max_retries.read == 0
+        assert adapter.max_retries.status == 0
+
+    @pytest.mark.parametrize("available", [True, False])
+    def test_async_client_uses_http2_when_available(self, available):
+        with patch.object(http_sessions, "HTTP2", available), \
+                patch.object(http_sessions.httpx, "AsyncHTTPTransport") as transport:
+            create_async_client()
+
+        assert transport.call_args.kwargs["http2"] is available
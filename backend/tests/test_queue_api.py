@@ -9,7 +9,7 @@ from psycopg2.extras import RealDictRow
 class TestQueueAPI:
     """Test suite for /api/queue endpoint."""
 
-    @patch('backend.api.queue.db_connection')
+    @patch('backend.api.queue.get_connection')
     def test_get_queue_success(self, mock_db, client, mock_db_connection):
         """Test successful retrieval of queue items."""
         mock_conn, mock_cursor = mock_db_connection
@@ -34,7 +34,7 @@ class TestQueueAPI:
         # Verify ORDER BY created_at was used
         assert 'ORDER BY' in str(mock_cursor.execute.call_args).upper()
 
-    @patch('backend.api.queue.db_connection')
+    @patch('backend.api.queue.get_connection')
     def test_get_queue_empty(self, mock_db, client, mock_db_connection):
         """Test queue endpoint with empty queue."""
         mock_conn, mock_cursor = mock_db_connection
@@ -49,7 +49,7 @@ class TestQueueAPI:
         assert isinstance(data, list)
         assert len(data) == 0
 
-    @patch('backend.api.queue.db_connection')
+    @patch('backend.api.queue.get_connection')
     def test_get_queue_database_error(self, mock_db, client):
         """Test error handling when database connection fails."""
         mock_db.side_effect = Exception("Database connection failed")
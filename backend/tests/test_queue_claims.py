@@ -0,0 +1,147 @@
+"""
+Tests for lease-based claiming from the ingest queue and its hot/cold split.
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from backend.db.queries import queue
+
+
+@pytest.fixture
+def queue_db(mock_db_connection):
+    """Mock connection whose `with db.cursor()` yields the shared mock cursor."""
+    mock_conn, mock_cursor = mock_db_connection
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    return mock_conn, mock_cursor
+
+
+class TestQueueClaims:
+    """Test suite for claimFromQueue, renewLease and releaseClaims."""
+
+    def test_claim_uses_skip_locked_batch(self, queue_db):
+        """Claims a batch with FOR UPDATE SKIP LOCKED and records the worker lease."""
+        mock_conn, mock_cursor = queue_db
+        mock_cursor.fetchall.return_value = [(2, 5, 'b'), (1, 9, 'a')]
+
+        claimed = queue.claimFromQueue('worker-1', mock_conn, batch_size=2, lease_seconds=60)
+
+        sql, params = mock_cursor.execute.call_args_list[-1][0]
+        assert 'FOR UPDATE SKIP LOCKED' in sql
+        assert "status = 'processing'" in sql
+        assert params == (2, 'worker-1', 60)
+        # Highest priority first regardless of RETURNING order
+        assert claimed == [
+            {'github_id': 1, 'priority': 9},
+            {'github_id': 2, 'priority': 5},
+        ]
+        mock_conn.commit.assert_called_once()
+
+    def test_claims_come_back_in_claim_order(self, queue_db):
+        """Claims are returned in ORDER BY priority DESC order, NULL priorities first."""
+        mock_conn, mock_cursor = queue_db
+        mock_cursor.fetchall.return_value = [(1, 3, 1), (2, None, 2), (3, 7, 3), (4, 3, 0)]
+
+        claimed = queue.claimFromQueue('worker-1', mock_conn, batch_size=4)
+
+        assert [claim['github_id'] for claim in claimed] == [2, 3, 4, 1]
+
+    def test_claim_reclaims_expired_leases_first(self, queue_db):
+        """Expired leases go back to pending before the claim runs."""
+        mock_conn, mock_cursor = queue_db
+        mock_cursor.fetchall.return_value = []
+
+        assert queue.claimFromQueue('worker-1', mock_conn) == []
+
+        reclaim_sql = mock_cursor.execute.call_args_list[0][0][0]
+        assert 'lease_expires_at < NOW()' in reclaim_sql
+        assert "status = 'pending'" in reclaim_sql
+
+    def test_renew_lease_reports_lost_claim(self, queue_db):
+        """Renewal only succeeds while the worker still holds the user."""
+        mock_conn, mock_cursor = queue_db
+
+        mock_cursor.rowcount = 1
+        assert queue.renewLease(1, 'worker-1', mock_conn) is True
+
+        mock_cursor.rowcount = 0
+        assert queue.renewLease(1, 'worker-1', mock_conn) is False
+
+    def test_release_claims(self, queue_db):
+        """Unprocessed claims of a worker are returned to pending."""
+        mock_conn, mock_cursor = queue_db
+        mock_cursor.rowcount = 3
+
+        assert queue.releaseClaims('worker-1', mock_conn) == 3
+        assert mock_cursor.execute.call_args[0][1] == ('worker-1',)
+
+    def test_update_status_clears_lease(self, queue_db):
+        """Failing a user drops its lease."""
+        mock_conn, mock_cursor = queue_db
+        mock_cursor.rowcount = 1
+
+        queue.updateStatus(1, 'failed', mock_conn, priority=6)
+
+        sql = mock_cursor.execute.call_args[0][0]
+        assert 'claimed_by = NULL' in sql
+        assert 'lease_expires_at = NULL' in sql
+
+
+class TestQueueHotColdSplit:
+    """Test suite for moving crawled users between queue and crawl_state."""
+
+    def test_completed_user_moves_to_crawl_state(self, queue_db):
+        """Completing a user deletes it from the queue into crawl_state."""
+        mock_conn, mock_cursor = queue_db
+        mock_cursor.rowcount = 1
+
+        assert queue.updateStatus(1, 'completed', mock_conn, priority=6) is True
+
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'DELETE FROM queue' in sql
+        assert 'INSERT INTO crawl_state' in sql
+        assert params == (1, 6)
+        mock_conn.commit.assert_called_once()
+
+    def test_completion_requires_the_claim(self, queue_db):
+        """A worker whose lease was reclaimed does not complete the user."""
+        mock_conn, mock_cursor = queue_db
+        mock_cursor.rowcount = 0
+
+        assert queue.updateStatus(1, 'completed', mock_conn, priority=6, worker_id='worker-1') is False
+
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'claimed_by = %s' in sql
+        assert params == (1, 'worker-1', 6)
+
+    def test_batch_add_skips_crawled_users(self, queue_db):
+        """Rediscovered crawled users are not re-queued, only their priority is raised."""
+        mock_conn, mock_cursor = queue_db
+
+        with pytest.MonkeyPatch.context() as mp:
+            mock_execute_values = MagicMock()
+            mp.setattr('psycopg2.extras.execute_values', mock_execute_values)
+            queue.batchAddQueue([10, 11], 5, mock_conn)
+
+        queue_insert = mock_execute_values.call_args_list[-1][0][1]
+        assert 'NOT EXISTS' in queue_insert
+        assert 'crawl_state' in queue_insert
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'UPDATE crawl_state' in sql
+        assert params == (5, [10, 11], 5)
+
+    def test_requeue_reads_from_crawl_state(self, queue_db):
+        """Requeueing inserts crawled users back without rewriting crawl_state."""
+        mock_conn, mock_cursor = queue_db
+
+        queue.batchRequeue(mock_conn)
+        queue.enqueueStaleUsers(mock_conn, 7)
+
+        requeue_sql, requeue_params = mock_cursor.execute.call_args_list[0][0]
+        stale_sql, stale_params = mock_cursor.execute.call_args_list[1][0]
+        assert 'INSERT INTO queue' in requeue_sql and 'FROM crawl_state' in requeue_sql
+        # Only users due again, oldest first, in a bounded batch
+        assert 'completed_at <' in requeue_sql
+        assert 'ORDER BY c.completed_at' in requeue_sql and 'LIMIT %s' in requeue_sql
+        assert requeue_params == (queue.QUEUE_REQUEUE_AFTER_DAYS, queue.QUEUE_REQUEUE_BATCH)
+        assert 'completed_at <' in stale_sql
+        assert stale_params == (7,)
@@ -0,0 +1,168 @@
+"""
+Tests for the statistics result cache and its write-generation invalidation.
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+
+from backend.db.queries import users, data_generation
+from backend.utils.result_cache import ResultCache
+
+
+class TestResultCache:
+    """Test suite for ResultCache."""
+
+    def test_serves_repeat_from_memory(self):
+        """A second lookup for the same key does not recompute."""
+        cache = ResultCache(load_generation=lambda: 0)
+        compute = MagicMock(return_value={'total': 1})
+
+        assert cache.get_or_compute('brief', compute) == {'total': 1}
+        assert cache.get_or_compute('brief', compute) == {'total': 1}
+
+        assert compute.call_count == 1
+        assert cache.hits == 1
+
+    def test_generation_change_invalidates(self):
+        """Entries computed under an older data generation are not served."""
+        generation = MagicMock(return_value=1)
+        cache = ResultCache(generation_check=0, load_generation=generation)
+        compute = MagicMock(side_effect=['old', 'new'])
+
+        cache.get_or_compute('brief', compute)
+        generation.return_value = 2
+
+        assert cache.get_or_compute('brief', compute) == 'new'
+
+    def test_generation_is_checked_at_most_every_interval(self):
+        """Hits inside the check interval stay off the database."""
+        generation = MagicMock(return_value=1)
+        cache = ResultCache(generation_check=60, load_generation=generation)
+
+        for _ in range(5):
+            cache.get_or_compute('brief', lambda: 'value')
+
+        assert generation.call_count == 1
+
+    def test_ttl_expiry(self):
+        """Entries are recomputed once their TTL has passed."""
+        cache = ResultCache(ttl=0, load_generation=lambda: 0)
+        compute = MagicMock(return_value='value')
+
+        cache.get_or_compute('brief', compute)
+        cache.get_or_compute('brief', compute)
+
+        assert compute.call_count == 2
+
+    def test_evicts_least_recently_used(self):
+        """Past max_entries the least recently used key is dropped."""
+        cache = ResultCache(max_entries=2, load_generation=lambda: 0)
+        cache.get_or_compute('a', lambda: 1)
+        cache.get_or_compute('b', lambda: 2)
+        cache.get_or_compute('a', lambda: 1)
+        cache.get_or_compute('c', lambda: 3)
+
+        compute = MagicMock(return_value=2)
+        cache.get_or_compute('b', compute)
+
+        assert len(cache) == 2
+        compute.assert_called_once()
+
+    def test_uncacheable_results_are_not_stored(self):
+        """Results rejected by cacheable are recomputed next time."""
+        cache = ResultCache(load_generation=lambda: 0)
+        compute = MagicMock(return_value='error')
+
+        cache.get_or_compute('brief', compute, cacheable=lambda value: False)
+        cache.get_or_compute('brief', compute, cacheable=lambda value: False)
+
+        assert compute.call_count == 2
+
+    def test_bypassed_when_generation_unavailable(self):
+        """If the generation cannot be read the result is computed uncached."""
+        cache = ResultCache(load_generation=MagicMock(side_effect=Exception("down")))
+
+        assert cache.get_or_compute('brief', lambda: 'value') == 'value'
+        assert len(cache) == 0
+
+
+class TestCachedStatsEndpoints:
+    """Test suite for caching in front of stats_bp."""
+
+    @patch('backend.api.statistics.get_connection')
+    def test_repeat_request_served_from_cache(self, mock_db, client, mock_db_connection, sample_stats_data):
+        """Repeated dashboard loads do not hit the database."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.fetchone.return_value = {'brief': sample_stats_data}
+
+        first = client.get('/api/stats/brief')
+        second = client.get('/api/stats/brief')
+
+        assert first.status_code == second.status_code == 200
+        assert first.get_json() == second.get_json()
+        mock_cursor.execute.assert_called_once()
+
+    @patch('backend.api.statistics.get_connection')
+    def test_errors_are_not_cached(self, mock_db, client, mock_db_connection, sample_stats_data):
+        """A failed query is retried on the next request."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.side_effect = [Exception("Database error"), mock_conn]
+        mock_cursor.fetchone.return_value = {'brief': sample_stats_data}
+
+        assert client.get('/api/stats/brief').status_code == 500
+        assert client.get('/api/stats/brief').status_code == 200
+
+    def test_finalize_user_scrape_marks_data_changed(self, mock_db_connection):
+        """The worker records a data change once the scrape is committed."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [(1, False)]
+        order = []
+        mock_conn.commit.side_effect = lambda: order.append('commit')
+
+        with patch('backend.db.queries.users.refreshSponsorshipStats'), \
+                patch('backend.db.queries.users.refreshMedianSponsorCost'), \
+                patch('backend.db.queries.users.markDataChanged',
+                      side_effect=lambda db: order.append('mark')) as mock_mark:
+            users.finalizeUserScrape(100, 0, None, mock_conn)
+
+        mock_mark.assert_called_once_with(mock_conn)
+        assert order == ['commit', 'mark']
+
+
+class TestDataGenerationThrottle:
+    """Test suite for throttled data generation bumps."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_state(self):
+        with patch.object(data_generation, '_last_bump', None), \
+                patch.object(data_generation, '_pending', False):
+            yield
+
+    def bumps(self, mock_conn):
+        return mock_conn.cursor.return_value.__enter__.return_value.execute.call_count
+
+    def test_throttled_changes_are_flushed_later(self):
+        """A change inside the interval stays pending until a later flush publishes it."""
+        mock_conn = MagicMock()
+        with patch('backend.db.queries.data_generation.time.monotonic',
+                   side_effect=[100.0, 101.0, 102.0, 106.0, 106.0]):
+            assert data_generation.markDataChanged(mock_conn, min_interval=5) is True
+            assert data_generation.markDataChanged(mock_conn, min_interval=5) is False
+            assert data_generation.flushDataGeneration(mock_conn, min_interval=5) is False
+            assert data_generation.flushDataGeneration(mock_conn, min_interval=5) is True
+
+        assert self.bumps(mock_conn) == 2
+        assert mock_conn.commit.call_count == 2
+        # Nothing left to publish
+        assert data_generation.flushDataGeneration(mock_conn, min_interval=0) is False
+
+    def test_failed_bump_does_not_start_the_interval(self):
+        """A bump that was not committed stays pending and does not throttle the next one."""
+        mock_conn = MagicMock()
+        mock_conn.commit.side_effect = [Exception("connection lost"), None]
+
+        with pytest.raises(Exception):
+            data_generation.markDataChanged(mock_conn, min_interval=5)
+        assert data_generation.flushDataGeneration(mock_conn, min_interval=5) is True
+        assert self.bumps(mock_conn) == 2
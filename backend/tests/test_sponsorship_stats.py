@@ -0,0 +1,164 @@
+"""
+Tests for the incrementally maintained user_sponsorship_stats table.
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+
+from backend.db.queries import sponsors, sponsorship_stats, users
+
+
+class TestSponsorshipStatsMaintenance:
+    """Test suite for keeping user_sponsorship_stats in step with sponsorship edges."""
+
+    @patch('backend.db.queries.sponsors.refreshSponsorshipStats')
+    @patch('backend.db.queries.sponsors.batchGetUserId')
+    @patch('backend.db.queries.sponsors._ensure_users_exist')
+    def test_sync_sponsors_refreshes_touched_users(self, mock_ensure, mock_ids, mock_refresh, mock_db_connection):
+        """syncSponsors refreshes the sponsored user plus added and removed sponsors before committing."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        # sponsored user -> row 1, latest sponsors -> rows 2, 3
+        mock_ids.side_effect = [[1], [2, 3]]
+        # existing sponsors: rows 3, 4 (4 is removed, 2 is added)
+        mock_cursor.fetchall.return_value = [(3,), (4,)]
+
+        sponsors.syncSponsors(100, [200, 300], mock_conn)
+
+        refreshed = mock_refresh.call_args[0][0]
+        assert set(refreshed) == {1, 2, 4}
+        assert mock_refresh.call_args[0][1] is mock_conn
+        mock_conn.commit.assert_called()
+
+    @patch('backend.db.queries.sponsors.refreshSponsorshipStats')
+    @patch('backend.db.queries.sponsors.batchGetUserId')
+    @patch('backend.db.queries.sponsors._ensure_users_exist')
+    def test_sync_sponsorships_refreshes_touched_users(self, mock_ensure, mock_ids, mock_refresh, mock_db_connection):
+        """syncSponsorships refreshes the sponsor plus every sponsored user whose edge changed."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_ids.side_effect = [[1], [5]]
+        mock_cursor.fetchall.return_value = [(6,)]
+
+        sponsors.syncSponsorships(100, [500], mock_conn)
+
+        refreshed = mock_refresh.call_args[0][0]
+        assert set(refreshed) == {1, 5, 6}
+
+    @patch('backend.db.queries.sponsors.bumpSponsorHistoryVersion')
+    @patch('backend.db.queries.sponsors.refreshSponsorshipStats')
+    @patch('backend.db.queries.sponsors.batchGetUserId')
+    @patch('backend.db.queries.sponsors._ensure_users_exist')
+    def test_sync_sponsors_bumps_history_version_on_change(self, mock_ensure, mock_ids, mock_refresh, mock_bump, mock_db_connection):
+        """A changed sponsor set invalidates the sponsored user's cached timeline."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_ids.side_effect = [[1], [2, 3]]
+        mock_cursor.fetchall.return_value = [(3,)]
+
+        sponsors.syncSponsors(100, [200, 300], mock_conn)
+
+        mock_bump.assert_called_once_with([1], mock_conn)
+
+    @patch('backend.db.queries.sponsors.bumpSponsorHistoryVersion')
+    @patch('backend.db.queries.sponsors.refreshSponsorshipStats')
+    @patch('backend.db.queries.sponsors.batchGetUserId')
+    @patch('backend.db.queries.sponsors._ensure_users_exist')
+    def test_sync_sponsors_keeps_history_version_when_unchanged(self, mock_ensure, mock_ids, mock_refresh, mock_bump, mock_db_connection):
+        """An unchanged sponsor set keeps the cached timeline valid."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_ids.side_effect = [[1], [2, 3]]
+        mock_cursor.fetchall.return_value = [(2,), (3,)]
+
+        sponsors.syncSponsors(100, [200, 300], mock_conn)
+
+        mock_bump.assert_not_called()
+
+    @patch('backend.db.queries.sponsors.execute_values')
+    @patch('backend.db.queries.sponsors.refreshSponsorshipStats')
+    @patch('backend.db.queries.sponsors.batchGetUserId')
+    def test_sync_commits_once(self, mock_ids, mock_refresh, mock_values, mock_db_connection):
+        """Placeholder users, edges, history and stats are committed in a single transaction."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_ids.side_effect = [[1], [2, 3]]
+        mock_cursor.fetchall.return_value = [(4,)]
+
+        sponsors.syncSponsors(100, [300, 200], mock_conn)
+
+        assert mock_values.call_args.args[2] == [(100,), (200,), (300,)]
+        mock_conn.commit.assert_called_once()
+
+    def test_refresh_locks_summary_rows_in_id_order(self, mock_db_connection):
+        """Summary rows are locked, sorted, before the counts are recomputed."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+
+        sponsorship_stats.refreshSponsorshipStats([7, None, 3, 7], mock_conn)
+
+        statements = [c.args[0] for c in mock_cursor.execute.call_args_list]
+        lock = next(i for i, sql in enumerate(statements) if "FOR UPDATE" in sql)
+        recount = next(i for i, sql in enumerate(statements) if "COUNT(s.sponsor_id)" in sql)
+        assert lock < recount
+        assert mock_cursor.execute.call_args_list[lock].args[1] == ([3, 7],)
+
+    def test_create_sponsors_does_not_commit(self, mock_db_connection):
+        """Edge inserts are left to the caller's transaction."""
+        mock_conn, _ = mock_db_connection
+
+        sponsors.createSponsors(1, [2, 3], mock_conn)
+
+        mock_conn.commit.assert_not_called()
+
+
+class TestEstimatedEarnings:
+    """Test suite for the precomputed estimated_earnings column and stored median."""
+
+    @patch('backend.db.queries.users.refreshSponsorshipStats')
+    @patch('backend.db.queries.users.refreshMedianSponsorCost')
+    def test_finalize_refreshes_median_when_cost_changes(self, mock_median, mock_refresh, mock_db_connection):
+        """A new min_sponsor_cost re-checks the median before the user's row is refreshed."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [(1, True)]
+
+        users.finalizeUserScrape(100, 0, 5, mock_conn)
+
+        mock_median.assert_called_once_with(mock_conn)
+        mock_refresh.assert_called_once_with([1], mock_conn)
+
+    @patch('backend.db.queries.users.refreshSponsorshipStats')
+    @patch('backend.db.queries.users.refreshMedianSponsorCost')
+    def test_finalize_skips_median_when_cost_unchanged(self, mock_median, mock_refresh, mock_db_connection):
+        """An unchanged tier cost cannot move the median."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [(1, False)]
+
+        users.finalizeUserScrape(100, 0, 5, mock_conn)
+
+        mock_median.assert_not_called()
+        mock_refresh.assert_called_once_with([1], mock_conn)
+
+    def test_unchanged_median_skips_bulk_recompute(self, mock_db_connection):
+        """Earnings are only re-priced in bulk when the stored median moves."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        # median value, then the conditional upsert returns no row
+        mock_cursor.fetchone.side_effect = [(5,), None]
+
+        assert sponsorship_stats.refreshMedianSponsorCost(mock_conn) is False
+        assert mock_cursor.execute.call_count == 2
+
+    def test_shifted_median_recomputes_all_earnings(self, mock_db_connection):
+        """A moved median triggers one bulk UPDATE of estimated_earnings."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchone.side_effect = [(10,), (1,)]
+
+        assert sponsorship_stats.refreshMedianSponsorCost(mock_conn) is True
+        bulk_sql = mock_cursor.execute.call_args_list[-1][0][0]
+        assert 'UPDATE user_sponsorship_stats' in bulk_sql
+        assert 'estimated_earnings' in bulk_sql
+        # Rows whose estimate does not move are left alone
+        assert 'sc.estimated_earnings IS DISTINCT FROM' in bulk_sql
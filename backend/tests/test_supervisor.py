@@ -0,0 +1,126 @@
+"""
+Tests for the multi-process ingest supervisor.
+"""
+import multiprocessing
+import signal
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from backend.ingest import supervisor as ingest_supervisor
+from backend.ingest import worker as ingest_worker
+from backend.ingest.supervisor import IngestSupervisor, ThroughputCounters, run_worker
+from backend.ingest.worker import IngestWorker
+
+
+# Process targets must live at module level so the child can import them
+def crawl_and_exit(slot, counters):
+    counters.record(slot, True)
+
+
+def crawl_until_terminated(slot, counters):
+    stopped = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.append(signum))
+    # Report readiness through the failed counter once the handler is installed
+    counters.record(slot, False)
+    while not stopped:
+        time.sleep(0.01)
+    counters.record(slot, True)
+
+
+@pytest.fixture
+def ctx():
+    return multiprocessing.get_context("fork")
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestIngestSupervisor:
+    """Test suite for restarting, stopping and counting worker processes."""
+
+    def test_counters_are_kept_per_slot(self, ctx):
+        """Crawled and failed users are tallied per worker slot."""
+        counters = ThroughputCounters(2, ctx=ctx)
+        counters.record(0, True)
+        counters.record(1, True)
+        counters.record(1, False)
+
+        assert counters.snapshot() == ([1, 1], [0, 1])
+
+    def test_crashed_workers_are_restarted(self, ctx):
+        """A child that exits while the supervisor runs is started again in its slot."""
+        supervisor = IngestSupervisor(workers=2, target=crawl_and_exit, ctx=ctx, max_restart_delay=0)
+        supervisor.start()
+
+        def restarted():
+            supervisor.check_workers()
+            return supervisor.restarts >= 2
+
+        assert wait_for(restarted)
+        supervisor.shutdown(timeout=5)
+        crawled, _ = supervisor.counters.snapshot()
+        assert all(count >= 1 for count in crawled)
+
+    def test_restart_backs_off_while_crashing(self, ctx):
+        """Repeated crashes of one slot delay its next restart."""
+        supervisor = IngestSupervisor(workers=1, target=crawl_and_exit, ctx=ctx, max_restart_delay=30)
+        supervisor.start()
+        supervisor.processes[0].join()
+
+        supervisor.check_workers()  # first crash restarts immediately
+        supervisor.processes[0].join()
+        supervisor.check_workers()  # second crash waits
+
+        assert supervisor.restarts == 1
+        assert supervisor.restart_at[0] > time.monotonic()
+        supervisor.shutdown(timeout=5)
+
+    def test_shutdown_signals_every_worker(self, ctx):
+        """Stopping forwards SIGTERM so each child finishes and exits cleanly."""
+        supervisor = IngestSupervisor(workers=3, target=crawl_until_terminated, ctx=ctx)
+        supervisor.start()
+        assert wait_for(lambda: supervisor.counters.snapshot()[1] == [1, 1, 1])
+
+        supervisor.shutdown(timeout=5)
+
+        assert all(p.exitcode == 0 for p in supervisor.processes)
+        assert supervisor.counters.snapshot()[0] == [1, 1, 1]
+        # No restarts once stopping
+        supervisor.check_workers()
+        assert supervisor.restarts == 0
+
+    def test_rejects_zero_workers(self):
+        with pytest.raises(ValueError):
+            IngestSupervisor(workers=0)
+
+
+class TestSharedJobs:
+    """Test suite for running the shared ingest jobs in one worker only."""
+
+    def test_only_slot_zero_leads(self):
+        counters = ThroughputCounters(2, ctx=multiprocessing.get_context("fork"))
+        with patch.object(ingest_supervisor, "IngestWorker") as mock_worker, \
+                patch.object(ingest_supervisor.signal, "signal"):
+            run_worker(0, counters)
+            run_worker(1, counters)
+
+        assert [c.kwargs["leader"] for c in mock_worker.call_args_list] == [True, False]
+
+    def test_followers_skip_periodic_tasks(self):
+        worker = IngestWorker(worker_id="test-worker", leader=False)
+        with patch.object(ingest_worker, "load_worker_state") as mock_state, \
+                patch.object(ingest_worker, "get_auth") as mock_auth, \
+                patch.object(ingest_worker, "enqueueStaleUsers") as mock_stale:
+            assert worker._periodic_tasks(MagicMock()) is False
+
+        mock_state.assert_not_called()
+        mock_auth.assert_not_called()
+        mock_stale.assert_not_called()
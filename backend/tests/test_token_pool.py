@@ -0,0 +1,174 @@
+"""
+Tests for the pooled GitHub tokens and their per-API rate limit budgets.
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+
+from backend.utils import github_api
+from backend.utils import token_pool
+from backend.utils.token_pool import TokenPool, load_tokens, query_key, REST, GRAPHQL
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def rate_headers(remaining, reset=2000):
+    return {"X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset": str(reset)}
+
+
+class TestTokenPool:
+    """Test suite for picking and pacing tokens by their budgets."""
+
+    def test_load_tokens_splits_pat_list(self, monkeypatch):
+        monkeypatch.setenv("PAT", "tok_a, tok_b\ntok_c")
+        assert load_tokens() == ["tok_a", "tok_b", "tok_c"]
+
+    def test_picks_token_with_most_headroom(self):
+        pool = TokenPool(["a", "b"], clock=FakeClock())
+        pool.update("a", GRAPHQL, rate_headers(10))
+        pool.update("b", GRAPHQL, rate_headers(400))
+
+        assert pool.pick(GRAPHQL) == ("b", None)
+
+    def test_budgets_are_separate_per_api(self):
+        """An exhausted GraphQL budget does not affect REST requests with the same token."""
+        pool = TokenPool(["a"], clock=FakeClock())
+        pool.update("a", GRAPHQL, rate_headers(0))
+
+        assert pool.pick(GRAPHQL) == (None, 2001)
+        assert pool.pick(REST) == ("a", None)
+
+    def test_reservations_spread_concurrent_callers(self):
+        """Each pick reserves a request, so a token that was just used yields to the other."""
+        pool = TokenPool(["a", "b"], clock=FakeClock())
+        pool.update("a", REST, rate_headers(5))
+        pool.update("b", REST, rate_headers(5))
+
+        assert [pool.pick(REST)[0] for _ in range(2)] == ["a", "b"]
+
+    def test_budget_is_spread_over_the_reset_window(self):
+        """With 4 requests left and 1000s to the reset, the token is ready every 250s."""
+        clock = FakeClock()
+        pool = TokenPool(["a"], clock=clock)
+        pool.update("a", REST, rate_headers(5))
+
+        assert pool.pick(REST) == ("a", None)
+        assert pool.pick(REST) == (None, 1250)
+
+        clock.now = 1250
+        assert pool.pick(REST) == ("a", None)
+
+    def test_expensive_queries_are_spaced_further_apart(self):
+        """Pacing scales with the predicted cost of the next call."""
+        pool = TokenPool(["a"], clock=FakeClock())
+        pool.update("a", GRAPHQL, rate_headers(100))
+        pool.pick(GRAPHQL)
+        pool.update("a", GRAPHQL, rate_headers(100))
+
+        assert pool.pick(GRAPHQL, cost=1) == (None, 1010)
+        assert pool.pick(GRAPHQL, cost=10) == (None, 1100)
+
+    def test_predicted_cost_follows_observed_costs(self):
+        pool = TokenPool(["a"], clock=FakeClock())
+        assert pool.predict_cost("q") == 1
+
+        pool.observe("a", "q", {"cost": 10, "remaining": 4990, "resetAt": "1970-01-01T00:33:20Z"})
+        assert pool.predict_cost("q") == 10
+        pool.observe("a", "q", {"cost": 20, "remaining": 4970, "resetAt": "1970-01-01T00:33:20Z"})
+        assert pool.predict_cost("q") == pytest.approx(13)
+        # Other queries keep their own estimate
+        assert pool.predict_cost("other") == 1
+
+    def test_queries_of_one_template_share_a_cost(self):
+        """Search terms and date ranges embedded in the text do not split the estimate."""
+        template = 'query($cursor: String) {{ search(query: "{q}", type: USER, first: 100) {{ n }} }}'
+        first = query_key(template.format(q="is:sponsorable created:2020-01-01..2020-01-31"))
+        second = query_key(template.format(q='is:sponsorable created:2020-02-01..2020-02-29 \\"x\\"'))
+
+        assert first == second
+        assert query_key("query {\n  viewer { login }\n}") == "query { viewer { login } }"
+
+    def test_cost_table_is_bounded(self):
+        pool = TokenPool(["a"], clock=FakeClock())
+        rate_limit = {"cost": 5, "remaining": 4000, "resetAt": "1970-01-01T00:33:20Z"}
+        with patch.object(token_pool, "COST_TABLE_MAX_ENTRIES", 2):
+            pool.observe("a", "q1", rate_limit)
+            pool.observe("a", "q2", rate_limit)
+            pool.predict_cost("q1")
+            pool.observe("a", "q3", rate_limit)
+
+        assert pool.predict_cost("q2") == 1
+        assert pool.predict_cost("q1") == 5
+        assert pool.predict_cost("q3") == 5
+
+    def test_observed_rate_limit_sets_the_budget(self):
+        pool = TokenPool(["a"], clock=FakeClock())
+        pool.observe("a", "q", {"cost": 1, "remaining": 0, "resetAt": "1970-01-01T00:33:20Z"})
+
+        assert pool.pick(GRAPHQL) == (None, 2001)
+
+    def test_waits_only_when_every_token_is_exhausted(self):
+        clock = FakeClock()
+        pool = TokenPool(["a", "b"], clock=clock)
+        pool.update("a", GRAPHQL, rate_headers(0, reset=1500))
+        assert pool.pick(GRAPHQL) == ("b", None)
+
+        pool.update("b", GRAPHQL, rate_headers(0, reset=1800))
+        assert pool.pick(GRAPHQL) == (None, 1501)
+
+        # After the earliest reset that token is usable again
+        clock.now = 1501
+        assert pool.pick(GRAPHQL) == ("a", None)
+
+    def test_rejects_empty_pool(self):
+        with pytest.raises(ValueError):
+            TokenPool([])
+
+
+class TestPooledRequests:
+    """Test suite for GitHub requests switching tokens and reporting GraphQL costs."""
+
+    def test_rate_limited_post_retries_with_next_token(self):
+        """A token that runs out is replaced by another instead of sleeping."""
+        pool = TokenPool(["a", "b"], clock=FakeClock())
+        limited = MagicMock(status_code=403, text="rate limit", headers=rate_headers(0))
+        ok = MagicMock(status_code=200, text="{}", headers=rate_headers(4999))
+
+        with patch.object(github_api, "token_pool", pool), \
+                patch.object(github_api, "get_session") as mock_session, \
+                patch.object(github_api, "waitForBudget") as mock_sleep:
+            mock_post = mock_session.return_value.post
+            mock_post.side_effect = [limited, ok]
+            response = github_api.postRequest("https://api.github.com/graphql", json={})
+
+        assert response is ok
+        used = [call.kwargs["headers"]["Authorization"] for call in mock_post.call_args_list]
+        assert used[0] != used[1]
+        mock_sleep.assert_not_called()
+
+    def test_graphql_cost_is_requested_and_recorded(self):
+        """rateLimit is added to the query and its cost feeds the next prediction."""
+        pool = TokenPool(["a"], clock=FakeClock())
+        ok = MagicMock(status_code=200, headers=rate_headers(4990))
+        ok.json.return_value = {"data": {
+            "viewer": {"login": "octocat"},
+            "rateLimit": {"cost": 7, "remaining": 4990, "resetAt": "1970-01-01T00:33:20Z"},
+        }}
+        query = "query { viewer { login } }"
+
+        with patch.object(github_api, "token_pool", pool), \
+                patch.object(github_api, "get_session") as mock_session:
+            mock_post = mock_session.return_value.post
+            mock_post.return_value = ok
+            github_api.postRequest("https://api.github.com/graphql", json={"query": query})
+
+        sent = mock_post.call_args.kwargs["json"]["query"]
+        # Selected next to the query's own root fields
+        assert sent.startswith("query { viewer { login } ")
+        assert sent.endswith("rateLimit { cost remaining resetAt }\n}")
+        assert pool.predict_cost(query) == 7
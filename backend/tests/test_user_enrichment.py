@@ -0,0 +1,575 @@
+"""
+Tests for fetching and enriching GitHub user profiles in the ingest worker.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+import requests
+
+from backend.db.queries import users
+from backend.db.queries.users import (
+    NOT_MODIFIED,
+    enrichUser,
+    getGithubData,
+    getLocation,
+    getLocationAsync,
+    getUserData,
+)
+from backend.utils.browser_pool import BrowserPool, _block_resources
+from backend.utils.gazetteer import Gazetteer, gazetteer
+from backend.utils.gender_inference import GenderInference, _parse_genders
+from backend.utils.geocode_cache import GeocodeCache, RequestSpacer
+from backend.utils.name_gender import LocalGenderModel, NameGenderModel
+
+
+def profile_response(status_code=200, etag='"abc"', last_modified="Mon, 05 Oct 2026 10:00:00 GMT"):
+    response = MagicMock(spec=requests.Response)
+    response.status_code = status_code
+    response.headers = {"ETag": etag, "Last-Modified": last_modified}
+    response.json.return_value = {
+        "id": 1, "login": "octocat", "name": "The Octocat", "type": "User", "location": None,
+        "avatar_url": "", "html_url": "", "following": 0, "followers": 0,
+        "public_repos": 0, "public_gists": 0, "created_at": "2011-01-25T18:44:36Z",
+    }
+    return response
+
+
+ENRICHED = {"user_exists": True, "is_enriched": True, "gender": "Female", "pronouns": False,
+            "etag": '"abc"', "last_modified": "Mon, 05 Oct 2026 10:00:00 GMT"}
+
+
+class TestConditionalRefresh:
+    """Test suite for refreshing enriched profiles with stored ETags."""
+
+    @patch.object(users, "getRequest")
+    def test_refresh_sends_stored_validators(self, mock_get):
+        mock_get.return_value = profile_response(status_code=304)
+
+        assert getGithubData(1, db=MagicMock(), identity=ENRICHED) is NOT_MODIFIED
+        headers = mock_get.call_args.kwargs["headers"]
+        assert headers["If-None-Match"] == '"abc"'
+        assert headers["If-Modified-Since"] == ENRICHED["last_modified"]
+
+    @patch.object(users, "getRequest")
+    def test_first_enrichment_is_unconditional(self, mock_get):
+        mock_get.return_value = profile_response()
+
+        getGithubData(1, db=MagicMock(), identity={**ENRICHED, "is_enriched": False})
+
+        assert mock_get.call_args.kwargs["headers"] is None
+
+    @patch.object(users, "applyGender", side_effect=lambda user, *args: user)
+    @patch.object(users, "getRequest")
+    def test_new_validators_are_kept_with_the_user(self, mock_get, _):
+        mock_get.return_value = profile_response(etag='"def"')
+
+        user = getUserData(1, db=MagicMock(), is_enriched=True, identity=ENRICHED)
+
+        assert user.etag == '"def"'
+        assert user.last_modified == ENRICHED["last_modified"]
+
+    @patch.object(users, "getGender")
+    @patch.object(users, "getLocation")
+    @patch.object(users, "getRequest")
+    def test_not_modified_skips_enrichment(self, mock_get, mock_location, mock_gender, mock_db_connection):
+        """A 304 skips geocoding, gender inference and the users UPDATE."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_cursor.__enter__.return_value = mock_cursor
+        stored = users.UserModel.from_api(profile_response().json())
+        mock_cursor.fetchone.return_value = tuple(vars(stored).values())
+        mock_get.return_value = profile_response(status_code=304)
+
+        user = enrichUser(1, db=mock_conn, enriched=True, identity=ENRICHED)
+
+        assert user.username == "octocat"
+        mock_location.assert_not_called()
+        mock_gender.assert_not_called()
+        statements = [call.args[0] for call in mock_cursor.execute.call_args_list]
+        assert not any("UPDATE" in sql for sql in statements)
+        mock_conn.commit.assert_not_called()
+
+
+BERLIN = [{"importance": 0.8, "address": {"city": "Berlin", "country": "Germany"}}]
+
+
+@pytest.fixture
+def geocoding(mock_db_connection):
+    """Fresh geocode cache over a mock DB tier (empty unless told otherwise), no spacing
+    and no offline gazetteer, so every location goes through the cache."""
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.__enter__.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = None
+    cache = GeocodeCache(connection=lambda: mock_conn)
+    with patch.object(users, "gazetteer", Gazetteer([])), \
+            patch.object(users, "geocode_cache", cache), \
+            patch.object(users, "nominatim_spacer", RequestSpacer(min_interval=0)), \
+            patch.object(users, "get_session") as mock_session:
+        yield cache, mock_cursor, mock_session.return_value.get
+
+
+def nominatim_response(status_code=200, body=BERLIN):
+    response = MagicMock(status_code=status_code, text="")
+    response.json.return_value = body
+    return response
+
+
+class TestGeocodeCache:
+    """Test suite for resolving locations through the two-tier geocode cache."""
+
+    def test_repeated_locations_are_geocoded_once(self, geocoding):
+        cache, mock_cursor, mock_get = geocoding
+        mock_get.return_value = nominatim_response()
+
+        assert getLocation("Berlin") == "Germany"
+        assert getLocation("  berlin, ") == "Germany"
+
+        assert mock_get.call_count == 1
+        inserts = [c for c in mock_cursor.execute.call_args_list if "INSERT INTO geocode_cache" in c.args[0]]
+        assert inserts[0].args[1] == ("Berlin", "Germany")
+
+    def test_database_tier_is_shared_between_processes(self, geocoding):
+        """A location another worker resolved is served from the table, then from memory."""
+        cache, mock_cursor, mock_get = geocoding
+        mock_cursor.fetchone.return_value = ("United States",)
+
+        assert getLocation("San Francisco") == "United States"
+        assert getLocation("San Francisco") == "United States"
+
+        mock_get.assert_not_called()
+        assert mock_cursor.fetchone.call_count == 1
+
+    def test_unresolved_locations_are_cached(self, geocoding):
+        cache, _, mock_get = geocoding
+        mock_get.return_value = nominatim_response(body=[])
+
+        assert getLocation("Remote") is None
+        assert getLocation("Remote") is None
+
+        assert mock_get.call_count == 1
+        assert cache.get("Remote") == (True, None)
+
+    def test_failed_requests_are_not_cached(self, geocoding):
+        cache, _, mock_get = geocoding
+        mock_get.return_value = nominatim_response(status_code=503)
+
+        assert getLocation("Berlin") is None
+        assert cache.get("Berlin") == (False, None)
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = GeocodeCache(max_entries=2, connection=MagicMock())
+        cache.store("A", "X")
+        cache.store("B", "Y")
+        cache.get("A")
+        cache.store("C", "Z")
+
+        assert cache.get("B") == (False, None)
+        assert cache.get("A") == (True, "X")
+
+    def test_spacer_books_consecutive_slots(self):
+        """Concurrent callers get slots one interval apart instead of firing together."""
+        now = [100.0]
+        spacer = RequestSpacer(min_interval=1, clock=lambda: now[0])
+
+        assert [spacer.reserve() for _ in range(3)] == [0, 1, 2]
+        now[0] = 105.0
+        assert spacer.reserve() == 0
+
+    def test_concurrent_async_lookups_share_one_request(self, geocoding):
+        requests_sent = []
+
+        def handler(request):
+            requests_sent.append(request.url)
+            return httpx.Response(200, json=BERLIN)
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await asyncio.gather(*(getLocationAsync(client, "Berlin") for _ in range(5)))
+
+        assert asyncio.run(run()) == ["Germany"] * 5
+        assert len(requests_sent) == 1
+
+
+class TestGazetteer:
+    """Test suite for resolving common locations offline."""
+
+    @pytest.mark.parametrize("location, country", [
+        ("Berlin", "Germany"),
+        ("San Francisco, CA", "United States"),
+        ("Cambridge, MA", "United States"),
+        ("Cambridge, UK", "United Kingdom"),
+        ("Atlanta, Georgia", "United States"),
+        ("Tbilisi, Georgia", "Georgia"),
+        ("New York", "United States"),
+        ("Zürich", "Switzerland"),
+        ("Remote, Germany", "Germany"),
+        ("Greater Boston Area", "United States"),
+        ("Remote", None),
+        ("Europe", None),
+    ])
+    def test_resolves_common_locations(self, location, country):
+        assert gazetteer.resolve(users.clean_location(location)) == (True, country)
+
+    @pytest.mark.parametrize("location", ["Cambridge", "Georgia", "Paris, Texas", "Springfield, IL", "Remote Worker"])
+    def test_leaves_unclear_locations_to_nominatim(self, location):
+        assert gazetteer.resolve(users.clean_location(location)) == (False, None)
+
+    def test_codes_only_count_as_a_whole_part(self):
+        index = Gazetteer([("ca", "Canada", "abbr"), ("ca", "United States", "abbr"),
+                           ("toronto", "Canada", "city")])
+
+        assert index.resolve("Toronto, Ca") == (True, "Canada")
+        assert index.resolve("Ca Toronto") == (True, "Canada")
+        assert index.resolve("Ca") == (False, None)
+
+    @patch.object(users, "get_session")
+    def test_resolved_locations_skip_the_network(self, mock_session):
+        with patch.object(users, "geocode_cache") as mock_cache:
+            assert getLocation("Munich, DE") == "Germany"
+
+        mock_session.assert_not_called()
+        mock_cache.lookup.assert_not_called()
+
+
+def gender_model(calls, genders=None):
+    """Fake batched classifier recording the keys of every prompt."""
+    def classify(keys):
+        calls.append(list(keys))
+        return [(genders or {}).get(first, "Female") for first, _ in keys]
+    return classify
+
+
+def arrive_together(mock_cursor, callers):
+    """Hold every caller in its cache lookup until all of them are inside infer()."""
+    barrier = threading.Barrier(callers, timeout=5)
+
+    def lookup():
+        barrier.wait()
+        return None
+    mock_cursor.fetchone.side_effect = lookup
+
+
+@pytest.fixture
+def gender_db(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.__enter__.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = None
+    return mock_conn, mock_cursor
+
+
+class TestGenderInference:
+    """Test suite for memoized, batched gender inference."""
+
+    def test_concurrent_misses_share_one_prompt(self, gender_db):
+        mock_conn, mock_cursor = gender_db
+        calls = []
+        inference = GenderInference(batch_size=10, max_wait=0.2, classify=gender_model(calls),
+                                    connection=lambda: mock_conn)
+        names = ["Ada Lovelace", "Grace Hopper", "Alan Turing", "Ada Yonath"]
+        arrive_together(mock_cursor, len(names))
+
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            results = list(pool.map(lambda name: inference.infer(name, "United Kingdom"), names))
+
+        assert results == ["Female"] * 4
+        assert len(calls) == 1
+        assert sorted(calls[0]) == [("ada", "United Kingdom"), ("alan", "United Kingdom"),
+                                    ("grace", "United Kingdom")]
+        mock_cursor.executemany.assert_called_once()
+
+    def test_batches_are_split_at_batch_size(self, gender_db):
+        mock_conn, mock_cursor = gender_db
+        calls = []
+        inference = GenderInference(batch_size=2, max_wait=0.2, classify=gender_model(calls),
+                                    connection=lambda: mock_conn)
+        names = ["Ada", "Grace", "Alan", "Linus", "Margaret"]
+        arrive_together(mock_cursor, len(names))
+
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            list(pool.map(lambda name: inference.infer(name, None), names))
+
+        assert [len(keys) for keys in calls] == [2, 2, 1]
+
+    def test_lone_caller_does_not_wait(self, gender_db):
+        mock_conn, _ = gender_db
+        inference = GenderInference(max_wait=5, classify=gender_model([]), connection=lambda: mock_conn)
+
+        start = time.monotonic()
+        assert inference.infer("Ada Lovelace", None) == "Female"
+        assert time.monotonic() - start < 1
+
+    def test_callers_are_failed_when_storing_results_breaks(self, gender_db):
+        """An error after the model call still answers every waiting caller."""
+        mock_conn, _ = gender_db
+        inference = GenderInference(max_wait=0, classify=gender_model([]), connection=lambda: mock_conn)
+
+        with patch.object(inference, "_remember", side_effect=RuntimeError("boom")):
+            with pytest.raises(RuntimeError):
+                inference.infer("Ada Lovelace", None)
+
+        assert inference._pending == {}
+        assert not inference._draining
+
+    def test_known_pairs_are_not_classified_again(self, gender_db):
+        mock_conn, mock_cursor = gender_db
+        calls = []
+        inference = GenderInference(max_wait=0, classify=gender_model(calls, {"alan": "Male"}),
+                                    connection=lambda: mock_conn)
+
+        assert inference.infer("Alan Turing", "United Kingdom") == "Male"
+        assert inference.infer("alan  Kay", "United Kingdom") == "Male"
+
+        assert len(calls) == 1
+        assert mock_cursor.fetchone.call_count == 1
+
+    def test_database_hit_skips_the_model(self, gender_db):
+        mock_conn, mock_cursor = gender_db
+        mock_cursor.fetchone.return_value = ("Male",)
+        classify = MagicMock()
+        inference = GenderInference(max_wait=0, classify=classify, connection=lambda: mock_conn)
+
+        assert inference.infer("Linus Torvalds", "Finland") == "Male"
+        classify.assert_not_called()
+
+    def test_failed_prompt_fails_its_callers_and_caches_nothing(self, gender_db):
+        mock_conn, mock_cursor = gender_db
+        inference = GenderInference(max_wait=0, classify=MagicMock(side_effect=RuntimeError("down")),
+                                    connection=lambda: mock_conn)
+
+        with pytest.raises(RuntimeError):
+            inference.infer("Ada Lovelace", None)
+        mock_cursor.executemany.assert_not_called()
+
+    def test_names_without_letters_are_unknown(self):
+        inference = GenderInference(classify=MagicMock(), connection=MagicMock())
+
+        assert inference.infer(None, "Germany") == "Unknown"
+        assert inference.infer("  42 ", "Germany") == "Unknown"
+
+    def test_parse_genders(self):
+        output = '```json\n[{"id": 1, "gender": "Male"}, {"id": 0, "gender": "Robot"}]\n```'
+
+        assert _parse_genders(output, 3) == ["Unknown", "Male", "Unknown"]
+        assert _parse_genders("not json", 2) == ["Unknown", "Unknown"]
+
+
+class TestNameGenderModel:
+    """Test suite for the local name-frequency gender model."""
+
+    def test_confident_names_are_decided_locally(self, gender_db):
+        mock_conn, _ = gender_db
+        classify = MagicMock()
+        model = NameGenderModel([(("ada", "United Kingdom"), "Female", 40)])
+        inference = GenderInference(max_wait=0, classify=classify, connection=lambda: mock_conn, model=model)
+
+        assert inference.infer("Ada Lovelace", "United Kingdom") == "Female"
+        assert inference.infer("Ada Yonath", "Israel") == "Female"
+        classify.assert_not_called()
+
+    def test_uncertain_names_go_to_the_llm(self, gender_db):
+        mock_conn, _ = gender_db
+        calls = []
+        model = NameGenderModel([
+            (("andrea", "Italy"), "Male", 30), (("andrea", "Germany"), "Female", 30),
+            (("sam", ""), "Male", 2),
+        ])
+        inference = GenderInference(max_wait=0, classify=gender_model(calls), connection=lambda: mock_conn,
+                                    model=model)
+
+        assert inference.infer("Andrea Rossi", "Italy") == "Male"
+        inference.infer("Andrea Meier", "Austria")
+        inference.infer("Sam Smith", None)
+
+        assert calls == [[("andrea", "Austria")], [("sam", "")]]
+
+    def test_country_distribution_is_not_overruled(self):
+        model = NameGenderModel([(("andrea", "Italy"), "Male", 100), (("andrea", "Germany"), "Female", 5),
+                                 (("andrea", "Germany"), "Male", 5)])
+
+        assert model.predict(("andrea", "France")) == "Male"
+        assert model.predict(("andrea", "Germany")) is None
+
+    def test_other_pronouns_lower_the_confidence(self):
+        model = NameGenderModel([(("alex", ""), "Male", 20), (("alex", ""), "Other", 10)])
+
+        assert model.predict(("alex", "")) is None
+
+    def test_model_is_built_from_pronoun_labelled_users(self, gender_db):
+        mock_conn, mock_cursor = gender_db
+        mock_cursor.fetchall.return_value = [("Ada", "United Kingdom", "Female", 15),
+                                             ("ADA", "United Kingdom", "Female", 15)]
+        now = [0.0]
+        local = LocalGenderModel(refresh_seconds=60, connection=lambda: mock_conn, clock=lambda: now[0])
+
+        assert local.predict(("ada", "United Kingdom")) == "Female"
+        local.predict(("linus", ""))
+        assert mock_cursor.execute.call_count == 1
+
+        now[0] = 61.0
+        mock_cursor.fetchall.return_value = []
+        assert local.predict(("ada", "United Kingdom")) is None
+
+
+class FakePage:
+    def __init__(self, pronouns, crash=False, delay=0):
+        self._pronouns = pronouns
+        self._crash = crash
+        self._delay = delay
+        self.closed = False
+        self.visited = []
+
+    async def goto(self, url, **kwargs):
+        self.visited.append(url)
+        await asyncio.sleep(self._delay)
+        if self._crash:
+            self.closed = True
+            raise RuntimeError("Target page crashed")
+
+    async def query_selector(self, selector):
+        if self._pronouns is None:
+            return None
+        span = MagicMock()
+        span.inner_text = AsyncMock(return_value=self._pronouns)
+        return span
+
+    def is_closed(self):
+        return self.closed
+
+
+def fake_playwright(pronouns="she/her"):
+    """A stand-in for async_playwright() recording how the browser is used."""
+    context = MagicMock()
+    context.route = AsyncMock()
+    context.close = AsyncMock()
+    context.new_page = AsyncMock(side_effect=lambda: FakePage(pronouns))
+    browser = MagicMock()
+    browser.is_connected.return_value = True
+    browser.new_context = AsyncMock(return_value=context)
+    browser.close = AsyncMock()
+    playwright = MagicMock()
+    playwright.chromium.launch = AsyncMock(return_value=browser)
+    playwright.stop = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.start = AsyncMock(return_value=playwright)
+    return factory, playwright, browser, context
+
+
+class TestBrowserPool:
+    """Test suite for scraping pronouns through the long-lived browser pool."""
+
+    def test_browser_and_context_are_reused(self):
+        factory, playwright, browser, context = fake_playwright()
+        pool = BrowserPool(size=2, auth_state="auth.json", playwright_factory=factory)
+
+        async def run():
+            results = await asyncio.gather(*(pool.pronouns_async(f"user{i}") for i in range(6)))
+            await pool._stop()
+            return results
+
+        assert asyncio.run(run()) == ["she/her"] * 6
+        playwright.chromium.launch.assert_awaited_once()
+        browser.new_context.assert_awaited_once_with(storage_state="auth.json")
+        assert context.new_page.await_count == 2
+
+    def test_sync_callers_share_the_pool_loop(self):
+        factory, playwright, _, _ = fake_playwright(pronouns=None)
+        pool = BrowserPool(size=1, playwright_factory=factory)
+        try:
+            assert pool.pronouns("octocat") is None
+            assert pool.pronouns("hubot") is None
+        finally:
+            pool.close()
+
+        playwright.chromium.launch.assert_awaited_once()
+        playwright.stop.assert_awaited_once()
+
+    def test_disconnected_browser_is_relaunched(self):
+        factory, playwright, browser, _ = fake_playwright()
+        pool = BrowserPool(size=1, playwright_factory=factory)
+
+        async def run():
+            await pool.pronouns_async("octocat")
+            browser.is_connected.return_value = False
+            await pool.pronouns_async("octocat")
+
+        asyncio.run(run())
+        assert playwright.chromium.launch.await_count == 2
+        browser.close.assert_awaited_once()
+
+    def test_closed_page_that_cannot_be_replaced_restarts_the_pool(self):
+        factory, playwright, _, context = fake_playwright()
+        context.new_page = AsyncMock(side_effect=[FakePage("she/her", crash=True),
+                                                  RuntimeError("browser gone"),
+                                                  FakePage("she/her")])
+        pool = BrowserPool(size=1, playwright_factory=factory)
+
+        async def run():
+            with pytest.raises(RuntimeError):
+                await pool.pronouns_async("octocat")
+            assert pool._pages is None
+            return await pool.pronouns_async("octocat")
+
+        assert asyncio.run(run()) == "she/her"
+        assert playwright.chromium.launch.await_count == 2
+
+    def test_context_is_recreated_when_the_session_file_changes(self, tmp_path):
+        factory, playwright, browser, first_context = fake_playwright()
+        second_context = MagicMock()
+        second_context.route = AsyncMock()
+        second_context.new_page = AsyncMock(side_effect=lambda: FakePage("they/them"))
+        browser.new_context = AsyncMock(side_effect=[first_context, second_context])
+        auth = tmp_path / "auth.json"
+        auth.write_text("{}")
+        pool = BrowserPool(size=1, auth_state=str(auth), playwright_factory=factory)
+
+        async def run():
+            before = await pool.pronouns_async("octocat")
+            unchanged = await pool.pronouns_async("octocat")
+            # get_auth() saved a refreshed session
+            stat = os.stat(auth)
+            os.utime(auth, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            after = await pool.pronouns_async("octocat")
+            await asyncio.sleep(0)
+            return before, unchanged, after
+
+        assert asyncio.run(run()) == ("she/her", "she/her", "they/them")
+        playwright.chromium.launch.assert_awaited_once()
+        assert browser.new_context.await_count == 2
+        first_context.close.assert_awaited_once()
+
+    def test_hung_browser_times_out(self):
+        factory, _, _, context = fake_playwright()
+        context.new_page = AsyncMock(side_effect=lambda: FakePage("she/her", delay=5))
+        pool = BrowserPool(size=1, timeout=0.05, playwright_factory=factory)
+        try:
+            with pytest.raises(TimeoutError):
+                pool.pronouns("octocat")
+        finally:
+            pool.close()
+
+    @pytest.mark.parametrize("resource_type, blocked", [
+        ("document", False), ("image", True), ("font", True), ("script", True), ("stylesheet", True),
+    ])
+    def test_unneeded_resources_are_blocked(self, resource_type, blocked):
+        route = MagicMock()
+        route.request.resource_type = resource_type
+        route.abort = AsyncMock()
+        route.continue_ = AsyncMock()
+
+        asyncio.run(_block_resources(route))
+
+        assert route.abort.await_count == int(blocked)
+        assert route.continue_.await_count == int(not blocked)
+
+    @patch.object(users, "browser_pool")
+    def test_scrape_pronouns_reads_the_span(self, mock_pool):
+        mock_pool.pronouns.return_value = "He / Him"
+        assert users.scrapePronouns("octocat") == (True, "Male")
+
+        mock_pool.pronouns.return_value = None
+        assert users.scrapePronouns("octocat") == (False, None)
@@ -9,7 +9,7 @@ from psycopg2.extras import RealDictRow
 class TestUsersAPI:
     """Test suite for /api/users endpoint."""
 
-    @patch('backend.api.users.db_connection')
+    @patch('backend.api.users.get_connection')
     def test_get_users_success(self, mock_db, client, mock_db_connection, sample_user_data):
         """Test successful retrieval of users."""
         mock_conn, mock_cursor = mock_db_connection
@@ -29,7 +29,7 @@ class TestUsersAPI:
         assert 'users' in data or isinstance(data, list)
         mock_cursor.execute.assert_called()
 
-    @patch('backend.api.users.db_connection')
+    @patch('backend.api.users.get_connection')
     def test_get_users_with_search(self, mock_db, client, mock_db_connection):
         """Test user search functionality."""
         mock_conn, mock_cursor = mock_db_connection
@@ -44,7 +44,42 @@ class TestUsersAPI:
         # Verify search query was used in SQL
         assert any('plainto_tsquery' in str(call) for call in mock_cursor.execute.call_args_list)
 
-    @patch('backend.api.users.db_connection')
+    @patch('backend.api.users.get_connection')
+    def test_get_users_search_uses_stored_vector(self, mock_db, client, mock_db_connection):
+        """Full-text search matches against the indexed search_vector column."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+
+        mock_cursor.fetchall.return_value = []
+        mock_cursor.fetchone.return_value = {'total': 0}
+
+        response = client.get('/api/users?search=testuser')
+
+        assert response.status_code == 200
+        sql = mock_cursor.execute.call_args_list[0][0][0]
+        assert 'u.search_vector @@' in sql
+        assert 'to_tsvector' not in sql
+
+    @patch('backend.api.users.get_connection')
+    def test_get_users_fuzzy_search(self, mock_db, client, mock_db_connection):
+        """Fuzzy mode does an escaped prefix / trigram match on username."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+
+        mock_cursor.fetchall.return_value = []
+        mock_cursor.fetchone.return_value = {'total': 0}
+
+        response = client.get('/api/users?search=te_st&searchMode=fuzzy')
+
+        assert response.status_code == 200
+        sql, params = mock_cursor.execute.call_args_list[0][0]
+        assert 'u.username ILIKE %s OR u.username %% %s' in sql
+        assert 'similarity(u.username, %s)' in sql
+        assert 'plainto_tsquery' not in sql
+        assert 'te\\_st%' in params
+        assert 'te_st' in params
+
+    @patch('backend.api.users.get_connection')
     def test_get_users_with_filters(self, mock_db, client, mock_db_connection):
         """Test user filtering by gender, type, location."""
         mock_conn, mock_cursor = mock_db_connection
@@ -59,7 +94,7 @@ class TestUsersAPI:
         # Verify filters were applied
         assert mock_cursor.execute.called
 
-    @patch('backend.api.users.db_connection')
+    @patch('backend.api.users.get_connection')
     def test_get_users_with_sorting(self, mock_db, client, mock_db_connection):
         """Test user sorting functionality."""
         mock_conn, mock_cursor = mock_db_connection
@@ -73,7 +108,7 @@ class TestUsersAPI:
         assert response.status_code == 200
         assert mock_cursor.execute.called
 
-    @patch('backend.api.users.db_connection')
+    @patch('backend.api.users.get_connection')
     def test_get_users_pagination(self, mock_db, client, mock_db_connection):
         """Test pagination parameters."""
         mock_conn, mock_cursor = mock_db_connection
@@ -89,7 +124,7 @@ class TestUsersAPI:
         execute_calls = [str(call) for call in mock_cursor.execute.call_args_list]
         assert any('LIMIT' in call or 'OFFSET' in call for call in execute_calls)
 
-    @patch('backend.api.users.db_connection')
+    @patch('backend.api.users.get_connection')
     def test_get_users_database_error(self, mock_db, client):
         """Test error handling when database connection fails."""
         mock_db.side_effect = Exception("Database connection failed")
@@ -100,7 +135,7 @@ class TestUsersAPI:
         data = response.get_json()
         assert 'error' in data
 
-    @patch('backend.api.users.db_connection')
+    @patch('backend.api.users.get_connection')
     def test_export_users_rate_limit(self, mock_db, client, mock_db_connection):
         """Test export rate limiting."""
         mock_conn, mock_cursor = mock_db_connection
@@ -118,3 +153,308 @@ class TestUsersAPI:
             response = client.get('/api/users/export')
             # Rate limiting may kick in
             assert response.status_code in [200, 429]
+
+
+class TestUsersKeysetPagination:
+    """Test suite for cursor (keyset) pagination on /api/users."""
+
+    @patch('backend.api.users.get_connection')
+    def test_first_page_returns_next_cursor(self, mock_db, client, mock_db_connection, sample_user_data):
+        """An empty `after` starts keyset mode and returns a cursor when more rows exist."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+
+        rows = []
+        for i in range(3):
+            row = dict(sample_user_data, id=i + 1, public_gists=0, hireable=None,
+                       avatar_url=None, profile_url=None, min_sponsor_cost=None)
+            row['_sort_key_0'] = 10 - i
+            row['_sort_key_1'] = i + 1
+            rows.append(row)
+        mock_cursor.fetchall.return_value = rows
+
+        response = client.get('/api/users?after=&per_page=2')
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert len(data['users']) == 2
+        assert data['next']
+        assert 'total' not in data
+        # Keyset mode never uses OFFSET or the window count
+        sql = str(mock_cursor.execute.call_args_list[0])
+        assert 'OFFSET' not in sql
+        assert 'COUNT(*) OVER()' not in sql
+
+    @patch('backend.api.users.get_connection')
+    def test_cursor_adds_seek_predicate(self, mock_db, client, mock_db_connection):
+        """A cursor is turned into a seek predicate on the sort keys plus u.id."""
+        from backend.api.users import encode_cursor, _build_user_filters
+        from werkzeug.datastructures import MultiDict
+
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.fetchall.return_value = []
+
+        _, _, keys = _build_user_filters(MultiDict())
+        token = encode_cursor(keys, [5, 42])
+
+        response = client.get(f'/api/users?after={token}')
+
+        assert response.status_code == 200
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'sc.total_sponsors < %s::bigint' in sql
+        assert 'u.id > %s::bigint' in sql
+        assert 42 in params
+
+    @patch('backend.api.users.get_connection')
+    def test_fuzzy_pages_continue_across_equal_ranks(self, mock_db, client, mock_db_connection, sample_user_data):
+        """Tied fuzzy ranks are carried through the cursor exactly and broken by u.id."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+
+        # Not representable as real: a real round trip would no longer equal the stored rank
+        rank = 1.3333333333333333
+        rows = []
+        for i in range(3):
+            row = dict(sample_user_data, id=i + 1, public_gists=0, hireable=None,
+                       avatar_url=None, profile_url=None, min_sponsor_cost=None)
+            row['_sort_key_0'] = rank
+            row['_sort_key_1'] = 10
+            row['_sort_key_2'] = i + 1
+            rows.append(row)
+        mock_cursor.fetchall.return_value = rows
+
+        first = client.get('/api/users?search=octo&searchMode=fuzzy&after=&per_page=2').get_json()
+
+        mock_cursor.fetchall.return_value = []
+        response = client.get(f"/api/users?search=octo&searchMode=fuzzy&after={first['next']}&per_page=2")
+
+        assert response.status_code == 200
+        sql, params = mock_cursor.execute.call_args[0]
+        rank_sql = ("(similarity(u.username, %s) + CASE WHEN u.username ILIKE %s THEN 1 ELSE 0 END)"
+                    "::double precision")
+        assert f"{rank_sql} = %s::double precision" in sql
+        assert f"{rank_sql} DESC" in sql
+        assert "::real" not in sql
+        assert rank in params
+        assert 'u.id > %s::bigint' in sql
+
+    def test_cursor_for_other_sort_is_rejected(self, client):
+        """A cursor issued for one sort order cannot be replayed against another."""
+        from backend.api.users import encode_cursor, _build_user_filters
+        from werkzeug.datastructures import MultiDict
+
+        _, _, keys = _build_user_filters(MultiDict())
+        token = encode_cursor(keys, [5, 42])
+
+        response = client.get(f'/api/users?after={token}&sortField=name&sortOrder=ascend')
+
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+    def test_cursor_for_other_search_is_rejected(self, client):
+        """A relevance cursor is bound to the search term whose rank it carries."""
+        from backend.api.users import encode_cursor, _build_user_filters
+        from werkzeug.datastructures import MultiDict
+
+        _, _, keys = _build_user_filters(MultiDict({'search': 'foo'}))
+        token = encode_cursor(keys, [0.5, 5, 42])
+
+        response = client.get(f'/api/users?after={token}&search=bar')
+
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+    def test_malformed_cursor_is_rejected(self, client):
+        """Garbage tokens return 400 rather than 500."""
+        response = client.get('/api/users?after=not-a-cursor')
+        assert response.status_code == 400
+
+    @patch('backend.api.users.get_connection')
+    def test_count_endpoint(self, mock_db, client, mock_db_connection):
+        """The total is served separately by /api/users/count."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.fetchone.return_value = {'total': 12}
+
+        response = client.get('/api/users/count?gender=Female')
+
+        assert response.status_code == 200
+        assert response.get_json() == {'total': 12}
+
+
+class TestUsersStreamingExport:
+    """Test suite for /api/users/export/stream."""
+
+    def _rows(self, sample_user_data, count):
+        base = dict(sample_user_data, public_gists=0, hireable=None, avatar_url=None,
+                    profile_url=None, min_sponsor_cost=None)
+        return [dict(base, id=i) for i in range(count)]
+
+    @patch('backend.api.users.get_connection')
+    def test_stream_ndjson(self, mock_db, client, mock_db_connection, sample_user_data):
+        """Rows are streamed as one JSON document per line from a named cursor."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.__iter__.return_value = iter(self._rows(sample_user_data, 3))
+
+        response = client.get('/api/users/export/stream?format=ndjson&gender=Male')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.data.decode().strip().split('\n')
+        assert len(lines) == 3
+        # Server-side cursor: the cursor is named
+        assert mock_conn.cursor.call_args.kwargs.get('name')
+        assert 'LIMIT' not in mock_cursor.execute.call_args[0][0]
+
+    @patch('backend.api.users.get_connection')
+    def test_stream_csv(self, mock_db, client, mock_db_connection, sample_user_data):
+        """CSV exports start with a header row."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.__iter__.return_value = iter(self._rows(sample_user_data, 2))
+
+        response = client.get('/api/users/export/stream?format=csv')
+
+        assert response.status_code == 200
+        lines = response.data.decode().strip().splitlines()
+        assert lines[0].startswith('id,name,username')
+        assert len(lines) == 3
+        assert 'attachment' in response.headers['Content-Disposition']
+
+    def test_stream_rejects_unknown_format(self, client):
+        """Only csv and ndjson are supported."""
+        response = client.get('/api/users/export/stream?format=xml')
+        assert response.status_code == 400
+
+    @patch('backend.api.users.get_connection')
+    def test_stream_database_error(self, mock_db, client):
+        """Errors before streaming starts are reported as JSON."""
+        mock_db.side_effect = Exception("Database connection failed")
+
+        response = client.get('/api/users/export/stream')
+
+        assert response.status_code == 500
+        assert 'error' in response.get_json()
+
+
+class TestUsersFacets:
+    """Test suite for /api/users/facets."""
+
+    facet_rows = [
+        {'grouping_id': 0b011, 'gender': 'Male', 'type': None, 'location': None,
+         'gender_count': 7, 'type_count': 9, 'location_count': 9},
+        {'grouping_id': 0b101, 'gender': None, 'type': 'User', 'location': None,
+         'gender_count': 9, 'type_count': 5, 'location_count': 9},
+        {'grouping_id': 0b110, 'gender': None, 'type': None, 'location': None,
+         'gender_count': 9, 'type_count': 9, 'location_count': 3},
+    ]
+
+    @patch('backend.api.users.get_connection')
+    def test_facets_single_grouped_pass(self, mock_db, client, mock_db_connection):
+        """Every facet is counted by one GROUPING SETS query."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.fetchall.return_value = self.facet_rows
+
+        response = client.get('/api/users/facets')
+
+        assert response.status_code == 200
+        assert response.get_json() == {
+            'gender': [{'value': 'Male', 'count': 7}],
+            'type': [{'value': 'User', 'count': 5}],
+            'location': [{'value': None, 'count': 3}],
+        }
+        mock_cursor.execute.assert_called_once()
+        assert 'GROUPING SETS' in mock_cursor.execute.call_args[0][0]
+
+    @patch('backend.api.users.get_connection')
+    def test_unfiltered_facets_are_cached(self, mock_db, client, mock_db_connection):
+        """The unfiltered filter panel is served from memory after the first load."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.fetchall.return_value = self.facet_rows
+
+        client.get('/api/users/facets')
+        client.get('/api/users/facets')
+
+        mock_cursor.execute.assert_called_once()
+
+    @patch('backend.api.users.get_connection')
+    def test_filtered_facets_exclude_own_filter(self, mock_db, client, mock_db_connection):
+        """A facet's own filter is left out of its counts, and filtered results are not cached."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.fetchall.return_value = self.facet_rows
+
+        client.get('/api/users/facets?gender=Male&search=test')
+        client.get('/api/users/facets?gender=Male&search=test')
+
+        assert mock_cursor.execute.call_count == 2
+        sql, params = mock_cursor.execute.call_args[0]
+        assert '(u.gender IN (%s)) AS gender_match' in sql
+        assert 'COUNT(*) FILTER (WHERE type_match AND location_match) AS gender_count' in sql
+        assert params == ['Male', 'test']
+
+    @patch('backend.api.users.get_connection')
+    def test_facets_database_error(self, mock_db, client):
+        """Database errors surface as a JSON 500."""
+        mock_db.side_effect = Exception("Database error")
+
+        response = client.get('/api/users/facets')
+
+        assert response.status_code == 500
+        assert 'error' in response.get_json()
+
+
+class TestSponsorshipHistory:
+    """Test suite for /api/user/<id>/sponsorship-history."""
+
+    timeline = [
+        {'date': '2024-01-07', 'active_count': 2, 'new': 2, 'lost': 0},
+        {'date': '2024-01-14', 'active_count': 1, 'new': 0, 'lost': 1},
+    ]
+
+    @patch('backend.api.users.get_connection')
+    def test_history_bucketed_in_sql(self, mock_db, client, mock_db_connection):
+        """Weekly buckets come straight from a date_trunc / generate_series query."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.fetchone.return_value = {'history_version': 0}
+        mock_cursor.fetchall.return_value = self.timeline
+
+        response = client.get('/api/user/1/sponsorship-history')
+
+        assert response.status_code == 200
+        assert response.get_json() == self.timeline
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'generate_series' in sql
+        assert params['unit'] == 'week'
+
+    @patch('backend.api.users.get_connection')
+    def test_history_cached_per_user_version(self, mock_db, client, mock_db_connection):
+        """Repeat requests reuse the timeline until the user's history_version moves."""
+        mock_conn, mock_cursor = mock_db_connection
+        mock_db.return_value = mock_conn
+        mock_cursor.fetchone.return_value = {'history_version': 3}
+        mock_cursor.fetchall.return_value = self.timeline
+
+        client.get('/api/user/1/sponsorship-history?interval=M')
+        client.get('/api/user/1/sponsorship-history?interval=M')
+        # version lookup, timeline, version lookup
+        assert mock_cursor.execute.call_count == 3
+
+        mock_cursor.fetchone.return_value = {'history_version': 4}
+        client.get('/api/user/1/sponsorship-history?interval=M')
+        assert mock_cursor.execute.call_count == 5
+        assert mock_cursor.execute.call_args[0][1]['unit'] == 'month'
+
+    @patch('backend.api.users.get_connection')
+    def test_history_database_error(self, mock_db, client):
+        """Database errors surface as a JSON 500."""
+        mock_db.side_effect = Exception("Database error")
+
+        response = client.get('/api/user/1/sponsorship-history')
+
+        assert response.status_code == 500
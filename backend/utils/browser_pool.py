@@ -0,0 +1,215 @@
+from dotenv import load_dotenv
+import os
+import asyncio
+import logging
+import threading
+
+from playwright.async_api import async_playwright
+
+load_dotenv()
+
+# Headless browser used to scrape profile pronouns (all optional, see README)
+# Profile pages loaded concurrently per process
+BROWSER_POOL_PAGES = int(os.getenv("BROWSER_POOL_PAGES", 4))
+# Saved GitHub session (cookies) the browser context starts from
+BROWSER_AUTH_STATE = os.getenv("BROWSER_AUTH_STATE", "auth.json")
+# Seconds a profile page may take to load
+BROWSER_PAGE_TIMEOUT = float(os.getenv("BROWSER_PAGE_TIMEOUT", 15))
+
+# The pronouns are part of the server rendered profile, nothing else has to be fetched
+BLOCKED_RESOURCES = {"image", "media", "font", "stylesheet", "script"}
+PRONOUNS_SELECTOR = "span[itemprop='pronouns']"
+
+
+async def _block_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    """
+    One headless Chromium per worker process, with a single authenticated context and
+    `size` reusable pages.
+
+    The browser is started on first use and kept for the life of the process. The context
+    is recreated from `auth.json` whenever the file changes (e.g. the leader refreshed an
+    expired session), pages still loading finish on the old one. Playwright's async API runs on an event loop
+    of its own in a daemon thread, so both the sync worker and the async worker's profile
+    threads can call `pronouns()`; up to `size` profiles load concurrently, further callers
+    wait for a free page. A crashed browser is relaunched on the next call, and `pronouns()`
+    gives up after four page timeouts so a hung browser cannot block its caller.
+    """
+
+    def __init__(
+        self,
+        size=BROWSER_POOL_PAGES,
+        auth_state=BROWSER_AUTH_STATE,
+        timeout=BROWSER_PAGE_TIMEOUT,
+        playwright_factory=async_playwright,
+    ):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.auth_state = auth_state
+        self.timeout = timeout
+        self._playwright_factory = playwright_factory
+
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        # Only touched on the pool's event loop
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._pages = None
+        self._auth_mtime = None
+        self._starting = None
+
+    def _event_loop(self):
+        with self._lock:
+            # A loop and browser inherited through a fork belong to the parent
+            if self._pid != os.getpid():
+                self._loop = self._thread = None
+                self._playwright = self._browser = self._context = self._pages = None
+                self._auth_mtime = self._starting = None
+                self._pid = os.getpid()
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="browser-pool", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    async def _start(self):
+        await self._stop()
+        self._playwright = await self._playwright_factory().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        await self._new_context()
+        logging.info(f"Browser pool started with {self.size} pages")
+
+    def _auth_file_mtime(self):
+        try:
+            return os.stat(self.auth_state).st_mtime_ns
+        except OSError:
+            return None
+
+    async def _new_context(self):
+        """Open a context from the saved session with fresh pages, retiring the current one."""
+        # Read before the file is loaded, so a rewrite during the load is picked up next time
+        auth_mtime = self._auth_file_mtime()
+        context = await self._browser.new_context(storage_state=self.auth_state)
+        try:
+            context.set_default_timeout(self.timeout * 1000)
+            await context.route("**/*", _block_resources)
+            pages = asyncio.Queue()
+            for _ in range(self.size):
+                pages.put_nowait(await context.new_page())
+        except BaseException:
+            await context.close()
+            raise
+
+        old_context, old_pages = self._context, self._pages
+        self._context, self._pages, self._auth_mtime = context, pages, auth_mtime
+        if old_context is not None:
+            logging.info("Saved GitHub session changed, browser context recreated")
+            asyncio.ensure_future(self._retire(old_context, old_pages))
+
+    async def _retire(self, context, pages):
+        """Close a replaced context once its pages in use are back (or after the result timeout)."""
+
+        async def returned():
+            for _ in range(self.size):
+                await pages.get()
+
+        try:
+            await asyncio.wait_for(returned(), self.timeout * 4)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await context.close()
+        except Exception as e:
+            logging.warning(f"Replaced browser context did not close cleanly: {e}")
+
+    async def _ready(self):
+        if self._pages is not None and self._browser.is_connected():
+            if self._auth_file_mtime() == self._auth_mtime:
+                return
+            # The session file was rewritten, the browser itself is kept
+            start = self._new_context
+        else:
+            start = self._start
+        # Concurrent callers share one launch
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(start())
+        try:
+            await asyncio.shield(self._starting)
+        finally:
+            if self._starting is not None and self._starting.done():
+                self._starting = None
+
+    async def pronouns_async(self, username):
+        """Text of the pronouns span of a GitHub profile, or None when it has none."""
+        await self._ready()
+        pages = self._pages
+        page = await pages.get()
+        try:
+            await page.goto(f"https://github.com/{username}", wait_until="domcontentloaded")
+            span = await page.query_selector(PRONOUNS_SELECTOR)
+            return await span.inner_text() if span else None
+        finally:
+            await self._release(pages, page)
+
+    async def _release(self, pages, page):
+        """Hand a page back to its queue, replacing it if it was closed (e.g. it crashed)."""
+        if not page.is_closed():
+            pages.put_nowait(page)
+            return
+        if pages is not self._pages:
+            # The pool was restarted meanwhile, the old queue is gone
+            return
+        try:
+            pages.put_nowait(await self._context.new_page())
+        except Exception as e:
+            # Never hand out a closed page, relaunch the browser on the next call instead
+            logging.warning(f"Could not replace a closed browser page, restarting the pool: {e}")
+            self._pages = None
+
+    def pronouns(self, username):
+        """Blocking `pronouns_async` for threads outside the pool's event loop."""
+        future = asyncio.run_coroutine_threadsafe(self.pronouns_async(username), self._event_loop())
+        # Room for a relaunch, the wait for a free page and the page load itself
+        try:
+            return future.result(timeout=self.timeout * 4)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def _stop(self):
+        browser, playwright = self._browser, self._playwright
+        self._playwright = self._browser = self._context = self._pages = None
+        try:
+            if browser is not None:
+                await browser.close()
+            if playwright is not None:
+                await playwright.stop()
+        except Exception as e:
+            logging.warning(f"Browser pool did not shut down cleanly: {e}")
+
+    def close(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                return
+            self._loop = self._thread = None
+        asyncio.run_coroutine_threadsafe(self._stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+browser_pool = BrowserPool()
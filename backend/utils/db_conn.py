@@ -1,6 +1,11 @@
 from dotenv import load_dotenv
+from contextlib import contextmanager
 import os
+import time
+import logging
+import threading
 import psycopg2
+from psycopg2 import extensions
 
 # Used to connect to the database
 load_dotenv()
@@ -12,6 +17,18 @@ HOST = os.getenv("host")
 PORT = os.getenv("port")
 DBNAME = os.getenv("dbname")
 
+# Pool sizing and recycling (all optional, see README)
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+# Recycle a connection after it has been checked out this many times
+POOL_MAX_USES = int(os.getenv("DB_POOL_MAX_USES", 1000))
+# Recycle a connection once it is older than this many minutes
+POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 30))
+# Ping connections that have been idle longer than this many seconds before handing them out
+POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", 30))
+# How long a caller waits for a free connection before giving up
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+
 
 # Function used to connect to the supabase DB
 def db_connection():
@@ -22,3 +39,254 @@ def db_connection():
         host=os.getenv("host"),
         port=os.getenv("port"),
     )
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the pool timeout."""
+
+
+class _PooledConn:
+    """Bookkeeping for a single physical connection owned by the pool."""
+
+    __slots__ = ("conn", "created_at", "last_used", "uses")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Connections are health checked on checkout (closed connections are dropped and
+    idle ones are pinged), and recycled after `max_uses` checkouts or `max_lifetime`
+    minutes so long-running processes never hold on to a stale server session.
+    """
+
+    def __init__(
+        self,
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        max_uses=POOL_MAX_USES,
+        max_lifetime=POOL_MAX_LIFETIME,
+        ping_after=POOL_PING_AFTER,
+        timeout=POOL_TIMEOUT,
+        connect=db_connection,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.max_lifetime = max_lifetime * 60
+        self.ping_after = ping_after
+        self.timeout = timeout
+        self._connect = connect
+
+        self._idle: list[_PooledConn] = []
+        self._in_use: dict[int, _PooledConn] = {}
+        self._lock = threading.Condition()
+        # Connections being opened, health checked or rolled back outside the lock
+        self._pending = 0
+        self._closed = False
+
+        for _ in range(min_size):
+            self._idle.append(_PooledConn(self._connect()))
+
+    @property
+    def size(self):
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def _is_expired(self, entry: _PooledConn):
+        if self.max_uses and entry.uses >= self.max_uses:
+            return True
+        if self.max_lifetime and time.monotonic() - entry.created_at >= self.max_lifetime:
+            return True
+        return False
+
+    def _is_healthy(self, entry: _PooledConn):
+        if entry.conn.closed:
+            return False
+        if time.monotonic() - entry.last_used < self.ping_after:
+            return True
+        try:
+            with entry.conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            entry.conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, entry: _PooledConn):
+        try:
+            if not entry.conn.closed:
+                entry.conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        """Check a connection out of the pool, opening a new one if there is room."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                entry = self._reserve(deadline)
+
+            if entry is None:
+                return self._open()
+
+            # Health checks may wait on the server, so they run outside the lock
+            if self._is_expired(entry) or not self._is_healthy(entry):
+                logging.debug("Recycling pooled database connection.")
+                self._discard(entry)
+                with self._lock:
+                    self._pending -= 1
+                    self._lock.notify()
+                continue
+
+            with self._lock:
+                self._pending -= 1
+                if not self._closed:
+                    return self._checkout(entry)
+            self._discard(entry)
+            raise RuntimeError("Connection pool is closed")
+
+    def _reserve(self, deadline):
+        """
+        Take the most recently returned idle connection (warmest server cache), or return
+        None after reserving a slot for a new one. Either way the connection counts as
+        pending until the caller is done with it. Must be called with the lock held.
+        """
+        while True:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            if self._idle:
+                self._pending += 1
+                return self._idle.pop()
+            if self.size < self.max_size:
+                self._pending += 1
+                return None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PoolTimeout(
+                    f"No database connection available after {self.timeout} seconds"
+                )
+            self._lock.wait(remaining)
+
+    def _open(self):
+        # The slot is reserved, connect outside the lock so other callers are not blocked
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            self._pending -= 1
+            return self._checkout(_PooledConn(conn))
+
+    def _checkout(self, entry: _PooledConn):
+        entry.uses += 1
+        self._in_use[id(entry.conn)] = entry
+        return entry.conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, rolling back any open transaction."""
+        with self._lock:
+            entry = self._in_use.pop(id(conn), None)
+            if entry is None:
+                # Not one of ours (or already returned)
+                return
+            # Still counts against max_size while it is rolled back
+            self._pending += 1
+
+        keep = False
+        try:
+            if not discard and not conn.closed:
+                try:
+                    status = conn.info.transaction_status
+                    if status != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+            keep = not (discard or conn.closed or self._is_expired(entry))
+            if not keep:
+                self._discard(entry)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if keep and not self._closed:
+                    entry.last_used = time.monotonic()
+                    self._idle.append(entry)
+                elif keep:
+                    self._discard(entry)
+                self._lock.notify()
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            for entry in self._idle + list(self._in_use.values()):
+                self._discard(entry)
+            self._idle.clear()
+            self._in_use.clear()
+            self._lock.notify_all()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager yielding a pooled connection.
+        The connection is rolled back on error and always returned to the pool.
+        """
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+        except BaseException:
+            # Also covers GeneratorExit when a streaming response is abandoned mid-way
+            try:
+                if not conn.closed:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+
+# One pool per process (the pool must never be shared across a fork)
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool()
+                _pool_pid = pid
+    return _pool
+
+
+def close_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_pid = None
+
+
+# Context manager shared by the API blueprints and the ingest worker
+# Usage: with get_connection() as conn: ...
+def get_connection():
+    return get_pool().connection()
@@ -0,0 +1,124 @@
+import os
+import re
+import logging
+import unicodedata
+
+# Bundled place names (see the header of the file for its format)
+GAZETTEER_FILE = os.getenv(
+    "GAZETTEER_FILE", os.path.join(os.path.dirname(__file__), "gazetteer.tsv")
+)
+
+# Kinds that name a country outright, a single one of them decides the location
+_COUNTRY_KINDS = ("country", "alias")
+
+
+# Lower case, accents and punctuation removed, so "Zürich" / "zurich" and "St. Louis" /
+# "st louis" meet in the index. Commas and semicolons are kept as part separators.
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"['’`.]", "", text)
+    return re.sub(r"[^\w,;]+", " ", text).strip()
+
+
+class _Node:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children = {}
+        # (country, kind) of the place names ending at this node
+        self.entries = []
+
+
+class Gazetteer:
+    """
+    Offline resolver from a cleaned location string to a country.
+
+    Place names are stored in a trie of words, so every part of a location is matched
+    left to right against the longest known name starting at each word ("new york" wins
+    over "york"). A location resolves only when its evidence agrees:
+
+    - an unambiguous country name or alias decides on its own (two different ones conflict);
+    - otherwise the countries of the matched regions, cities and codes are intersected
+      ("Cambridge, MA" -> United States, "London, Ontario" -> no single country);
+    - a location made only of names that denote no country ("Remote") resolves to None.
+
+    `resolve` returns (found, country); (False, None) means the local index is not
+    confident and the caller should geocode the string online.
+    """
+
+    def __init__(self, rows):
+        self._root = _Node()
+        self.size = 0
+        for name, country, kind in rows:
+            words = normalize(name).split()
+            if not words:
+                continue
+            node = self._root
+            for word in words:
+                node = node.children.setdefault(word, _Node())
+            node.entries.append((country or None, kind))
+            self.size += 1
+
+    @classmethod
+    def load(cls, path=GAZETTEER_FILE):
+        rows = []
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip() or line.startswith("#"):
+                        continue
+                    name, country, kind = line.rstrip("\n").split("\t")
+                    rows.append((name, country, kind))
+        except OSError as e:
+            # Without the file every location is simply geocoded online
+            logging.warning(f"Gazetteer not loaded from {path}: {e}")
+        return cls(rows)
+
+    def _match(self, words):
+        """Yield the entries of the longest names found in one comma separated part."""
+        start = 0
+        while start < len(words):
+            node = self._root
+            best, best_end = None, start + 1
+            for end in range(start, len(words)):
+                node = node.children.get(words[end])
+                if node is None:
+                    break
+                entries = node.entries
+                # Codes like "CA" or "DE" only count when they make up the whole part
+                if start != 0 or end != len(words) - 1:
+                    entries = [e for e in entries if e[1] != "abbr"]
+                if entries:
+                    best, best_end = entries, end + 1
+            yield best
+            start = best_end
+
+    def resolve(self, location):
+        strong, weak = set(), []
+        unmatched = noise = 0
+
+        for part in re.split(r"[,;]", normalize(location or "")):
+            for entries in self._match(part.split()):
+                if entries is None:
+                    unmatched += 1
+                    continue
+                countries = {country for country, kind in entries if kind != "none"}
+                if not countries:
+                    noise += 1
+                elif len(countries) == 1 and all(kind in _COUNTRY_KINDS for _, kind in entries):
+                    strong |= countries
+                else:
+                    weak.append(countries)
+
+        if strong:
+            return (True, strong.pop()) if len(strong) == 1 else (False, None)
+        if weak:
+            candidates = set.intersection(*weak)
+            return (True, candidates.pop()) if len(candidates) == 1 else (False, None)
+        if noise and not unmatched:
+            return True, None
+        return False, None
+
+
+gazetteer = Gazetteer.load()
@@ -0,0 +1,248 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from dotenv import load_dotenv
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+import psycopg2
+from openai import OpenAI
+
+from backend.db.queries.gender import getCachedGender, saveGenders
+from backend.utils.db_conn import PoolTimeout, get_connection
+from backend.utils.name_gender import gender_key, name_gender_model
+
+load_dotenv()
+API_KEY = os.getenv("API_KEY")
+
+# Gender inference batching and caching (all optional, see README)
+# Names classified per model call at most
+GENDER_BATCH_SIZE = int(os.getenv("GENDER_BATCH_SIZE", 20))
+# Seconds a cache miss waits for concurrent misses to join its batch
+GENDER_BATCH_WAIT = float(os.getenv("GENDER_BATCH_WAIT", 0.05))
+# (first name, country) pairs kept in memory per process, least recently used evicted first
+GENDER_CACHE_MAX_ENTRIES = int(os.getenv("GENDER_CACHE_MAX_ENTRIES", 10000))
+GENDER_MODEL = "gpt-4o-mini"
+GENDERS = ("Male", "Female", "Unknown")
+
+SYSTEM_PROMPT = """
+    Infer the gender of each entry from the first name and, when given, the country.
+    Only output a valid JSON array with one object per entry, in the order of the entries,
+    e.g. [{ "id": 0, "gender": "Male" }, { "id": 1, "gender": "Female" }].
+    gender is one of "Male", "Female" or "Unknown" (Try not to output Unknown).
+"""
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# One OpenAI client per process, reused for every call (keeps its HTTP connections alive)
+def openai_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(api_key=API_KEY)
+    return _client
+
+
+def _parse_genders(output, count):
+    """Genders of `count` entries from the model's JSON array ("Unknown" where missing)."""
+    genders = ["Unknown"] * count
+    if not output:
+        return genders
+    # Tolerate a markdown code fence around the array
+    output = re.sub(r"^```(?:json)?|```$", "", output.strip()).strip()
+    try:
+        items = json.loads(output)
+    except json.JSONDecodeError:
+        return genders
+    if not isinstance(items, list):
+        return genders
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        index = item.get("id", position)
+        gender = item.get("gender")
+        if isinstance(index, int) and 0 <= index < count and gender in GENDERS:
+            genders[index] = gender
+    return genders
+
+
+# Classify (first_name, country) keys in a single chat completion
+def classify_genders(keys):
+    entries = "\n".join(
+        f"{i}. first name: {first}" + (f", country: {country}" if country else "")
+        for i, (first, country) in enumerate(keys)
+    )
+    res = openai_client().chat.completions.create(
+        model=GENDER_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": entries},
+        ],
+    )
+    return _parse_genders(res.choices[0].message.content, len(keys))
+
+
+class GenderInference:
+    """
+    Memoized, batched gender inference keyed on (normalized first name, country).
+
+    A confident answer of the local name-frequency `model` (if given) is used as is, no
+    cache or prompt involved. Other lookups go to an in-process LRU first, then to the
+    shared gender_cache table. Misses of concurrent callers (e.g. the async worker's
+    profile threads) are accumulated: while other lookups are in progress the first miss
+    waits `max_wait` seconds for them to join (a lone caller, e.g. the sync worker, does
+    not wait), then classifies the queued names in prompts of up to `batch_size` while
+    the other callers wait for their result. A failed model call fails the callers of
+    that batch and caches nothing; every queued caller is always answered or failed.
+    """
+
+    def __init__(
+        self,
+        batch_size=GENDER_BATCH_SIZE,
+        max_wait=GENDER_BATCH_WAIT,
+        max_entries=GENDER_CACHE_MAX_ENTRIES,
+        classify=classify_genders,
+        connection=get_connection,
+        model=None,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_entries = max_entries
+        self._classify = classify
+        self._connection = connection
+        self._model = model
+
+        self._memo: OrderedDict = OrderedDict()
+        # key -> Future of a miss queued or being classified
+        self._pending = {}
+        self._queue = []
+        self._draining = False
+        # Callers currently inside infer()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _remember(self, key, gender):
+        with self._lock:
+            self._memo[key] = gender
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        try:
+            with self._connection() as conn:
+                gender = getCachedGender(key[0], key[1], conn)
+        except (psycopg2.Error, PoolTimeout) as e:
+            logging.warning(f"Gender cache lookup failed for {key}: {e}")
+            return None
+        if gender is not None:
+            self._remember(key, gender)
+        return gender
+
+    def infer(self, name, country):
+        """Return "Male", "Female" or "Unknown" for a user's full name and country."""
+        key = gender_key(name, country)
+        if key is None:
+            return "Unknown"
+
+        # First pass: names our pronoun-labelled users decide clearly never reach the LLM
+        if self._model is not None:
+            gender = self._model.predict(key)
+            if gender is not None:
+                return gender
+
+        with self._lock:
+            self._active += 1
+        try:
+            return self._infer(key)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _infer(self, key):
+        gender = self._cached(key)
+        if gender is not None:
+            return gender
+
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                self._queue.append(key)
+            # The first caller of a round classifies everything queued meanwhile
+            drain = not self._draining
+            self._draining = True
+
+        if drain:
+            self._drain()
+        return future.result()
+
+    def _drain(self):
+        try:
+            # Only worth waiting when other lookups may still join this batch
+            with self._lock:
+                others = self._active > 1
+            if others:
+                time.sleep(self.max_wait)
+            while True:
+                with self._lock:
+                    batch = self._queue[: self.batch_size]
+                    del self._queue[: self.batch_size]
+                    if not batch:
+                        self._draining = False
+                        return
+                self._send(batch)
+        except BaseException as e:
+            # Interrupted (e.g. KeyboardInterrupt): fail what is still queued, nobody else drains it
+            with self._lock:
+                futures = [self._pending.pop(key) for key in self._queue]
+                self._queue = []
+                self._draining = False
+            for future in futures:
+                future.set_exception(e)
+            raise
+
+    def _send(self, keys):
+        genders = error = None
+        try:
+            genders = list(self._classify(keys))
+            if len(genders) != len(keys):
+                raise ValueError(f"Expected {len(keys)} genders, got {len(genders)}")
+            for key, gender in zip(keys, genders):
+                self._remember(key, gender)
+            try:
+                with self._connection() as conn:
+                    saveGenders([(*key, gender) for key, gender in zip(keys, genders)], conn)
+            except (psycopg2.Error, PoolTimeout) as e:
+                logging.warning(f"Could not store inferred genders: {e}")
+        except Exception as e:
+            error = e
+        finally:
+            # Every caller of the batch gets an answer, whatever failed above
+            with self._lock:
+                futures = [self._pending.pop(key) for key in keys]
+            if error is None and genders is None:
+                error = RuntimeError("Gender inference was interrupted")
+            for index, future in enumerate(futures):
+                if error is None:
+                    future.set_result(genders[index])
+                else:
+                    future.set_exception(error)
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+
+gender_inference = GenderInference(model=name_gender_model)
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+import os
+import time
+import logging
+import threading
+
+import psycopg2
+
+from backend.db.queries.geocode import getGeocodedCountry, saveGeocodedCountry
+from backend.utils.db_conn import PoolTimeout, get_connection
+
+# Geocoding cache and Nominatim pacing (all optional, see README)
+# Cleaned location strings kept in memory per process, least recently used evicted first
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", 10000))
+# Days before a location that did not resolve is geocoded again
+GEOCODE_NEGATIVE_TTL_DAYS = int(os.getenv("GEOCODE_NEGATIVE_TTL_DAYS", 30))
+# Seconds between Nominatim requests of this process (usage policy: at most 1 request/s)
+NOMINATIM_MIN_INTERVAL = float(os.getenv("NOMINATIM_MIN_INTERVAL", 1))
+
+
+class GeocodeCache:
+    """
+    Two-tier cache of the country resolved for a cleaned location string.
+
+    The first tier is an in-process LRU, the second the shared geocode_cache table, so a
+    string geocoded by any worker is never sent to Nominatim again. `None` is a valid,
+    cached result (the string did not resolve). Database errors only cost a lookup: they
+    are logged and treated as a miss, enrichment never fails because of the cache.
+    """
+
+    def __init__(
+        self,
+        max_entries=GEOCODE_CACHE_MAX_ENTRIES,
+        negative_ttl_days=GEOCODE_NEGATIVE_TTL_DAYS,
+        connection=get_connection,
+    ):
+        self.max_entries = max_entries
+        self.negative_ttl_days = negative_ttl_days
+        self._connection = connection
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, location):
+        """Return (found, country) from the in-process tier only (no I/O)."""
+        with self._lock:
+            if location not in self._entries:
+                return False, None
+            self._entries.move_to_end(location)
+            return True, self._entries[location]
+
+    def _remember(self, location, country):
+        with self._lock:
+            self._entries[location] = country
+            self._entries.move_to_end(location)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def lookup(self, location):
+        """Return (found, country) from memory, falling back to the database tier."""
+        found, country = self.get(location)
+        if found:
+            return found, country
+        try:
+            with self._connection() as conn:
+                found, country = getGeocodedCountry(location, self.negative_ttl_days, conn)
+        except (psycopg2.Error, PoolTimeout) as e:
+            logging.warning(f"Geocode cache lookup failed for '{location}': {e}")
+            return False, None
+        if found:
+            self._remember(location, country)
+        return found, country
+
+    def store(self, location, country):
+        """Cache a resolved country (or None for a string that did not resolve) in both tiers."""
+        self._remember(location, country)
+        try:
+            with self._connection() as conn:
+                saveGeocodedCountry(location, country, conn)
+        except (psycopg2.Error, PoolTimeout) as e:
+            logging.warning(f"Could not store geocode result for '{location}': {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RequestSpacer:
+    """
+    Thread-safe spacing of requests at least `min_interval` seconds apart.
+
+    `reserve()` books the next free slot and returns how long the caller has to wait for
+    it, so concurrent callers (threads or coroutines) queue up one interval apart instead
+    of all sleeping a full interval and firing together.
+    """
+
+    def __init__(self, min_interval=NOMINATIM_MIN_INTERVAL, clock=time.monotonic):
+        self.min_interval = min_interval
+        self._clock = clock
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+            return slot - now
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+# Shared by the sync and async lookups of the process
+geocode_cache = GeocodeCache()
+nominatim_spacer = RequestSpacer()
@@ -1,23 +1,77 @@
 import requests
+import httpx
+import asyncio
 import time
 import os
 import logging
 from dotenv import load_dotenv
+from backend.utils.token_pool import TokenPool, load_tokens, query_key, REST, GRAPHQL
+from backend.utils.http_sessions import get_session
 
 
 load_dotenv()
-GITHUB_TOKEN = os.getenv("PAT")
+# Every request goes out with the pooled token that can take it soonest, paced across its reset window
+token_pool = TokenPool(load_tokens())
+
+
+# Pick a token for `api` that can take a request of `cost`, sleeping until the pool's pacing allows one
+def acquireToken(api, cost=1):
+    while True:
+        token, ready_at = token_pool.pick(api, cost)
+        if ready_at is None:
+            return token
+        waitForBudget(ready_at)
+
+
+async def acquireTokenAsync(api, cost=1):
+    while True:
+        token, ready_at = token_pool.pick(api, cost)
+        if ready_at is None:
+            return token
+        await waitForBudgetAsync(ready_at)
+
+
+# Ask GraphQL for the cost of the query and the budget left, so the pool can pace the next calls
+def _withRateLimit(json):
+    query = (json or {}).get("query")
+    if not query or "rateLimit" in query:
+        return json
+    end = query.rindex("}")
+    return {**json, "query": query[:end] + "  rateLimit { cost remaining resetAt }\n" + query[end:]}
+
+
+# Feed the `rateLimit` field of a GraphQL response into the pool (cost estimate + budget)
+def _recordRateLimit(token, key, response):
+    try:
+        body = response.json()
+    except ValueError:
+        return
+    data = body.get("data") if isinstance(body, dict) else None
+    rate_limit = data.get("rateLimit") if isinstance(data, dict) else None
+    if isinstance(rate_limit, dict):
+        token_pool.observe(token, key, rate_limit)
+
+
+# A response refused because the token ran out (as opposed to a permission error)
+def _isRateLimited(res):
+    if res.headers.get("X-RateLimit-Remaining") != "0":
+        return False
+    return res.status_code in (403, 429) or '"RATE_LIMITED"' in res.text
 
 
 # Function to automatically detect API limits if they occur when running GET requests
-def getRequest(url):
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-    }
+# Extra `headers` (e.g. If-None-Match) are sent along; a 304 Not Modified is returned as is
+def getRequest(url, headers=None):
     while True:
-        res = requests.get(url=url, headers=headers)
+        token = acquireToken(REST)
+        request_headers = {
+            "Authorization": f"Bearer {token}",
+            **(headers or {}),
+        }
+        res = get_session(url).get(url=url, headers=request_headers)
+        token_pool.update(token, REST, res.headers)
 
-        if res.status_code == 200:
+        if res.status_code in (200, 304):
             return res
         elif res.status_code == 403:
             if "Repository access blocked" in res.text:
@@ -25,12 +79,9 @@ def getRequest(url):
                     f"{res.status_code}: Repository access blocked, Skipping. {url}"
                 )
                 return [], res.headers
-            remaining = res.headers.get("X-RateLimit-Remaining")
-            reset = res.headers.get("X-RateLimit-Reset")
 
-            # If API request tokens remaining hits 0
-            if remaining == "0" and reset:
-                resetTokens(reset)
+            # If this token's requests hit 0, retry with the next token (or wait for a reset)
+            if _isRateLimited(res):
                 continue
             else:
                 logging.error(f"{res.status_code}: API ERROR: {res.text}")
@@ -55,36 +106,33 @@ def postRequest(url, json=None, initial_delay=2, max_retries=5, timeout=30):
     Returns:
         requests.Response: The response object on success.
     """
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Content-Type": "application/json",
-    }
-
-    for attempt in range(max_retries):
+    # Costs are learned per query template, not per literal search term or date range
+    query = query_key((json or {}).get("query"))
+    payload = _withRateLimit(json)
+    attempt = 0
+    while attempt < max_retries:
+        token = acquireToken(GRAPHQL, token_pool.predict_cost(query))
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
         try:
-            response = requests.post(
-                url=url, headers=headers, json=json, timeout=timeout
+            response = get_session(url).post(
+                url=url, headers=headers, json=payload, timeout=timeout
             )
+            token_pool.update(token, GRAPHQL, response.headers)
+            _recordRateLimit(token, query, response)
 
-            # Check for rate limiting on every response
-            if (
-                "X-RateLimit-Remaining" in response.headers
-                and response.headers["X-RateLimit-Remaining"] == "0"
-            ):
-                resetTokens(response.headers.get("X-RateLimit-Reset"))
-                # After waiting, we should retry the request, so we continue the loop
-                logging.info("Rate limit reset. Waiting for tokens to refresh.")
+            # Pacing keeps tokens from running out, but GitHub may still refuse one (e.g. other
+            # clients sharing it); the retry goes to the next token the pool considers ready
+            if _isRateLimited(response):
+                logging.info("Rate limit hit for a token. Retrying with the token pool.")
                 continue
 
             # Raise an exception for any non-200 status codes
             response.raise_for_status()
 
             # If we get here, the request was successful (2xx status code)
-            print(
-                f"\rRemaining API Tokens: {response.headers.get('X-RateLimit-Remaining', 'N/A')}",
-                end="",
-                flush=True,
-            )
             return response
 
         except requests.exceptions.HTTPError as e:
@@ -106,11 +154,12 @@ def postRequest(url, json=None, initial_delay=2, max_retries=5, timeout=30):
             )
 
         # If this was the last attempt, break the loop to raise the final exception
-        if attempt == max_retries - 1:
+        attempt += 1
+        if attempt == max_retries:
             break
 
         # Wait before the next retry
-        delay = initial_delay * (2**attempt)
+        delay = initial_delay * (2 ** (attempt - 1))
         logging.info(f"Retrying in {delay} seconds...")
         time.sleep(delay)
 
@@ -118,14 +167,112 @@ def postRequest(url, json=None, initial_delay=2, max_retries=5, timeout=30):
     raise Exception(f"API request failed for {url} after {max_retries} attempts.")
 
 
-# If API limit is hit during an api request, calculate the time remaining till tokens refresh and sleep worker
-def resetTokens(reset):
-    reset_time = int(reset)
-    now = int(time.time())
-    sleep_time = reset_time - now
-    print(f"\n\n[Rate Limit Hit] Sleeping {sleep_time} seconds...")
-    for i in range(sleep_time + 5):
-        print(f"\rCurrent Time Slept: {i} seconds", end="", flush=True)
-        time.sleep(1)
-    print("\nGithub Tokens Restored!\n\n")
-    return
+# Sleep until the pool's pacing lets the next request out (usually well under a second,
+# only the full reset window when every token's budget is spent)
+def waitForBudget(ready_at):
+    sleep_time = max(ready_at - time.time(), 0)
+    if sleep_time >= 60:
+        logging.info(f"[Rate Limit] Token budgets spent, sleeping {sleep_time:.0f} seconds...")
+    time.sleep(sleep_time)
+
+
+# --- asyncio variants (used by the async ingest worker) ---
+# Same retry / rate limit behaviour as above, but requests go through a shared
+# httpx.AsyncClient and waits yield to the event loop instead of blocking it.
+
+
+async def getRequestAsync(client: httpx.AsyncClient, url, headers=None):
+    while True:
+        token = await acquireTokenAsync(REST)
+        request_headers = {
+            "Authorization": f"Bearer {token}",
+            **(headers or {}),
+        }
+        res = await client.get(url, headers=request_headers)
+        token_pool.update(token, REST, res.headers)
+
+        if res.status_code in (200, 304):
+            return res
+        elif res.status_code == 403:
+            if "Repository access blocked" in res.text:
+                logging.warning(
+                    f"{res.status_code}: Repository access blocked, Skipping. {url}"
+                )
+                return [], res.headers
+
+            # If this token's requests hit 0, retry with the next token (or wait for a reset)
+            if _isRateLimited(res):
+                continue
+            else:
+                logging.error(f"{res.status_code}: API ERROR: {res.text}")
+                raise Exception(f"403 Forbidden, not due to rate limit: {res.text}")
+        else:
+            res.raise_for_status()
+
+
+async def postRequestAsync(
+    client: httpx.AsyncClient, url, json=None, initial_delay=2, max_retries=5, timeout=30
+):
+    """Async counterpart of `postRequest`, see there for the retry policy.
+    Raises:
+        httpx.HTTPStatusError: For client-side errors (4xx).
+        Exception: If the request fails after all retries.
+    Returns:
+        httpx.Response: The response object on success.
+    """
+    # Costs are learned per query template, not per literal search term or date range
+    query = query_key((json or {}).get("query"))
+    payload = _withRateLimit(json)
+    attempt = 0
+    while attempt < max_retries:
+        token = await acquireTokenAsync(GRAPHQL, token_pool.predict_cost(query))
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+        try:
+            response = await client.post(url, headers=headers, json=payload, timeout=timeout)
+            token_pool.update(token, GRAPHQL, response.headers)
+            _recordRateLimit(token, query, response)
+
+            if _isRateLimited(response):
+                logging.info("Rate limit hit for a token. Retrying with the token pool.")
+                continue
+
+            response.raise_for_status()
+            return response
+
+        except httpx.HTTPStatusError as e:
+            # Only retry on server-side errors (5xx)
+            if 500 <= e.response.status_code < 600:
+                logging.warning(
+                    f"Server error ({e.response.status_code}) received. (Attempt {attempt + 1}/{max_retries})"
+                )
+            else:
+                logging.error(
+                    f"Client error ({e.response.status_code}) received. Not retrying. Error: {e}"
+                )
+                raise
+
+        except httpx.TransportError as e:
+            logging.warning(
+                f"Network error ({type(e).__name__}) occurred. (Attempt {attempt + 1}/{max_retries})"
+            )
+
+        attempt += 1
+        if attempt == max_retries:
+            break
+
+        delay = initial_delay * (2 ** (attempt - 1))
+        logging.info(f"Retrying in {delay} seconds...")
+        await asyncio.sleep(delay)
+
+    raise Exception(f"API request failed for {url} after {max_retries} attempts.")
+
+
+# Budget wait that suspends the calling coroutine without blocking the event loop
+async def waitForBudgetAsync(ready_at):
+    sleep_time = max(ready_at - time.time(), 0)
+    if sleep_time >= 60:
+        logging.info(f"[Rate Limit] Token budgets spent, sleeping {sleep_time:.0f} seconds...")
+    await asyncio.sleep(sleep_time)
@@ -0,0 +1,91 @@
+from dotenv import load_dotenv
+from urllib.parse import urlsplit
+import importlib.util
+import os
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+# Connection pooling for the upstream APIs (all optional, see README)
+# Keep-alive connections held open per upstream host
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+# Transport-level retries for connections that could not be established
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 3))
+# Seconds an idle keep-alive connection stays open (async client)
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60))
+# HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+def _retry():
+    # Only failed connects are retried here: the request never reached the server, so this is
+    # safe for POSTs too. Status codes and timeouts are left to the callers' own retry policies.
+    return Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=0.5,
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+
+
+def create_session(pool_size=HTTP_POOL_SIZE):
+    """A requests.Session keeping up to `pool_size` keep-alive connections per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=_retry())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def create_async_client(pool_size=HTTP_POOL_SIZE, timeout=30):
+    """An httpx.AsyncClient with the same pooling and connect retries, on HTTP/2 where available.
+
+    Async clients are bound to the event loop that uses them, so each loop creates its own
+    (and closes it) instead of sharing a module-level one.
+    """
+    limits = httpx.Limits(
+        max_connections=None,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    transport = httpx.AsyncHTTPTransport(retries=HTTP_RETRIES, http2=HTTP2, limits=limits)
+    return httpx.AsyncClient(transport=transport, timeout=timeout, follow_redirects=True)
+
+
+# One session per upstream host and process (sessions must never be shared across a fork)
+_sessions = {}
+_sessions_pid = None
+_sessions_lock = threading.Lock()
+
+
+def get_session(url):
+    """The shared session for the host of `url` (api.github.com, nominatim, ...)."""
+    global _sessions, _sessions_pid
+    host = urlsplit(url).netloc
+    pid = os.getpid()
+    with _sessions_lock:
+        if _sessions_pid != pid:
+            _sessions = {}
+            _sessions_pid = pid
+        session = _sessions.get(host)
+        if session is None:
+            session = _sessions[host] = create_session()
+    return session
+
+
+def close_sessions():
+    global _sessions, _sessions_pid
+    with _sessions_lock:
+        if _sessions_pid == os.getpid():
+            for session in _sessions.values():
+                session.close()
+        _sessions = {}
+        _sessions_pid = None
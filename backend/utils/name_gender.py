@@ -0,0 +1,134 @@
+import os
+import re
+import time
+import logging
+import threading
+import unicodedata
+
+import psycopg2
+
+from backend.db.queries.gender import getPronounGenderCounts
+from backend.utils.db_conn import PoolTimeout, get_connection
+
+# Local name-frequency gender model (all optional, see README)
+# Smoothed share of the most frequent gender a name needs to be decided without the LLM
+GENDER_MODEL_MIN_CONFIDENCE = float(os.getenv("GENDER_MODEL_MIN_CONFIDENCE", 0.9))
+# Seconds before the model is rebuilt from the pronoun-labelled users again
+GENDER_MODEL_REFRESH_SECONDS = float(os.getenv("GENDER_MODEL_REFRESH_SECONDS", 3600))
+
+# Genders the model learns, "Other" only lowers the confidence in the two others
+_LABELS = ("Male", "Female", "Other")
+
+
+# Cache key of a user: (lower case first name, country or ''), None without a usable name
+def gender_key(name, country):
+    if not name:
+        return None
+    name = unicodedata.normalize("NFKC", name).strip().lower()
+    first = re.split(r"[\s,]+", name)[0].strip(".-'")
+    if not first or not any(ch.isalpha() for ch in first):
+        return None
+    return first, country or ""
+
+
+class NameGenderModel:
+    """
+    Frequency table of (first name, country) -> gender counts of pronoun-labelled users.
+
+    Every pair is also counted under (first name, '') so a name seen in other countries can
+    still be decided. `predict` prefers the country specific distribution and falls back to
+    the country independent one; the share of the top gender is smoothed by add-one counts,
+    so a name needs several consistent observations before it counts as confident.
+    """
+
+    def __init__(self, counts=None, min_confidence=GENDER_MODEL_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        # key -> [male, female, other]
+        self._counts = {}
+        for key, gender, count in counts or ():
+            self.add(key, gender, count)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, key, gender, count=1):
+        if gender not in _LABELS:
+            return
+        first, country = key
+        keys = {key, (first, "")}
+        for k in keys:
+            self._counts.setdefault(k, [0] * len(_LABELS))[_LABELS.index(gender)] += count
+
+    def distribution(self, key):
+        """Return {gender: probability} of a key, or None when the name was never seen."""
+        counts = self._counts.get(key)
+        if counts is None:
+            return None
+        total = sum(counts) + len(_LABELS)
+        return {label: (n + 1) / total for label, n in zip(_LABELS, counts)}
+
+    def predict(self, key):
+        """Return "Male" or "Female" when confident for the key, otherwise None."""
+        for k in (key, (key[0], "")):
+            distribution = self.distribution(k)
+            if distribution is None:
+                continue
+            gender = max(distribution, key=distribution.get)
+            if gender != "Other" and distribution[gender] >= self.min_confidence:
+                return gender
+            # An unclear distribution in the country is not overruled by other countries
+            return None
+        return None
+
+
+class LocalGenderModel:
+    """
+    The NameGenderModel of the process, built from the users table on first use and
+    rebuilt every `refresh_seconds` so newly scraped pronouns are picked up. If a rebuild
+    fails the previous model is kept (at first an empty one that decides nothing).
+    """
+
+    def __init__(
+        self,
+        refresh_seconds=GENDER_MODEL_REFRESH_SECONDS,
+        min_confidence=GENDER_MODEL_MIN_CONFIDENCE,
+        connection=get_connection,
+        clock=time.monotonic,
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.min_confidence = min_confidence
+        self._connection = connection
+        self._clock = clock
+        self._model = NameGenderModel(min_confidence=min_confidence)
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        try:
+            with self._connection() as conn:
+                rows = getPronounGenderCounts(conn)
+        except (psycopg2.Error, PoolTimeout) as e:
+            logging.warning(f"Local gender model not rebuilt: {e}")
+            return
+        model = NameGenderModel(min_confidence=self.min_confidence)
+        for first_name, country, gender, count in rows:
+            key = gender_key(first_name, country)
+            if key is not None:
+                model.add(key, gender, count)
+        self._model = model
+        logging.info(f"Local gender model built with {len(model)} names")
+
+    def model(self):
+        with self._lock:
+            now = self._clock()
+            if self._built_at is None or now - self._built_at >= self.refresh_seconds:
+                # Set first, so a failing database is retried once per refresh only
+                self._built_at = now
+                self._build()
+            return self._model
+
+    def predict(self, key):
+        return self.model().predict(key)
+
+
+name_gender_model = LocalGenderModel()
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+import os
+import time
+import logging
+import threading
+
+from backend.db.queries.data_generation import getDataGeneration
+from backend.utils.db_conn import get_connection
+
+# Cache sizing and freshness (all optional, see README)
+# Seconds a cached result is served before it is recomputed regardless of writes
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", 300))
+# Least recently used entries are evicted beyond this many results
+STATS_CACHE_MAX_ENTRIES = int(os.getenv("STATS_CACHE_MAX_ENTRIES", 256))
+# Seconds between checks of the write generation bumped by the ingest worker
+STATS_CACHE_GENERATION_CHECK = float(os.getenv("STATS_CACHE_GENERATION_CHECK", 5))
+
+
+def load_data_generation():
+    with get_connection() as conn:
+        return getDataGeneration(conn)
+
+
+class ResultCache:
+    """
+    Thread-safe in-memory cache for results derived from the database.
+
+    Entries expire after `ttl` seconds and the least recently used are evicted past
+    `max_entries`. Every entry is also tagged with the data generation it was computed
+    under; when the ingest worker commits new data the generation moves on and all
+    older entries are dropped. The generation is re-read at most every
+    `generation_check` seconds so cache hits stay off the database.
+    """
+
+    def __init__(
+        self,
+        ttl=STATS_CACHE_TTL,
+        max_entries=STATS_CACHE_MAX_ENTRIES,
+        generation_check=STATS_CACHE_GENERATION_CHECK,
+        load_generation=load_data_generation,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation_check = generation_check
+        self._load_generation = load_generation
+
+        # key -> (generation, expires_at, value), oldest use first
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._generation_checked = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _current_generation(self):
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._generation_checked is not None
+                and now - self._generation_checked < self.generation_check
+            ):
+                return self._generation
+
+        # Read outside the lock so a slow database does not block cache hits
+        generation = self._load_generation()
+
+        with self._lock:
+            self._generation_checked = now
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+        return generation
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True):
+        """
+        Return the cached value for `key`, or call `compute()` and cache its result.
+        Results rejected by `cacheable` (e.g. error responses) are returned but not stored.
+        """
+        try:
+            generation = self._current_generation()
+        except Exception as e:
+            # Without a generation we cannot tell stale from fresh, serve uncached
+            logging.warning(f"Result cache bypassed, could not read data generation: {e}")
+            return compute()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = compute()
+        if not cacheable(value):
+            return value
+
+        with self._lock:
+            # Do not store results computed under a generation that has since moved on
+            if generation == self._generation:
+                self._entries[key] = (generation, now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
+            self._generation_checked = None
+
@@ -0,0 +1,160 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# GitHub rate limits are tracked per API, named like GitHub's X-RateLimit-Resource header
+REST = "core"
+GRAPHQL = "graphql"
+
+# Weight of the newest observation in the running estimate of a query's cost
+COST_SMOOTHING = 0.3
+# Query templates whose cost is remembered, least recently used forgotten first
+COST_TABLE_MAX_ENTRIES = 256
+
+
+# Personal access tokens from the environment: PAT may hold several, separated by commas/whitespace
+def load_tokens():
+    tokens = [t for t in re.split(r"[,\s]+", os.getenv("PAT") or "") if t]
+    # Without any token requests go out unauthenticated-looking, as before (GitHub answers 401)
+    return tokens or [None]
+
+
+# Cost table key of a GraphQL query: its text with string literals (search terms, date
+# ranges, logins) blanked and whitespace collapsed, so every call of the same template
+# shares one estimate
+def query_key(query):
+    if not query:
+        return query
+    query = re.sub(r'"(?:[^"\\]|\\.)*"', '""', query)
+    return " ".join(query.split())
+
+
+class _Budget:
+    """Last known rate limit of one token for one API."""
+
+    __slots__ = ("remaining", "reset", "last_sent")
+
+    def __init__(self):
+        # None until GitHub has told us (treated as a full budget)
+        self.remaining = None
+        self.reset = None
+        self.last_sent = None
+
+
+class TokenPool:
+    """
+    Thread-safe pool of GitHub tokens with a separate rate limit budget per token and API.
+
+    `pick(api, cost)` hands out the token that can take a request of the predicted `cost`
+    soonest and reserves that cost on it. Each token's remaining budget is spread evenly
+    over what is left of its reset window: after a request, the token is next ready once
+    `cost * seconds_to_reset / remaining` seconds have passed. Crawling therefore keeps a
+    steady pace instead of bursting through the budget and stalling until the reset.
+    Tokens GitHub has not reported on yet count as full and are ready straight away.
+
+    Budgets come from the X-RateLimit headers (`update`) and, for GraphQL, from the
+    `rateLimit { cost remaining resetAt }` field of each response (`observe`), which also
+    feeds the per-query cost estimate returned by `predict_cost`.
+    """
+
+    def __init__(self, tokens, clock=time.time):
+        if not tokens:
+            raise ValueError("TokenPool needs at least one token")
+        self.tokens = list(tokens)
+        self._clock = clock
+        self._budgets = {}
+        # query_key -> running cost estimate, bounded as an LRU
+        self._costs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def _budget(self, token, api, now):
+        budget = self._budgets.get((token, api))
+        if budget is None:
+            budget = self._budgets[(token, api)] = _Budget()
+        # A passed reset time means GitHub has refilled the budget
+        if budget.reset is not None and now >= budget.reset:
+            budget.remaining = None
+            budget.reset = None
+            budget.last_sent = None
+        return budget
+
+    def _ready_at(self, budget, cost, now):
+        if budget.remaining is None:
+            return now
+        if budget.remaining < cost:
+            # Exhausted for this request, wait for the reset (1s margin for clock skew)
+            return budget.reset + 1 if budget.reset is not None else now + 60
+        if budget.last_sent is None or budget.reset is None:
+            return now
+        interval = cost * max(budget.reset - now, 0) / budget.remaining
+        return budget.last_sent + interval
+
+    def pick(self, api, cost=1):
+        """Return (token, None) if a token is ready now, else (None, time at which one will be)."""
+        now = self._clock()
+        with self._lock:
+            best = None
+            for token in self.tokens:
+                budget = self._budget(token, api, now)
+                ready_at = self._ready_at(budget, cost, now)
+                headroom = float("inf") if budget.remaining is None else budget.remaining
+                rank = (max(ready_at, now), -headroom)
+                if best is None or rank < best[0]:
+                    best = (rank, token, budget, ready_at)
+
+            _, token, budget, ready_at = best
+            if ready_at > now:
+                return None, ready_at
+            if budget.remaining is not None:
+                budget.remaining -= cost
+            budget.last_sent = now
+            return token, None
+
+    def update(self, token, api, headers):
+        """Record the rate limit headers of a response sent with `token`."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None:
+            return
+        with self._lock:
+            budget = self._budget(token, api, self._clock())
+            budget.remaining = int(remaining)
+            if reset is not None:
+                budget.reset = int(reset)
+            elif budget.remaining <= 0:
+                # Exhausted without a reset time, GitHub windows are one hour
+                budget.reset = self._clock() + 3600
+
+    def observe(self, token, key, rate_limit):
+        """Record a GraphQL `rateLimit {cost remaining resetAt}` for the query identified by `key`."""
+        cost = rate_limit.get("cost")
+        with self._lock:
+            if cost is not None:
+                previous = self._costs.get(key)
+                self._costs[key] = (
+                    cost if previous is None else previous + COST_SMOOTHING * (cost - previous)
+                )
+                self._costs.move_to_end(key)
+                while len(self._costs) > COST_TABLE_MAX_ENTRIES:
+                    self._costs.popitem(last=False)
+
+            budget = self._budget(token, GRAPHQL, self._clock())
+            if rate_limit.get("remaining") is not None:
+                budget.remaining = int(rate_limit["remaining"])
+            if rate_limit.get("resetAt"):
+                reset_at = datetime.fromisoformat(rate_limit["resetAt"].replace("Z", "+00:00"))
+                budget.reset = reset_at.timestamp()
+
+    def predict_cost(self, key):
+        """Expected rate limit cost of the next call of the query identified by `key` (1 if unseen)."""
+        with self._lock:
+            if key not in self._costs:
+                return 1
+            self._costs.move_to_end(key)
+            return max(self._costs[key], 1)